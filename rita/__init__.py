@@ -2,8 +2,6 @@ import logging
 from types import GeneratorType
 
 from rita.config import with_config
-from rita.preprocess import preprocess_rules
-from rita.precompile import precompile
 from rita.utils import timer, Timer
 
 
@@ -19,16 +17,39 @@ def get_version() -> str:
 
 
 @with_config
-def compile_string(raw, config, use_engine=None, **kwargs):
-    from rita.parser import RitaParser
+def compile_string(raw, config, use_engine=None, cache=None, parse_workers=None, **kwargs):
+    """
+    `cache` - `True` for the process-wide compile cache or a `rita.cache.CompileCache`,
+    `parse_workers` - parse rules in a process pool of this size (for very large rule files)
+    """
+    from rita.precompile import precompile
+    source = precompile(raw)
+    if cache is not None and cache is not False:
+        from rita.cache import Uncacheable, cache_key, get_cache
+        engine = use_engine or config.available_engines[0][1]
+        try:
+            key = cache_key(source, engine, kwargs, config._data)
+        except Uncacheable as ex:
+            logger.debug("Compiling without cache: {}".format(ex))
+            get_cache(cache).stats["uncacheable"] += 1
+        else:
+            return get_cache(cache).get_or_compile(
+                key, lambda: _compile_source(source, config, use_engine, parse_workers, **kwargs)
+            )
+
+    return _compile_source(source, config, use_engine, parse_workers, **kwargs)
+
+
+def _compile_source(source, config, use_engine=None, parse_workers=None, **kwargs):
+    # Imported here, so loading already compiled rules never pays for the parser
+    from rita.parser import parse
+    from rita.preprocess import preprocess_rules
     t = Timer("Compilation")
     for k, v in kwargs.items():
         config.set_variable(k, v)
 
     with timer("Parsing"):
-        parser = RitaParser(config)
-        parser.build()
-        root = parser.parse(precompile(raw))
+        root = parse(source, config, workers=parse_workers)
 
     logger.debug(root)
     if use_engine:
@@ -0,0 +1,219 @@
+"""
+Compile cache for `rita.compile` / `rita.compile_string`.
+
+Results are keyed by a hash of everything compilation depends on: rules source
+(with `@import`s already expanded), contents of `LOAD`ed files, keyword arguments
+(session variables and engine options), default config, engine and rita version.
+
+Two tiers:
+ - in-process LRU of ready results, bounded both by entry count and by (approximate) size.
+   Every hit is a copy: executors share compiled patterns, but not their per-run state
+   (so each thread can use its own), pattern lists are copied
+ - optional cache directory with pickled results, shared between processes and restarts.
+   Executors pickle as their rules and options, so loading one compiles only the regexes,
+   parsing and preprocessing are skipped. Only point it to a trusted directory
+"""
+import copy
+import hashlib
+import json
+import logging
+import os
+import pickle
+import re
+import tempfile
+import threading
+
+from collections import OrderedDict
+from time import perf_counter
+from types import ModuleType
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_ENTRIES = 32
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+# `LOAD("path")`, string literals and comments are skipped as the lexer does
+LOAD_USE = re.compile(r"""(?P<skip>"(\\.|[^"\\\n])*"|'(\\.|[^'\\\n])*'|\#[^\n]*)"""
+                      r"""|\bLOAD\s*\(\s*(?:"(?P<path>[^"\n]*)"|'(?P<quoted>[^'\n]*)')?""")
+
+
+class Uncacheable(Exception):
+    """
+    Compilation depends on something which can't be part of a cache key
+    """
+
+
+def _key_value(value):
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    if isinstance(value, (list, tuple)):
+        return [_key_value(v) for v in value]
+    if isinstance(value, (set, frozenset)):
+        return sorted((_key_value(v) for v in value), key=repr)
+    if isinstance(value, dict):
+        return {str(k): _key_value(v) for k, v in sorted(value.items(), key=lambda x: str(x[0]))}
+    if isinstance(value, ModuleType):
+        return "module:{}".format(value.__name__)
+    raise Uncacheable("Cannot use {!r} in a cache key".format(value))
+
+
+def loaded_files(source: str) -> Dict[str, str]:
+    """
+    `{path: sha256}` of files `LOAD`ed by the rules - they are read while parsing, after the key is known
+    """
+    files = {}
+    for m in LOAD_USE.finditer(source):
+        if m.group("skip") is not None:
+            continue
+        path = m.group("path") if m.group("path") is not None else m.group("quoted")
+        if path is None:
+            raise Uncacheable("Cannot use `LOAD` of a variable path in a cache key")
+        try:
+            with open(path, "rb") as f:
+                files[os.path.abspath(path)] = hashlib.sha256(f.read()).hexdigest()
+        except OSError as ex:
+            raise Uncacheable("Cannot read `LOAD`ed file: {}".format(ex))
+    return files
+
+
+def cache_key(source: str, engine: str, kwargs: Dict[str, Any], config: Dict[str, Any]) -> str:
+    from rita import __version__
+    data = {
+        "source": source,
+        "loads": loaded_files(source),
+        "engine": engine,
+        "kwargs": _key_value(kwargs),
+        "config": _key_value(config),
+        "version": __version__,
+    }
+    return hashlib.sha256(json.dumps(data, sort_keys=True).encode("UTF-8")).hexdigest()
+
+
+class CompileCache(object):
+    """
+    `max_entries`, `max_bytes` - limits of the in-process tier,
+    `directory` - enables the on-disk tier
+    """
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, max_bytes=DEFAULT_MAX_BYTES, directory=None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.directory = directory
+        self._entries: "OrderedDict[str, Any]" = OrderedDict()
+        self._sizes: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self.stats = {
+            "hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+            "uncacheable": 0,
+            "evictions": 0,
+            # Seconds spent compiling on misses and loading from disk on disk hits
+            "compile_time": 0.0,
+            "load_time": 0.0,
+        }
+
+    @property
+    def size(self) -> int:
+        return sum(self._sizes.values())
+
+    def __len__(self):
+        return len(self._entries)
+
+    def clear(self, disk=False):
+        with self._lock:
+            self._entries.clear()
+            self._sizes.clear()
+        if disk and self.directory and os.path.isdir(self.directory):
+            for name in os.listdir(self.directory):
+                if name.endswith(".pickle"):
+                    os.unlink(os.path.join(self.directory, name))
+
+    def get_or_compile(self, key: str, compile_fn: Callable[[], Any]) -> Any:
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.stats["hits"] += 1
+                return self._output(self._entries[key])
+
+        result = self._load(key)
+        if result is not None:
+            self.stats["disk_hits"] += 1
+        else:
+            self.stats["misses"] += 1
+            started = perf_counter()
+            result = compile_fn()
+            self.stats["compile_time"] += perf_counter() - started
+
+        data = self._dump(result)
+        if data is not None and self.directory and not os.path.exists(self._path(key)):
+            self._store(key, data)
+        self._remember(key, result, len(data) if data is not None else 0)
+        return self._output(result)
+
+    @staticmethod
+    def _output(result):
+        # Pattern lists may be changed by the caller, executors keep per-run state (shallow copies share the rest)
+        return copy.deepcopy(result) if isinstance(result, list) else copy.copy(result)
+
+    @staticmethod
+    def _dump(result) -> Optional[bytes]:
+        try:
+            return pickle.dumps(result, protocol=pickle.HIGHEST_PROTOCOL)
+        except Exception as ex:
+            logger.debug("Compiled result cannot be pickled: {}".format(ex))
+            return None
+
+    def _remember(self, key, result, size):
+        with self._lock:
+            self._entries[key] = result
+            self._sizes[key] = size
+            while self._entries and (len(self._entries) > self.max_entries or self.size > self.max_bytes):
+                (old, _) = self._entries.popitem(last=False)
+                del self._sizes[old]
+                self.stats["evictions"] += 1
+
+    def _path(self, key):
+        return os.path.join(self.directory, "{}.pickle".format(key))
+
+    def _load(self, key):
+        if not self.directory:
+            return None
+        path = self._path(key)
+        if not os.path.exists(path):
+            return None
+        started = perf_counter()
+        try:
+            with open(path, "rb") as f:
+                result = pickle.load(f)
+        except Exception as ex:
+            logger.warning("Dropping unreadable cache entry '{0}': {1}".format(path, ex))
+            os.unlink(path)
+            return None
+        self.stats["load_time"] += perf_counter() - started
+        return result
+
+    def _store(self, key, data):
+        os.makedirs(self.directory, exist_ok=True)
+        # Written aside and moved into place, concurrent readers never see a partial file
+        (fd, tmp_path) = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, self._path(key))
+        except Exception:
+            os.unlink(tmp_path)
+            raise
+
+
+default_cache = CompileCache()
+
+
+def get_cache(cache) -> CompileCache:
+    """
+    `cache=True` - the process-wide `default_cache`, otherwise a `CompileCache` instance
+    """
+    if cache is True:
+        return default_cache
+    if isinstance(cache, CompileCache):
+        return cache
+    raise ValueError("`cache` must be True or a CompileCache, got: {!r}".format(cache))
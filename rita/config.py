@@ -1,15 +1,7 @@
 import operator
 import logging
 from importlib import import_module
-from typing import Any, Callable, Dict
-
-try:
-    from rita.engine.translate_spacy import compile_rules as spacy_engine
-except ImportError:
-    spacy_engine = None  # type: ignore[assignment]
-
-from rita.engine.translate_standalone import compile_rules as standalone_engine
-from rita.engine.translate_rust import compile_rules as rust_engine
+from typing import Any, Callable, Dict, Tuple, Union
 
 from rita.utils import SingletonMixin
 
@@ -17,6 +9,27 @@ from rita.utils import SingletonMixin
 logger = logging.getLogger(__name__)
 
 CompileFN = Callable[..., Any]
+# A compile function or a `"module:attribute"` reference to one, imported on first use
+EngineRef = Union[CompileFN, str]
+
+# Third-party engines: `[project.entry-points."rita.engines"] my_engine = "my_package.engine:compile_rules"`
+ENTRY_POINT_GROUP = "rita.engines"
+
+
+def resolve_engine(ref: EngineRef) -> CompileFN:
+    if not isinstance(ref, str):
+        return ref
+    (mod_name, _, attr) = ref.partition(":")
+    logger.debug("Loading engine: {}".format(ref))
+    return getattr(import_module(mod_name), attr or "compile_rules")
+
+
+def _entry_point_engine(key: str):
+    from importlib.metadata import entry_points
+    for ep in entry_points(group=ENTRY_POINT_GROUP):
+        if ep.name == key:
+            return ep.value
+    return None
 
 
 class Config(SingletonMixin):
@@ -31,25 +44,51 @@ class Config(SingletonMixin):
         self.engines_by_key = {}
         self.current_engine = None
 
-        if spacy_engine is not None:
-            self.register_engine(1, "spacy", spacy_engine)
-        self.register_engine(2, "standalone", standalone_engine)
-        self.register_engine(3, "rust", rust_engine)
-
-    def register_engine(self, priority: int, key: str, compile_fn: CompileFN) -> None:
+        # Engine modules are imported only when selected
+        self.register_engine(1, "spacy", "rita.engine.translate_spacy:compile_rules")
+        self.register_engine(2, "standalone", "rita.engine.translate_standalone:compile_rules")
+        self.register_engine(3, "rust", "rita.engine.translate_rust:compile_rules")
+        self.register_engine(4, "token", "rita.engine.translate_token:compile_rules")
+
+    def __reduce__(self):
+        # Unpickled (eg. with a session config from another process) as this process' instance,
+        # never overwriting its registered engines
+        return (Config, ())
+
+    def register_engine(self, priority: int, key: str, compile_fn: EngineRef) -> None:
+        """
+        `compile_fn` - compile function or a `"module:attribute"` reference to it
+        """
         self.available_engines.append((priority, key, compile_fn))
         self.engines_by_key[key] = compile_fn
         self.available_engines.sort(key=operator.itemgetter(0))
 
+    def get_engine(self, key: str) -> CompileFN:
+        """
+        Registered engine, or one from the `rita.engines` entry point group
+        """
+        if key not in self.engines_by_key:
+            ref = _entry_point_engine(key)
+            if ref is None:
+                raise KeyError("Unknown engine: '{0}'. Available: {1}".format(
+                    key, ", ".join(k for (_, k, _) in self.available_engines)
+                ))
+            self.engines_by_key[key] = ref
+
+        compile_fn = resolve_engine(self.engines_by_key[key])
+        self.engines_by_key[key] = compile_fn
+        return compile_fn
+
     @property
     def default_engine(self) -> CompileFN:
-        (_, key, compile_fn) = self.available_engines[0]
+        (_, key, _) = self.available_engines[0]
         self.current_engine = key
-        return compile_fn
+        return self.get_engine(key)
 
     def set_engine(self, key: str) -> CompileFN:
+        compile_fn = self.get_engine(key)
         self.current_engine = key
-        return self.engines_by_key[key]
+        return compile_fn
 
     @property
     def list_branching(self) -> bool:
@@ -69,10 +108,26 @@ class SessionConfig(object):
             "implicit_punct": True,
             "deaccent": True,
             "implicit_hyphon": False,
+            # IN_LIST with at least this many items is compiled into a trie regex
+            "list_trie_threshold": 20,
+            # IN_LIST with at least this many items is looked up per text instead (standalone engine)
+            "list_lookup_threshold": 10000,
         }
         self.variables = {}
         self._nested_group_count = 0
         self._anchor_group_count = 0
+        # Patterns engines build from lists while compiling, see `list_pattern`
+        self.list_patterns: Dict[Tuple[int, Any], Tuple[Any, Any]] = {}
+
+    def __getstate__(self):
+        # Modules are pickled by name
+        state = dict(self.__dict__)
+        state["modules"] = [mod.__name__ for mod in self.modules]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.modules = [import_module(mod_name) for mod_name in state["modules"]]
 
     def register_module(self, mod_name: str) -> None:
         logger.debug("Importing module: {}".format(mod_name))
@@ -105,6 +160,21 @@ class SessionConfig(object):
         else:
             self._data[k] = v
 
+    def list_pattern(self, items, key, build: Callable[[], Any]) -> Any:
+        """
+        `build()` once per list (and `key`) while compiling: a list shared by many rules
+        (see `rita.preprocess.intern_lists`) is built once. Engines drop these with `clear_list_patterns`
+        when compilation ends
+        """
+        memo_key = (id(items), key)
+        if memo_key not in self.list_patterns:
+            # The list is kept with its pattern, so its id is not reused by another list meanwhile
+            self.list_patterns[memo_key] = (items, build())
+        return self.list_patterns[memo_key][1]
+
+    def clear_list_patterns(self):
+        self.list_patterns.clear()
+
     def new_nested_group_id(self):
         self._nested_group_count += 1
         return self._nested_group_count
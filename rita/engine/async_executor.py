@@ -0,0 +1,143 @@
+"""
+asyncio facade over rule executors.
+
+Rules run in a thread or process pool, so long documents don't block the event loop.
+The wrapped executor and its sync API stay as they are.
+"""
+import asyncio
+import logging
+import threading
+import weakref
+
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import nullcontext
+from itertools import islice
+
+from rita.engine import translate_standalone
+
+logger = logging.getLogger(__name__)
+
+THREAD = "thread"
+PROCESS = "process"
+
+
+class AsyncRuleExecutor(object):
+    """
+    Runs `RuleExecutor` (or `RustRuleExecutor`) calls off the event loop.
+
+    `pool` - `"thread"`, `"process"` or a ready thread pool (`concurrent.futures.Executor`).
+    Threads share the executor; a call which is cancelled or times out stops
+    the next time a rule advances. Processes rebuild the executor once per worker,
+    a call already running there can't be interrupted and finishes in the background.
+
+    `concurrency` - how many calls can run at once in an event loop (others wait), `timeout` - default
+    per-call timeout in seconds
+    """
+    def __init__(self, executor, pool=THREAD, max_workers=None, concurrency=None, timeout=None):
+        self.executor = executor
+        self.timeout = timeout
+        self.concurrency = concurrency
+        # One semaphore per event loop, created inside of it - an instance can be used by a few `asyncio.run` calls
+        self._semaphores: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]" = \
+            weakref.WeakKeyDictionary()
+        self._owns_pool = not isinstance(pool, Executor)
+
+        if isinstance(pool, ProcessPoolExecutor):
+            raise ValueError("Use `pool=\"process\"` - process workers have to be initialized with the executor")
+        elif isinstance(pool, Executor):
+            self.pool = pool
+        elif pool == THREAD:
+            self.pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="rita")
+        elif pool == PROCESS:
+            self.pool = ProcessPoolExecutor(max_workers=max_workers,
+                                            initializer=translate_standalone._init_worker,
+                                            initargs=executor.__reduce__()[1])
+        else:
+            raise ValueError("Unknown pool: '{0}'. Expected '{1}', '{2}' or an Executor".format(pool, THREAD, PROCESS))
+        self.processes = pool == PROCESS
+
+    def _limit(self):
+        if not self.concurrency:
+            return nullcontext()
+        loop = asyncio.get_running_loop()
+        if loop not in self._semaphores:
+            self._semaphores[loop] = asyncio.Semaphore(self.concurrency)
+        return self._semaphores[loop]
+
+    def _timeout(self, timeout):
+        return self.timeout if timeout is None else timeout
+
+    async def execute(self, text, timeout=None, **kwargs):
+        """
+        `executor.execute(text, **kwargs)` as a list
+        """
+        loop = asyncio.get_running_loop()
+        async with self._limit():
+            if self.processes:
+                future = loop.run_in_executor(self.pool, _execute_in_worker, text, kwargs)
+                return await asyncio.wait_for(future, self._timeout(timeout))
+
+            cancelled = threading.Event()
+            try:
+                future = loop.run_in_executor(self.pool, list,
+                                              self.executor._execute_until(text, cancelled, **kwargs))
+                return await asyncio.wait_for(future, self._timeout(timeout))
+            finally:
+                # Stops the worker thread if the call didn't finish (timeout, cancellation)
+                cancelled.set()
+
+    async def execute_many(self, texts, timeout=None, **kwargs):
+        """
+        List of results per text, in input order. Texts run concurrently, up to `concurrency` at once;
+        `timeout` applies to every text
+        """
+        return await asyncio.gather(*[self.execute(text, timeout=timeout, **kwargs) for text in texts])
+
+    async def stream(self, text, batch_size=64, timeout=None, **kwargs):
+        """
+        Async iterator over results of `executor.execute(text, **kwargs)`, computed `batch_size`
+        at a time (in a thread pool - a process pool computes all of them at once).
+        `timeout` applies to every batch. Leaving the loop early stops the work
+        """
+        if self.processes:
+            for result in await self.execute(text, timeout=timeout, **kwargs):
+                yield result
+            return
+
+        loop = asyncio.get_running_loop()
+        cancelled = threading.Event()
+        results = self.executor._execute_until(text, cancelled, **kwargs)
+        try:
+            async with self._limit():
+                while True:
+                    future = loop.run_in_executor(self.pool, _next_batch, results, batch_size)
+                    batch = await asyncio.wait_for(future, self._timeout(timeout))
+                    if not batch:
+                        return
+                    for result in batch:
+                        yield result
+        finally:
+            cancelled.set()
+
+    def close(self, wait=True):
+        """
+        Shut the pool down, unless it was given from outside
+        """
+        if self._owns_pool:
+            self.pool.shutdown(wait=wait, cancel_futures=True)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        await asyncio.get_running_loop().run_in_executor(None, self.close)
+
+
+def _next_batch(results, size):
+    return list(islice(results, size))
+
+
+def _execute_in_worker(text, kwargs):
+    executor = translate_standalone._worker_executor
+    assert executor is not None
+    return list(executor.execute(text, **kwargs))
@@ -0,0 +1,87 @@
+"""
+Hashed lookups of huge `IN_LIST` vocabularies for the standalone engine.
+
+A list of many thousands of items does not belong inside a regex: it is slow to compile, big in memory
+and tried item by item. Such a list is kept out of the rule pattern - there is only a slot where
+its alternation would be. For every text, words of the text are looked up in a hash index of the list
+(items of a few words - by every run of consecutive words), which finds the few items the text can possibly
+match. The slot is then filled with these items only and the rule pattern checks everything else
+(word boundaries, context of the rule) the same way as with the whole list.
+
+An item can only match where its words are consecutive words of the text: the items found are a superset
+of the ones which match, so results are exactly the same. Case folding mirrors the stdlib `re`
+(see `rita.engine.prefilter`), accented variants are items of the list already (see `handle_deaccent`).
+"""
+import logging
+
+from typing import Dict, List, Tuple
+
+from rita.engine.prefilter import WORD_TOKEN, case_fold
+
+logger = logging.getLogger(__name__)
+
+# Joins words of an item into a single key
+SEPARATOR = "\x00"
+
+
+def text_words(text: str, ignore_case: bool) -> List[str]:
+    return WORD_TOKEN.findall(case_fold(text) if ignore_case else text)
+
+
+def _folded(items: List[str], ignore_case: bool) -> List[str]:
+    if not ignore_case:
+        return items
+    if any("\n" in item for item in items):
+        return [case_fold(item) for item in items]
+    # Folding never adds nor removes a line break, all the items are folded at once
+    return case_fold("\n".join(items)).split("\n")
+
+
+class ListIndex(object):
+    """
+    `items` of a list by their words. `always` - items which have no words (eg. "-")
+    or can't be looked up by them (already escaped regex, eg. `J\\.`), they are never filtered out
+    """
+    def __init__(self, items: List[str], ignore_case: bool):
+        # Item of every key (its words), `more` - the rest of the items of a key if there are a few (eg. "A-B", "A B")
+        self.keys: Dict[str, str] = {}
+        self.more: Dict[str, List[str]] = {}
+        # Word counts of items of a few words by their first word, as bits
+        self.lengths: Dict[str, int] = {}
+        self.always: List[str] = []
+        for (item, folded) in zip(items, _folded(items, ignore_case)):
+            # `\w` is what `str.isalnum` tells (and `_`), most items are a single word
+            words = [folded] if folded.isalnum() else WORD_TOKEN.findall(folded)
+            if not words or "\\" in item:
+                self.always.append(item)
+                continue
+            key = words[0] if len(words) == 1 else SEPARATOR.join(words)
+            if key in self.keys:
+                self.more.setdefault(key, []).append(item)
+            else:
+                self.keys[key] = item
+            if len(words) > 1:
+                self.lengths[words[0]] = self.lengths.get(words[0], 0) | (1 << len(words))
+
+    def find(self, words: List[str]) -> Tuple[str, ...]:
+        """
+        Items which may occur in a text of `words` (see `text_words`), sorted
+        """
+        found = set(self.always)
+        (keys, more, lengths) = (self.keys, self.more, self.lengths)
+
+        def add(key):
+            item = keys.get(key)
+            if item is not None:
+                found.add(item)
+                if more:
+                    found.update(more.get(key, ()))
+
+        for (i, word) in enumerate(words):
+            add(word)
+            counts = lengths.get(word)
+            if counts:
+                for count in range(2, counts.bit_length()):
+                    if counts >> count & 1:
+                        add(SEPARATOR.join(words[i:i + count]))
+        return tuple(sorted(found))
@@ -0,0 +1,130 @@
+"""
+Overlap resolution of rule matches.
+
+Every rule yields its matches ordered by start, so all of them are merged
+into one stream ordered by `(start, rule)` in O(n log k) for `k` rules.
+Each strategy is then a single left-to-right sweep over that stream,
+holding only the matches which still overlap the current one.
+"""
+import heapq
+
+from bisect import bisect_right
+from itertools import groupby
+from operator import attrgetter
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
+
+# Every match of every rule
+ALL = "all"
+# Longest match among those starting at the same position, the first rule on a tie.
+# Matches starting at different positions may overlap
+LONGEST = "longest"
+# Non-overlapping: the leftmost match wins, the longest one if several start there
+LONGEST_LEFTMOST = "longest_leftmost"
+# Non-overlapping: of overlapping matches the one whose label comes first
+# in `label_priority` wins, then the longest, then the leftmost one
+LABEL_PRIORITY = "label_priority"
+# Non-overlapping: of overlapping matches the one of the rule defined first wins
+FIRST_RULE = "first_rule"
+# Non-overlapping: the longest match wins, then the leftmost one, then the one of the rule defined first.
+# Same as spaCy's `filter_spans` (and `EntityRuler`); needs all the matches before yielding any
+LONGEST_FIRST = "longest_first"
+
+STRATEGIES = (ALL, LONGEST, LONGEST_LEFTMOST, LABEL_PRIORITY, FIRST_RULE, LONGEST_FIRST)
+
+ORDER = attrgetter("start", "rule_id")
+
+
+def validate(strategy: str) -> str:
+    if strategy not in STRATEGIES:
+        raise ValueError(
+            "Unknown overlap strategy: '{0}'. "
+            "Expected one of: {1}".format(strategy, ", ".join(STRATEGIES))
+        )
+    return strategy
+
+
+def merge(streams: Iterable[Iterable]) -> Iterator:
+    """
+    Merge per-rule match streams, each ordered by start, into one ordered by `(start, rule)`
+    """
+    return heapq.merge(*streams, key=ORDER)
+
+
+def _longest_per_start(matches):
+    for _, g in groupby(matches, attrgetter("start")):
+        best = next(g)
+        for m in g:
+            if m.end > best.end:
+                best = m
+        yield best
+
+
+def _sweep(matches, better: Callable):
+    """
+    Greedy left-to-right sweep: a match overlapping the current one
+    replaces it if `better(match, current)`, otherwise it is dropped
+    """
+    current = None
+    for m in matches:
+        if current is None:
+            current = m
+        elif m.start >= current.end:
+            yield current
+            current = m
+        elif better(m, current):
+            current = m
+    if current is not None:
+        yield current
+
+
+def _leftmost_longest(m, current) -> bool:
+    return m.start == current.start and m.end > current.end
+
+
+def _first_rule(m, current) -> bool:
+    return m.rule_id < current.rule_id
+
+
+def _by_label(label_priority: List[str]) -> Callable:
+    ranks: Dict[str, int] = {}
+    for i, label in enumerate(label_priority):
+        ranks.setdefault(label, i)
+    lowest = len(label_priority)
+
+    def better(m, current) -> bool:
+        return ((ranks.get(m.label, lowest), current.end - current.start) <
+                (ranks.get(current.label, lowest), m.end - m.start))
+    return better
+
+
+def _longest_first(matches):
+    taken: List = []
+    # Taken spans never overlap, so ordered by start they are ordered by end as well
+    starts: List[int] = []
+    for m in sorted(matches, key=lambda m: (m.start - m.end, m.start, m.rule_id)):
+        idx = bisect_right(starts, m.start)
+        if idx > 0 and taken[idx - 1].end > m.start:
+            continue
+        if idx < len(taken) and taken[idx].start < m.end:
+            continue
+        starts.insert(idx, m.start)
+        taken.insert(idx, m)
+    return iter(taken)
+
+
+def resolve(matches: Iterable, strategy: str = LONGEST, label_priority: Optional[List[str]] = None) -> Iterator:
+    """
+    Resolve overlaps in `matches` ordered by `(start, rule)` (see `merge`)
+    """
+    validate(strategy)
+    if strategy == ALL:
+        return iter(matches)
+    if strategy == LONGEST:
+        return _longest_per_start(matches)
+    if strategy == LONGEST_LEFTMOST:
+        return _sweep(matches, _leftmost_longest)
+    if strategy == FIRST_RULE:
+        return _sweep(matches, _first_rule)
+    if strategy == LONGEST_FIRST:
+        return _longest_first(matches)
+    return _sweep(matches, _by_label(label_priority or []))
@@ -0,0 +1,287 @@
+"""
+Literal prefilter for the standalone engine.
+
+Every compiled rule is analyzed once: which literals it cannot match without
+(eg. the words of `WORD`, one of the items of `IN_LIST`), whether it needs a digit
+(eg. `NUM`) and how short its match can be. A single cheap pass over a document
+then selects the rules which can possibly match it - all the others are skipped
+without running their regex.
+
+The analysis works on the generated regex itself (via Python's own regex parser),
+so it is available for rules loaded from a `.jsonl` file as well.
+"""
+import logging
+import re
+
+from typing import Dict, FrozenSet, List, NamedTuple, Optional, Set, Tuple
+
+try:
+    # Python 3.11+
+    from re import _parser as sre_parse  # type: ignore[attr-defined]
+    from re import _constants as sre_constants  # type: ignore[attr-defined]
+    from re._casefix import _EXTRA_CASES as CASE_FIXES  # type: ignore[import-not-found]
+except ImportError:
+    import sre_parse  # type: ignore[no-redef]
+    import sre_constants  # type: ignore[no-redef]
+    try:
+        from sre_compile import _ignorecase_fixes as CASE_FIXES  # type: ignore[attr-defined, no-redef]
+    except ImportError:
+        CASE_FIXES = None  # type: ignore[assignment]
+
+logger = logging.getLogger(__name__)
+
+WORD_TOKEN = re.compile(r"\w+")
+DIGIT = re.compile(r"\d")
+
+# `(text, is_word)` - a word literal is bounded by `\b` on both sides,
+# so it can be looked up in the set of text tokens instead of searched for
+Literal = Tuple[str, bool]
+# At least one literal of a clause has to be present in the text
+Clause = FrozenSet[Literal]
+
+REPEATS = tuple(getattr(sre_constants, name)
+                for name in ("MAX_REPEAT", "MIN_REPEAT", "POSSESSIVE_REPEAT")
+                if hasattr(sre_constants, name))
+
+
+def _fold_table() -> Optional[Dict[int, str]]:
+    """
+    Case-insensitive `re` treats some characters as equal even if their
+    `str.lower()` differs (eg. `s` and `ſ`). Map every such group
+    onto one character so folded literals are found in folded texts
+    """
+    if CASE_FIXES is None:
+        return None
+    # `str.lower()` gives "i̇" (two chars) here, `re` uses the simple mapping
+    table = {0x130: "i"}
+    for lower, extras in CASE_FIXES.items():
+        group = (lower,) + tuple(extras)
+        canonical = chr(min(group))
+        for c in group:
+            if chr(c) != canonical:
+                table[c] = canonical
+    return table
+
+
+FOLD_TABLE = _fold_table()
+
+
+def case_fold(text: str) -> str:
+    assert FOLD_TABLE is not None
+    return text.translate(FOLD_TABLE).lower().translate(FOLD_TABLE)
+
+
+class RuleRequirements(NamedTuple):
+    """
+    What a text must have for a rule to possibly match it
+    """
+    min_length: int
+    digit: bool
+    clauses: List[Clause]
+
+
+NO_REQUIREMENTS = RuleRequirements(0, False, [])
+
+
+class _Analyzer(object):
+    def __init__(self, ignore_case, words):
+        self.ignore_case = ignore_case
+        self.words = words
+
+    def best(self, clauses: List[Clause]) -> Optional[Clause]:
+        if len(clauses) == 0:
+            return None
+        return max(clauses, key=lambda c: min(len(text) for (text, _) in c))
+
+    def literal(self, run, bounded, word):
+        is_word = self.words and bounded and word and WORD_TOKEN.fullmatch(run) is not None
+        return frozenset([(case_fold(run) if self.ignore_case else run, is_word)])
+
+    def sequence(self, items, run="", bounded=False) -> Tuple[List[Clause], bool]:
+        clauses: List[Clause] = []
+        digit = False
+        # `\b` right after the run, and if the run has one inside
+        at_end = False
+        inner = False
+
+        for op, av in items:
+            if op is sre_constants.LITERAL:
+                if at_end:
+                    inner = True
+                    at_end = False
+                run += chr(av)
+                continue
+
+            if op is sre_constants.AT and av is sre_constants.AT_BOUNDARY:
+                # Zero-width, literals around it stay adjacent
+                if run:
+                    at_end = True
+                else:
+                    bounded = True
+                continue
+
+            if op is sre_constants.BRANCH:
+                # The parser moves a common prefix out of the branches,
+                # the pending run is glued back to every alternative
+                alts = [self.sequence(alt, run, bounded) for alt in av[1]]
+                best = [self.best(c) for (c, _) in alts]
+                if all(b is not None for b in best):
+                    clauses.append(frozenset().union(*best))  # type: ignore[arg-type]
+                digit = digit or all(d for (_, d) in alts)
+                run, bounded, at_end, inner = "", False, False, False
+                continue
+
+            if run:
+                clauses.append(self.literal(run, bounded, at_end and not inner))
+            run, at_end, inner = "", False, False
+
+            if op is sre_constants.SUBPATTERN:
+                (_, add_flags, _, p) = av
+                if add_flags & sre_constants.SRE_FLAG_IGNORECASE and not self.ignore_case:
+                    # Case-insensitive group inside case-sensitive rules
+                    bounded = False
+                    continue
+                (c, d) = self.sequence(p, bounded=bounded)
+                clauses.extend(c)
+                digit = digit or d
+            elif op in REPEATS:
+                (lo, _, p) = av
+                if lo >= 1:
+                    (c, d) = self.sequence(p)
+                    clauses.extend(c)
+                    digit = digit or d
+            elif op is getattr(sre_constants, "ATOMIC_GROUP", None):
+                (c, d) = self.sequence(av)
+                clauses.extend(c)
+                digit = digit or d
+            elif op is sre_constants.IN:
+                digit = digit or self.digits_only(av)
+            bounded = False
+
+        if run:
+            clauses.append(self.literal(run, bounded, at_end and not inner))
+        return clauses, digit
+
+    @staticmethod
+    def digits_only(items) -> bool:
+        if len(items) == 0:
+            return False
+        for op, av in items:
+            if op is sre_constants.CATEGORY and av is sre_constants.CATEGORY_DIGIT:
+                continue
+            if op is sre_constants.LITERAL and chr(av).isdigit():
+                continue
+            if op is sre_constants.RANGE and chr(av[0]).isdigit() and chr(av[1]).isdigit():
+                continue
+            return False
+        return True
+
+
+def _parse(regex_str: str, ignore_case: bool):
+    flags = sre_constants.SRE_FLAG_DOTALL
+    if ignore_case:
+        flags |= sre_constants.SRE_FLAG_IGNORECASE
+    return sre_parse.parse(regex_str, flags)
+
+
+def analyze(regex_str: str, ignore_case: bool, literals: bool = True, words: bool = True) -> RuleRequirements:
+    """
+    Find out what a text must contain for `regex_str` to match it.
+    Patterns Python's regex parser doesn't understand (eg. syntax specific
+    to the `regex` module) have no requirements - they always run
+    """
+    try:
+        parsed = _parse(regex_str, ignore_case)
+    except Exception as ex:
+        logger.debug("Cannot analyze pattern for the prefilter: {}".format(ex))
+        return NO_REQUIREMENTS
+
+    (min_length, _) = parsed.getwidth()
+    (clauses, digit) = _Analyzer(ignore_case, words).sequence(parsed.data)
+    if not literals:
+        clauses = []
+    return RuleRequirements(min_length, digit, clauses)
+
+
+def max_length(regex_str: str, ignore_case: bool) -> Optional[int]:
+    """
+    The longest match `regex_str` can produce, `None` if it is unbounded
+    """
+    try:
+        (_, hi) = _parse(regex_str, ignore_case).getwidth()
+    except Exception:
+        return None
+    if hi >= sre_constants.MAXREPEAT - 1:
+        return None
+    return hi
+
+
+class Prefilter(object):
+    """
+    Multi-rule literal index. `candidates(text)` returns indexes of rules
+    which can possibly match the text, without running any of their patterns.
+
+    Every rule is keyed by its most selective clause: word literals are looked up
+    by text tokens, other literals are searched for as substrings.
+    Candidates found via the key are then checked against the rest of the requirements
+    """
+    def __init__(self, requirements: List[RuleRequirements], ignore_case: bool):
+        self.requirements = requirements
+        self.fold = case_fold if ignore_case else str
+        self.always: List[int] = []
+        self.word_index: Dict[str, List[int]] = {}
+        self.substring_index: Dict[str, List[int]] = {}
+
+        for idx, req in enumerate(requirements):
+            if len(req.clauses) == 0:
+                self.always.append(idx)
+                continue
+            key = max(req.clauses, key=self._selectivity)
+            for (text, is_word) in key:
+                index = self.word_index if is_word else self.substring_index
+                index.setdefault(text, []).append(idx)
+
+    @staticmethod
+    def _selectivity(clause: Clause):
+        # Token lookups are cheapest, longer literals are more selective
+        return (all(is_word for (_, is_word) in clause),
+                min(len(text) for (text, _) in clause))
+
+    @staticmethod
+    def build(regex_strs: List[str], ignore_case: bool, exact_case_fold: bool = True) -> "Prefilter":
+        """
+        `exact_case_fold` - case-insensitive matching follows the stdlib `re` rules
+        (and `\\w`/`\\b` are the same as in `re`); literals are not used otherwise,
+        as a different case folding could make the prefilter skip a matching rule
+        """
+        literals = not ignore_case or (exact_case_fold and FOLD_TABLE is not None)
+        requirements = [analyze(regex_str, ignore_case, literals=literals, words=exact_case_fold)
+                        for regex_str in regex_strs]
+        return Prefilter(requirements, ignore_case)
+
+    def candidates(self, text: str) -> List[int]:
+        folded = self.fold(text)
+        tokens = set(WORD_TOKEN.findall(folded)) if self.word_index else set()
+        has_digit = DIGIT.search(text) is not None
+
+        keyed: Set[int] = set()
+        for token in tokens:
+            keyed.update(self.word_index.get(token, ()))
+        for literal, rules in self.substring_index.items():
+            if literal in folded:
+                keyed.update(rules)
+
+        def present(literal: Literal) -> bool:
+            (value, is_word) = literal
+            return value in tokens if is_word else value in folded
+
+        result = []
+        for idx in sorted(keyed.union(self.always)):
+            req = self.requirements[idx]
+            if len(text) < req.min_length:
+                continue
+            if req.digit and not has_digit:
+                continue
+            if all(any(present(literal) for literal in clause) for clause in req.clauses):
+                result.append(idx)
+        return result
@@ -0,0 +1,68 @@
+"""
+Pre-fork serving: rules are compiled once in the parent process and shared with forked workers
+(gunicorn with `preload_app`, `multiprocessing` / `concurrent.futures` pools with the `fork` start method).
+
+Forked workers share the parent's memory until they write to it. `preload` builds everything the executor
+would otherwise build lazily in every worker, then moves all objects of the parent into the permanent
+generation of the garbage collector (`gc.freeze`): collections in workers no longer touch them,
+so most of the shared pages stay shared. Usage:
+
+```python
+executor = preload(rita.compile("rules.rita", use_engine="standalone"))
+
+with ProcessPoolExecutor(mp_context=multiprocessing.get_context("fork"),
+                         initializer=init_worker, initargs=(executor,)) as pool:
+    pool.map(find_matches, texts)  # `worker_executor().execute(text)` in the worker
+```
+
+With gunicorn, call `preload` when the app module is loaded and `init_worker()` in the `post_fork` hook.
+"""
+import gc
+import logging
+
+from rita.engine import translate_standalone
+
+logger = logging.getLogger(__name__)
+
+# Executor of the last `preload` call, the default of `init_worker`
+_preloaded = None
+
+
+def preload(executor, freeze=True):
+    """
+    Get `executor` (`RuleExecutor` or `RustRuleExecutor`) ready to be inherited by forked workers:
+    every pattern compiled, lazily built state built. `freeze` - `gc.freeze()` everything allocated so far
+    """
+    global _preloaded
+    executor.wait_ready()
+    # Built on first use otherwise, separately in every worker
+    executor.query_order
+    executor.max_match_length
+    _preloaded = executor
+    if freeze:
+        gc.collect()
+        gc.freeze()
+        logger.debug("Frozen {} objects".format(gc.get_freeze_count()))
+    return executor
+
+
+def init_worker(executor=None):
+    """
+    Worker process initializer: `executor` (the preloaded one by default) becomes the `worker_executor`.
+    Inherited native state is rebuilt (see `RustRuleExecutor.after_fork`), nothing else is compiled.
+    With a non-fork start method `executor` arrives pickled and is compiled once here
+    """
+    executor = executor if executor is not None else _preloaded
+    if executor is None:
+        raise RuntimeError("No executor to initialize the worker with - call `preload` in the parent process first")
+    translate_standalone._init_forked_worker(executor)
+
+
+def worker_executor():
+    """
+    Executor of the current worker process, see `init_worker`
+    """
+    executor = translate_standalone._worker_executor
+    if executor is None:
+        raise RuntimeError("Worker is not initialized - use `init_worker` as the pool initializer")
+    return executor
@@ -1,15 +1,20 @@
+import copy
 import json
 import logging
 import os
 
+from collections import Counter
+from concurrent.futures import CancelledError
+from itertools import islice
 from platform import system
 
 from ctypes import (c_char_p, c_int, c_uint, c_long, Structure, cdll, POINTER)
 from typing import Any, TYPE_CHECKING, Tuple, List, AnyStr
 
-from rita.engine.translate_standalone import (rules_to_patterns, RuleExecutor,
-                                              ANCHOR_GROUP, BODY_GROUP)
+from rita.engine.translate_standalone import (rules_to_patterns, compile_patterns, BaseRuleExecutor,
+                                              group_roles, named_groups, LIST_SLOT)
 from rita.types import Rules
+from rita.utils import ByteOffsets
 
 logger = logging.getLogger(__name__)
 
@@ -78,26 +83,22 @@ def load_lib():
                      "or install it into a standard library location".format(ex))
 
 
-def _byte_to_char_offsets(encoded: bytes):
+class RustRuleExecutor(BaseRuleExecutor):
     """
-    The rust engine works on UTF-8 bytes, so all offsets it reports
-    are byte offsets. Build a byte-offset -> char-offset mapping so
-    results can index into the original Python string.
+    Runs all the rules in one native context. Shares `BaseRuleExecutor` with the standalone engine,
+    APIs built on Python regex matches (`execute_matches`, `execute_stream`, `execute_bytes`, ...) are not there
     """
-    decoded = encoded.decode("UTF-8")
-    mapping = {}
-    byte_idx = 0
-    for char_idx, ch in enumerate(decoded):
-        mapping[byte_idx] = char_idx
-        byte_idx += len(ch.encode("UTF-8"))
-    mapping[byte_idx] = len(decoded)
-    return mapping
-
-
-class RustRuleExecutor(RuleExecutor):
-    def __init__(self, patterns, config: "SessionConfig"):
+    def __init__(self, patterns, config: "SessionConfig", max_workers=None, lists=None):
+        # `max_workers` is the default process count of `execute_many`.
+        # `lists` - `{list id: items}` of list slots in `patterns` (saved by the standalone engine),
+        # there are no per-text lookups here - slots are filled with whole lists
         self.config = config
+        self.max_workers = max_workers
         self.context = None
+        # Process the native context was compiled in, it is not used in forked children
+        self._context_pid = None
+        # A `subset` view runs the native context of its executor, but doesn't free it
+        self._owns_context = False
 
         lib = load_lib()
         if lib is None:
@@ -107,16 +108,25 @@ class RustRuleExecutor(RuleExecutor):
             )
         self.lib = lib
         self.raw_patterns = patterns
-        self.patterns = [self._build_regex_str(label, rules)
-                         for label, rules in patterns]
+        # Read by `BaseRuleExecutor` (`__iter__`, `save`, pickling): all the rules are active, see `subset`
+        self.active = None
+        self.lists = {int(list_id): items for list_id, items in (lists or {}).items()}
+        self.patterns = [self._build_pattern(label, rules) for label, rules in patterns]
+        self.group_roles = [group_roles(named_groups(p)) for p in self.patterns]
+        # Rust reports submatches by name, roles of a name are the same in every rule
+        self.anchor_groups = frozenset(name for roles in self.group_roles for (_, name) in roles.anchors)
+        self.body_groups = frozenset(name for roles in self.group_roles for (_, name) in roles.body)
 
         self.compile()
 
-    @staticmethod
-    def _build_regex_str(label, rules):
-        indexed_rules = ["(?P<s{}>{})".format(i, r) if not r.startswith("(?P<") else r
-                         for i, r in enumerate(rules)]
-        return r"(?P<{0}>{1})".format(label, "".join(indexed_rules))
+    def _build_pattern(self, label, rules):
+        regex_str = self._build_regex_str(label, rules)
+        missing = sorted({int(list_id) for list_id in LIST_SLOT.findall(regex_str)} - set(self.lists))
+        if missing:
+            raise ValueError(
+                "Rule '{0}' refers to lists {1} which are not given".format(label, ", ".join(map(str, missing)))
+            )
+        return self._fill_lists(regex_str, self.lists)
 
     def compile(self):  # pyright: ignore[reportIncompatibleMethodOverride]
         flag = 0 if self.config.ignore_case else 1
@@ -124,19 +134,73 @@ class RustRuleExecutor(RuleExecutor):
         self.context = self.lib.compile(c_array, len(c_array), flag)
         if not self.context:
             raise RuntimeError("rita-rust failed to compile the given rules")
+        self._context_pid = os.getpid()
+        self._owns_context = True
         return self.context
 
-    def execute(self, text, include_submatches=True):
+    def after_fork(self):
+        """
+        Compile a fresh native context in a forked child. The inherited one is a copy
+        of the parent's and is left alone - it is neither used nor freed here,
+        native state (eg. locks held by other threads at fork time) can't be trusted
+        """
+        if self._context_pid != os.getpid():
+            self.context = None
+            self.compile()
+        return self
+
+    def execute(self, text, include_submatches=True, max_matches=None, labels=None):
+        results = self._results(text, include_submatches)
+        if self.active is not None:
+            active = {self.raw_patterns[idx][0] for idx in self.active}
+            labels = active if labels is None else active.intersection(labels)
+        try:
+            selected = results
+            if labels is not None:
+                # All rules are compiled into one native context, others are only filtered out
+                selected = (r for r in results if r["label"] in labels)
+            yield from islice(selected, max_matches)
+        finally:
+            # Frees the rust result right away if not all of it was read
+            results.close()
+
+    def _execute_until(self, text, cancelled, include_submatches=True, max_matches=None, labels=None):
+        # The native engine runs all rules in one call - cancellation is checked between results
+        for result in self.execute(text, include_submatches=include_submatches,
+                                   max_matches=max_matches, labels=labels):
+            if cancelled.is_set():
+                raise CancelledError()
+            yield result
+
+    def has_match(self, text):
+        # The rust engine has no search-only entry point, but it is compiled code
+        # and matches are only converted to Python up to the first one
+        return self.first_match(text, include_submatches=False) is not None
+
+    def first_match(self, text, include_submatches=True):
+        return next(self.execute(text, include_submatches=include_submatches, max_matches=1), None)
+
+    def labels_present(self, text):
+        return {result["label"] for result in self.execute(text, include_submatches=False)}
+
+    def count_by_label(self, text):
+        return dict(Counter(result["label"] for result in self.execute(text, include_submatches=False)))
+
+    def _results(self, text, include_submatches):
+        if self._context_pid != os.getpid():
+            self.after_fork()
         encoded = text.encode("UTF-8")
         result_ptr = self.lib.execute(self.context, encoded)
         if not result_ptr:
             raise RuntimeError("rita-rust failed to execute rules on the given text")
 
-        if len(encoded) != len(text):
-            offsets = _byte_to_char_offsets(encoded)
+        anchor_groups = self.anchor_groups
+        body_groups = self.body_groups
 
-            def conv(idx):
-                return offsets[idx]
+        # The rust engine works on UTF-8 bytes, so all offsets
+        # it reports are byte offsets
+        if len(encoded) != len(text):
+            conv = ByteOffsets(encoded)
         else:
             def conv(idx):
                 return idx
@@ -171,10 +235,10 @@ class RustRuleExecutor(RuleExecutor):
                         }
 
                 subs = list(parse_subs())
-                if any(ANCHOR_GROUP.match(s["key"]) for s in subs):
+                if any(s["key"] in anchor_groups for s in subs):
                     # Anchor tokens are required context, excluded from
                     # the result - report the span of the body groups only
-                    body = [s for s in subs if BODY_GROUP.match(s["key"])]
+                    body = [s for s in subs if s["key"] in body_groups]
                     if len(body) == 0:
                         continue
                     start = min(s["start"] for s in body)
@@ -189,14 +253,33 @@ class RustRuleExecutor(RuleExecutor):
                     "text": text[start:end].strip(),
                     "label": match.label.decode("UTF-8"),
                     "submatches": [s for s in subs
-                                   if not ANCHOR_GROUP.match(s["key"])] if include_submatches else []
+                                   if s["key"] not in anchor_groups] if include_submatches else []
                 }
         finally:
             self.lib.clean_result(result_ptr)
 
+    def _options(self):
+        return {"max_workers": self.max_workers, "lists": self.lists}
+
+    def subset(self, labels):
+        """
+        A view of this executor running only the rules of `labels`.
+        All rules share one native context, results of other labels are filtered out
+        """
+        unknown = set(labels).difference(label for label, _ in self.raw_patterns)
+        if unknown:
+            raise ValueError("Unknown labels: {}".format(", ".join(sorted(unknown))))
+        rules = frozenset(idx for idx, (label, _) in enumerate(self.raw_patterns) if label in labels)
+        view = copy.copy(self)
+        view.active = rules if self.active is None else rules.intersection(self.active)
+        view._owns_context = False
+        return view
+
     def clean_context(self):
         if self.context is not None and self.lib is not None:
-            self.lib.clean_env(self.context)
+            # A context inherited from the parent process belongs to it
+            if self._context_pid == os.getpid() and self._owns_context:
+                self.lib.clean_env(self.context)
             self.context = None
 
     def __del__(self):
@@ -206,19 +289,28 @@ class RustRuleExecutor(RuleExecutor):
             pass
 
     @staticmethod
-    def load(path, regex_impl=None):  # `regex_impl` is unused, kept for signature compatibility
+    def load(path, regex_impl=None, max_workers=None):  # `regex_impl` is unused, kept for signature compatibility
         from rita.config import SessionConfig
         config = SessionConfig()
         with open(path, "r") as f:
-            # Skip non-rule lines, eg. the config header written by the standalone engine
-            patterns = [(obj["label"], obj["rules"])
-                        for obj in map(json.loads, filter(str.strip, f.readlines()))
-                        if "label" in obj and "rules" in obj]
-            return RustRuleExecutor(patterns, config)
+            objs = [json.loads(line) for line in filter(str.strip, f.readlines())]
+        # Skip other lines, eg. the config header written by the standalone engine
+        patterns = [(obj["label"], obj["rules"]) for obj in objs if "label" in obj and "rules" in obj]
+        lists = {obj["list"]: obj["items"] for obj in objs if "list" in obj and "items" in obj}
+        return RustRuleExecutor(patterns, config, max_workers=max_workers, lists=lists)
 
 
 def compile_rules(rules: Rules, config: "SessionConfig", **kwargs) -> RustRuleExecutor:
     logger.info("Using rita-rust rule implementation")
-    patterns = [rules_to_patterns(*group, config=config) for group in rules]
+    workers = kwargs.get("compile_workers")
+    try:
+        if workers and workers > 1:
+            # Rust compiles the regexes itself, only pattern sources are built in parallel
+            (patterns, _) = compile_patterns(list(rules), config, workers)
+        else:
+            patterns = [rules_to_patterns(*group, config=config) for group in rules]
+    finally:
+        # Patterns of shared lists are part of the rule patterns by now
+        config.clear_list_patterns()
     executor = RustRuleExecutor(patterns, config)
     return executor
@@ -1,13 +1,30 @@
+import copy
 import logging
+import mmap
+import os
 import re
 import json
+import threading
 
+from collections import Counter, OrderedDict, deque
+from concurrent.futures import CancelledError, Future, wait, FIRST_COMPLETED
 from functools import partial
-from itertools import groupby, chain
-from typing import Any, TYPE_CHECKING, Mapping, Callable
+from importlib import import_module
+from itertools import chain, islice
+from typing import Any, TYPE_CHECKING, Mapping, Callable, List, NamedTuple, Optional, Tuple
 
-from rita.utils import ExtendedOp
+from rita.utils import ExtendedOp, ByteOffsets
 from rita.types import Rules, Patterns
+from rita.engine import overlap as overlap_strategies
+from rita.engine.lookup import ListIndex, text_words
+from rita.engine.prefilter import FOLD_TABLE, Prefilter, case_fold, max_length
+
+try:
+    # Python 3.11+
+    from re import _compiler as sre_compiler, _parser as sre_parser  # type: ignore[attr-defined]
+except ImportError:
+    import sre_compile as sre_compiler  # type: ignore[no-redef]
+    import sre_parse as sre_parser  # type: ignore[no-redef]
 
 logger = logging.getLogger(__name__)
 
@@ -25,8 +42,21 @@ class RuleCompileError(Exception):
     """
 
 
+# `execute_stream` overlap between chunks when some rules have no maximum match length
+DEFAULT_STREAM_WINDOW = 4096
+
+# Compiled patterns with filled list slots kept per executor, see `RuleExecutor._pattern_for`
+LOOKUP_PATTERNS_CACHE = 256
+
 VALID_LABEL = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
 
+# When `RuleExecutor` compiles rule patterns: all of them upfront,
+# every one on its first use, or in a background thread (and on first use, whichever comes first)
+EAGER = "eager"
+LAZY = "lazy"
+BACKGROUND = "background"
+COMPILE_MODES = (EAGER, LAZY, BACKGROUND)
+
 # Matches bare regex metacharacters, but not ones which are already
 # escaped (eg. `J\.` produced by rita.modules.names must stay as-is)
 BARE_METACHAR = re.compile(r"(?<!\\)([.^$*+?{}\[\]()|])")
@@ -55,6 +85,91 @@ def bound_literal(value: str) -> str:
     return escaped
 
 
+# An escaped character or a single one - the units a trie of escaped literals is built from
+LITERAL_ATOM = re.compile(r"\\.|.", re.DOTALL)
+
+# Trie key of the end of a literal, its value is the closing boundary (`\b` or nothing)
+TRIE_END = ""
+
+# Characters which can't be put in a character class as is
+CLASS_SPECIAL = set("\\]^-[")
+
+
+def is_word_char(c: str) -> bool:
+    return c.isalnum() or c == "_"
+
+
+def trie_alternation(values, fold_case=False) -> str:
+    """
+    Alternation of `bound_literal(value)` for every value, factored into a trie by common prefixes:
+    `\\bca(?:r(?:pet\\b|s\\b|\\b)|t\\b)` instead of `\\bcarpet\\b|\\bcars\\b|\\bcar\\b|\\bcat\\b`.
+    Matches the same texts as the flat alternation and, the same way, prefers the longest value.
+    `fold_case` - the regex is compiled with IGNORECASE, values differing only by case are merged.
+    Case is folded as `re` does it (eg. "ſ" is "s", see `rita.engine.prefilter.case_fold`), only `str.lower`
+    if that can't be done here - which is exact for ASCII values only
+    """
+    fold = case_fold if FOLD_TABLE is not None else str.lower
+    root: dict = {}
+    for value in values:
+        if fold_case:
+            folded = fold(value)
+            if len(folded) == len(value):
+                value = folded
+        node = root
+        if value and is_word_char(value[0]):
+            node = node.setdefault(r"\b", {})
+        for atom in LITERAL_ATOM.findall(escape_literal(value)):
+            node = node.setdefault(atom, {})
+        node[TRIE_END] = r"\b" if value and is_word_char(value[-1]) else ""
+    return _trie_regex(root)
+
+
+def _trie_regex(node: dict) -> str:
+    # A chain of single children is a plain sequence
+    prefix = []
+    while len(node) == 1 and TRIE_END not in node:
+        ((atom, node),) = node.items()
+        prefix.append(atom)
+
+    end = node.get(TRIE_END)
+    # Single character literal endings with the same boundary become a character class
+    leaves: dict = {}
+    alts = []
+    for atom in sorted(a for a in node if a != TRIE_END):
+        child = node[atom]
+        if len(child) == 1 and TRIE_END in child and len(atom) == 1 and atom not in CLASS_SPECIAL:
+            leaves.setdefault(child[TRIE_END], []).append(atom)
+        else:
+            alts.append(atom + _trie_regex(child))
+    for (boundary, chars) in sorted(leaves.items()):
+        alts.append((chars[0] if len(chars) == 1 else "[{}]".format("".join(chars))) + boundary)
+
+    if not alts:
+        body = end or ""
+    elif end is None:
+        body = alts[0] if len(alts) == 1 else "(?:{})".format("|".join(alts))
+    elif end == "":
+        # Continuing is tried first, so the longest literal wins - as in the flat alternation
+        body = "(?:{})?".format("|".join(alts))
+    else:
+        body = "(?:{0}|{1})".format("|".join(alts), end)
+    return "".join(prefix) + body
+
+
+def list_alternation(items, config: "SessionConfig") -> str:
+    """
+    Alternation of list items, longest first. Lists of at least `list_trie_threshold` items
+    (a config value, `!CONFIG("list_trie_threshold", "N")` disables it) are compiled into a trie
+    """
+    (threshold, ignore_case) = (config.list_trie_threshold, config.ignore_case)
+    # Without `re` case folding at hand, other characters could end up in separate branches of the trie
+    exact_fold = not ignore_case or FOLD_TABLE is not None or all(item.isascii() for item in items)
+    if threshold and len(items) >= int(threshold) and exact_fold:
+        return trie_alternation(items, fold_case=ignore_case)
+    # Sorted by the length of the item, not of its escaped form: `\bab\b` must not be tried before `\bab-`
+    return "|".join(bound_literal(item) for item in sorted(items, key=lambda x: (-len(x), x)))
+
+
 def apply_operator(syntax, op: ExtendedOp) -> str:
     if op.empty():
         return syntax
@@ -67,17 +182,52 @@ def apply_operator(syntax, op: ExtendedOp) -> str:
 
 
 def any_of_parse(lst, config: "SessionConfig", op: ExtendedOp) -> str:
-    alts = "|".join(sorted([bound_literal(item) for item in lst],
-                           key=lambda x: (-len(x), x)))
-    if str(op) == "!":
+    # Built once per list and operator while compiling, rules of a shared list share the pattern string
+    alts = config.list_pattern(lst, "alternation", lambda: list_alternation(lst, config))
+    return config.list_pattern(lst, str(op), lambda: _any_of_syntax(alts, str(op)))
+
+
+def _any_of_syntax(alts: str, op: str) -> str:
+    if op == "!":
         # Negation has to be built from the raw alternatives:
         # the `(^|\s)` prefix used below can never match mid-pattern
         # and would make the lookahead pass for any word
         return r"((?!(?:{0}))\w+)".format(alts)
+    return any_of_clause(alts, ExtendedOp(op or None))
+
+
+def any_of_clause(alts: str, op: ExtendedOp) -> str:
     clause = r"((^|\s)(({0})\s?))".format(alts)
     return apply_operator(clause, op)
 
 
+# Where the alternation of a list looked up per text goes (see `rita.engine.lookup`):
+# until it is filled, any text up to the length of the longest item
+LIST_SLOT = re.compile(r"\(\?:\(\?#list(\d+)\)\.\{0,\d+\}\)")
+
+
+def list_slot(list_id: int, max_length: int) -> str:
+    return "(?:(?#list{0}).{{0,{1}}})".format(list_id, max_length)
+
+
+def list_parse(value, config: "SessionConfig", op: ExtendedOp) -> str:
+    (list_id, max_length) = value
+    return any_of_clause(list_slot(list_id, max_length), op)
+
+
+# A list slot filled with a named list of the third-party `regex` module, items are passed to `compile`.
+# Word boundaries as of `bound_literal`: only next to a word character of the item
+NAMED_LIST = r"(?:(?=\w)\b|(?!\w))\L<list{0}>(?:(?<=\w)\b|(?<!\w))"
+
+
+def supports_named_lists(regex_impl) -> bool:
+    try:
+        regex_impl.compile(r"\L<items>", items=["a"])
+    except Exception:
+        return False
+    return True
+
+
 def regex_parse(r, config: "SessionConfig", op: ExtendedOp) -> str:
     if not r:
         raise RuleCompileError("Empty regex pattern")
@@ -164,12 +314,70 @@ PARSERS: Mapping[str, ParseFn] = {
     "fuzzy": fuzzy_parse,
     "phrase": phrase_parse,
     "nested": nested_parse,
+    "list": list_parse,
 }
 
 
 BODY_GROUP = re.compile(r"^[sg]\d+$")
 ANCHOR_GROUP = re.compile(r"^a\d+$")
 
+# Capturing groups (named or not), escapes and character classes
+# which may hold a literal `(` - used to make a rule non-capturing
+CAPTURING_GROUP = re.compile(r"\\.|\[(?:\\.|[^\]\\])*\]|\(\?P<\w+>|\((?!\?)")
+# Backreferences and conditionals depend on group names/numbers
+# which change in a combined pattern - such rules are never merged
+BACKREFERENCE = re.compile(r"\(\?P=|\(\?\(|(?<!\\)\\[1-9]")
+
+
+# `(group index, group name)`
+Group = Tuple[int, str]
+
+
+class GroupRoles(NamedTuple):
+    """
+    Named groups of a rule pattern by their role, ordered by group index
+    """
+    # Tokens of the match itself (`s0`, `g1`, ...)
+    body: Tuple[Group, ...]
+    # Required context, excluded from the result (`a0`, ...)
+    anchors: Tuple[Group, ...]
+    # Everything reported as a submatch - all but the anchors
+    submatches: Tuple[Group, ...]
+
+
+def group_roles(groupindex: Mapping[str, int]) -> GroupRoles:
+    groups = sorted((idx, name) for name, idx in groupindex.items())
+    return GroupRoles(
+        body=tuple(g for g in groups if BODY_GROUP.match(g[1])),
+        anchors=tuple(g for g in groups if ANCHOR_GROUP.match(g[1])),
+        submatches=tuple(g for g in groups if not ANCHOR_GROUP.match(g[1])),
+    )
+
+
+def non_capturing(regex_str: str) -> str:
+    """
+    Turn every capturing group into a non-capturing one.
+    Combined scan patterns only answer "is there a match and where",
+    and saving group marks on every alternative would dominate their cost
+    """
+    return CAPTURING_GROUP.sub(lambda m: "(?:" if m.group(0)[0] == "(" else m.group(0), regex_str)
+
+
+def named_groups(regex_str: str) -> Mapping[str, int]:
+    """
+    `{name: group index}` of a regex string, without compiling it
+    """
+    groups = {}
+    idx = 0
+    for m in CAPTURING_GROUP.finditer(regex_str):
+        token = m.group(0)
+        if token[0] != "(":
+            continue
+        idx += 1
+        if token.startswith("(?P<"):
+            groups[token[4:-1]] = idx
+    return groups
+
 
 def validate_anchor_positions(label: str, data: Patterns) -> None:
     flags = [isinstance(op, ExtendedOp) and op.anchor for (_, _, op) in data]
@@ -207,114 +415,821 @@ def rules_to_patterns(label: str, data: Patterns, config: "SessionConfig"):
     )
 
 
-class RuleExecutor(object):
-    def __init__(self, patterns, config, regex_impl=re, max_workers=None, match_timeout=None):
-        # `max_workers` is kept for backwards compatibility and is unused:
-        # matching runs sequentially, which is faster for GIL-bound regex
-        # and keeps result order deterministic
+def group_id_count(data: Patterns, config: "SessionConfig") -> Tuple[int, int]:
+    """
+    `(nested, anchor)` group ids `rules_to_patterns` takes for `data`, without building anything
+    """
+    from rita.macros import resolve_value
+    nested = anchors = 0
+    for (t, d, op) in data:
+        if t == "nested":
+            (n, a) = group_id_count([resolve_value(v, config=config) for v in d], config)
+            nested += n + 1
+            anchors += a
+        if isinstance(op, ExtendedOp) and op.anchor:
+            anchors += 1
+    return nested, anchors
+
+
+def regex_flags(regex_impl, config: "SessionConfig"):
+    flags = regex_impl.DOTALL
+    if config.ignore_case:
+        flags = flags | regex_impl.IGNORECASE
+    return flags
+
+
+def check_label(label: str) -> None:
+    if not VALID_LABEL.match(label):
+        raise RuleCompileError(
+            "Invalid rule label: '{0}'. "
+            "A label must be a valid regex group name: "
+            "letters, digits and underscores, not starting with a digit".format(label)
+        )
+
+
+class LazyPatterns(object):
+    """
+    Compiled patterns of a `RuleExecutor` with `compile="lazy"` or `compile="background"`.
+    A pattern is compiled when it is read for the first time - if the background thread
+    is compiling it right then, the reader waits for that one pattern only.
+    `ready` is done once all of them are compiled, or fails with the first compile error
+    """
+    def __init__(self, executor):
+        self._compile = executor.compile
+        self._sources = executor.raw_patterns
+        self._compiled: List[Any] = [None] * len(self._sources)
+        self._locks = [threading.Lock() for _ in self._sources]
+        self._remaining = len(self._sources)
+        self._count_lock = threading.Lock()
+        self.ready: Future = Future()
+        if not self._sources:
+            self.ready.set_result(None)
+        self._thread = None
+
+    def start(self):
+        """
+        Compile all the patterns in a background thread
+        """
+        self._thread = threading.Thread(target=self._compile_all, name="rita-compile", daemon=True)
+        self._thread.start()
+
+    def __len__(self):
+        return len(self._compiled)
+
+    def __getitem__(self, idx):
+        pattern = self._compiled[idx]
+        if pattern is None:
+            pattern = self._load(idx)
+        return pattern
+
+    def __iter__(self):
+        for idx in range(len(self)):
+            yield self[idx]
+
+    def _load(self, idx):
+        with self._locks[idx]:
+            pattern = self._compiled[idx]
+            if pattern is None:
+                pattern = self._compile(*self._sources[idx])
+                self._compiled[idx] = pattern
+                with self._count_lock:
+                    self._remaining -= 1
+                    if self._remaining == 0:
+                        self.ready.set_result(None)
+        return pattern
+
+    def _compile_all(self):
+        error = None
+        for idx in range(len(self)):
+            try:
+                self[idx]
+            except Exception as ex:
+                logger.debug("Background compilation of rule {0} failed: {1}".format(idx, ex))
+                error = error or ex
+        if error is not None:
+            self.ready.set_exception(error)
+
+    def wait(self, timeout=None):
+        if self._thread is None:
+            # Nothing compiles them otherwise
+            for idx in range(len(self)):
+                self[idx]
+        self.ready.result(timeout)
+
+
+class BaseRuleExecutor(object):
+    """
+    What every regex rule executor has, whatever runs the rules (see `RustRuleExecutor`):
+    its rules (`raw_patterns`, the `active` ones of them), `save`, pickling and `execute_many`
+    """
+    @staticmethod
+    def _build_regex_str(label, rules):
+        indexed_rules = ["(?P<s{}>{})".format(i, r) if not r.startswith("(?P<") else r
+                         for i, r in enumerate(rules)]
+        return r"(?P<{0}>{1})".format(label, "".join(indexed_rules))
+
+    @property
+    def ready(self) -> Future:
+        """
+        `concurrent.futures.Future` done once every pattern is compiled
+        """
+        future: Future = Future()
+        future.set_result(None)
+        return future
+
+    def after_fork(self):
+        """
+        Called in a forked worker process which inherited this executor, see `rita.engine.preload`
+        """
+        return self
+
+    def wait_ready(self, timeout=None):
+        """
+        Block until every pattern is compiled, raise the first compile error
+        """
+
+    def _fill_lists(self, regex_str, found):
+        """
+        `regex_str` with alternations of `found` (`{list id: items}`) in its list slots
+        """
+        def fill(m):
+            items = found[int(m.group(1))]
+            return "(?:{})".format(list_alternation(items, self.config) if items else "(?!)")
+        return LIST_SLOT.sub(fill, regex_str)
+
+    def execute_many(self, texts, workers=None, chunksize=1, ordered=True, include_submatches=True):
+        """
+        Execute rules over an iterable of texts using a pool of `workers` processes
+        (defaults to `max_workers`, then to the CPU count), `chunksize` texts per task.
+        Forked workers inherit this executor, with other start methods every worker rebuilds it once, at pool startup.
+
+        Yields a list of results per text, in input order - or `(index, results)`
+        as soon as they are ready if `ordered=False`.
+        Texts are read lazily: only a couple of chunks per worker are in flight at a time
+        """
+        workers = workers or self.max_workers or os.cpu_count() or 1
+        if workers == 1:
+            for idx, text in enumerate(texts):
+                results = list(self.execute(text, include_submatches=include_submatches))
+                yield results if ordered else (idx, results)
+            return
+
+        # `multiprocessing` is heavy to import, load-only users never need it
+        import multiprocessing
+        from concurrent.futures import ProcessPoolExecutor
+
+        if multiprocessing.get_context().get_start_method() == "fork":
+            # Forked workers inherit this executor as it is, nothing is compiled again
+            self.wait_ready()
+            (initializer, initargs) = (_init_forked_worker, (self,))
+        else:
+            (initializer, initargs) = (_init_worker, self.__reduce__()[1])
+
+        chunks = _chunked(texts, chunksize)
+        max_pending = workers * 2
+        pool = ProcessPoolExecutor(max_workers=workers, initializer=initializer, initargs=initargs)
+        try:
+            if ordered:
+                queue = deque()
+                for (start, chunk) in chunks:
+                    queue.append(pool.submit(_execute_chunk, chunk, include_submatches))
+                    if len(queue) >= max_pending:
+                        yield from queue.popleft().result()
+                while queue:
+                    yield from queue.popleft().result()
+            else:
+                pending = {}
+                for (start, chunk) in islice(chunks, max_pending):
+                    pending[pool.submit(_execute_chunk, chunk, include_submatches)] = start
+                while pending:
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        start = pending.pop(future)
+                        for offset, results in enumerate(future.result()):
+                            yield start + offset, results
+                    for (start, chunk) in islice(chunks, len(done)):
+                        pending[pool.submit(_execute_chunk, chunk, include_submatches)] = start
+        finally:
+            pool.shutdown(wait=True, cancel_futures=True)
+
+    def __reduce__(self):
+        # Compiled patterns can't be pickled - rules are compiled again on the other side.
+        # Only the active rules of a `subset`, in the same order
+        return _restore_executor, (type(self), self._active_patterns(), {"ignore_case": self.config.ignore_case},
+                                   self._options())
+
+    def __copy__(self):
+        # Shallow copy shares compiled state, `__reduce__` would compile everything again.
+        # Per-run state of list lookups is its own, so a copy can run in another thread
+        clone = object.__new__(type(self))
+        clone.__dict__.update(self.__dict__)
+        if "_lookup_patterns" in self.__dict__:
+            clone._reset_lookups()
+        return clone
+
+    def _active_patterns(self):
+        if self.active is None:
+            return self.raw_patterns
+        return [self.raw_patterns[idx] for idx in sorted(self.active)]
+
+    def save(self, path):
+        with open(path, "w") as f:
+            f.write("{0}\n".format(json.dumps({
+                "config": {"ignore_case": self.config.ignore_case}
+            })))
+            for list_id, items in sorted(self.lists.items()):
+                f.write("{0}\n".format(json.dumps({"list": list_id, "items": items})))
+            for pattern in self:
+                f.write("{0}\n".format(json.dumps(pattern)))
+
+    def __iter__(self):
+        for label, rules in self._active_patterns():
+            yield {"label": label, "rules": rules}
+
+    def _options(self):
+        """
+        Keyword arguments needed to rebuild this executor in another process
+        """
+        return {"max_workers": self.max_workers}
+
+
+class RuleExecutor(BaseRuleExecutor):
+    def __init__(self, patterns, config, regex_impl=re, max_workers=None, match_timeout=None,
+                 combined_scan=None, prefilter=False, overlap=overlap_strategies.LONGEST, label_priority=None,
+                 compiled=None, compile=EAGER, lists=None, named_lists=False):
+        # `max_workers` is the default process count of `execute_many`:
+        # a single `execute` runs sequentially, which is faster for GIL-bound regex
+        # and keeps result order deterministic.
+        # `compiled` - already compiled pattern objects of `patterns`, see `compile_patterns`.
+        # `compile` - when patterns are compiled, see `COMPILE_MODES`.
+        # `lists` - `{list id: items}` of lists kept out of rule patterns, see `extract_lists`.
+        # `named_lists` - lists are compiled as named lists (`\L<name>`) instead of being looked up per text
+        if compile not in COMPILE_MODES:
+            raise ValueError(
+                "Unknown compile mode: '{0}'. "
+                "Expected one of: {1}".format(compile, ", ".join(COMPILE_MODES))
+            )
+        if named_lists and not supports_named_lists(regex_impl):
+            raise ValueError(
+                "Named lists are not supported by '{0}', "
+                "use the third-party `regex` module (pass `regex_impl=regex`)".format(regex_impl.__name__)
+            )
         self.config = config
         self.regex_impl = regex_impl
+        self.max_workers = max_workers
         self.match_timeout = match_timeout
-        self.patterns = [self.compile(label, rules)
-                         for label, rules in patterns]
+        # Default overlap strategy, see `rita.engine.overlap`
+        self.overlap = overlap_strategies.validate(overlap)
+        self.label_priority = label_priority
         self.raw_patterns = patterns
+        self.named_lists = named_lists
+        self._build_lookups(lists)
+        self.compile_mode = EAGER if compiled is not None else compile
+        if self.compile_mode == EAGER:
+            if compiled is None:
+                compiled = [self.compile(label, rules)
+                            for label, rules in patterns]
+            self.patterns = compiled
+            # Custom regex_impl pattern objects may not expose `groupindex`
+            self.group_roles = [group_roles(getattr(pattern, "groupindex", {}))
+                                for pattern in self.patterns]
+        else:
+            # Invalid labels still fail here, invalid patterns - on first use
+            for label, _ in patterns:
+                check_label(label)
+            self.patterns = LazyPatterns(self)
+            self.group_roles = [group_roles(named_groups(self._build_regex_str(label, rules)))
+                                for label, rules in patterns]
+        # Every distinct label is stored once, matches refer to it by index
+        label_ids: dict = {}
+        self.label_ids = [label_ids.setdefault(label, len(label_ids)) for label, _ in patterns]
+        self.labels = list(label_ids)
+        # Rule indexes of every label
+        self.label_index: dict = {}
+        for idx, (label, _) in enumerate(patterns):
+            self.label_index.setdefault(label, []).append(idx)
+        # Rules this executor runs, `None` - all of them (see `subset`)
+        self.active = None
+        self.combined_scan = combined_scan
+        self._batches = self._build_batches(combined_scan) if combined_scan else None
+        self.prefilter = self._build_prefilter() if prefilter else None
+        if self.compile_mode == BACKGROUND:
+            # Started last, so it doesn't slow down the rest of the setup
+            self.patterns.start()
+
+    def _flags(self):
+        return regex_flags(self.regex_impl, self.config)
 
     def compile(self, label, rules):
-        if not VALID_LABEL.match(label):
-            raise RuleCompileError(
-                "Invalid rule label: '{0}'. "
-                "A label must be a valid regex group name: "
-                "letters, digits and underscores, not starting with a digit".format(label)
-            )
-
-        flags = self.regex_impl.DOTALL
-        if self.config.ignore_case:
-            flags = flags | self.regex_impl.IGNORECASE
-
-        indexed_rules = ["(?P<s{}>{})".format(i, r) if not r.startswith("(?P<") else r
-                         for i, r in enumerate(rules)]
-        regex_str = r"(?P<{0}>{1})".format(label, "".join(indexed_rules))
+        check_label(label)
+        regex_str = self._build_regex_str(label, rules)
+        named: dict = {}
+        if self.named_lists:
+            (regex_str, named) = self._fill_named_lists(regex_str)
         try:
-            return self.regex_impl.compile(regex_str, flags)
+            return self.regex_impl.compile(regex_str, self._flags(), **named)
         except Exception as ex:
             raise RuleCompileError(
                 "Failed to compile rule '{0}': {1}\n"
                 "Generated pattern: {2}".format(label, ex, regex_str)
             ) from ex
 
-    def _finditer(self, pattern, text):
+    @property
+    def ready(self) -> Future:
+        """
+        `concurrent.futures.Future` done once every pattern is compiled (see `compile` modes)
+        """
+        if isinstance(self.patterns, LazyPatterns):
+            return self.patterns.ready
+        return super().ready
+
+    def wait_ready(self, timeout=None):
+        """
+        Block until every pattern is compiled, raise the first compile error.
+        With `compile="lazy"` the remaining ones are compiled right here
+        """
+        if isinstance(self.patterns, LazyPatterns):
+            self.patterns.wait(timeout)
+
+    def _build_batches(self, combined_scan):
+        """
+        Merge rules into combined scan trees, `combined_scan` rules per tree
+        (`True` - all rules into one). Rules which cannot be merged
+        are returned as single-rule leaves and always run
+        """
+        size = len(self.raw_patterns) if combined_scan is True else int(combined_scan)
+        size = max(size, 1)
+        mergeable = []
+        batches = []
+        for idx, (label, rules) in enumerate(self.raw_patterns):
+            if BACKREFERENCE.search(self._build_regex_str(label, rules)):
+                batches.append(ScanNode(self, [idx]))
+            else:
+                mergeable.append(idx)
+
+        for offset in range(0, len(mergeable), size):
+            batches.append(ScanNode(self, mergeable[offset:offset + size]))
+        return batches
+
+    def _build_lookups(self, lists):
+        self.lists = {int(list_id): items for list_id, items in (lists or {}).items()}
+        # List ids of every rule with list slots
+        self.list_rules = {}
+        for idx, (label, rules) in enumerate(self.raw_patterns):
+            ids = [int(list_id) for list_id in LIST_SLOT.findall("".join(rules))]
+            if ids:
+                self.list_rules[idx] = ids
+        # Items are looked up only if case folding is the same as of the regex, see `rita.engine.lookup`
+        exact = (self.regex_impl is re and not self.named_lists
+                 and (not self.config.ignore_case or FOLD_TABLE is not None))
+        self.list_index = ({list_id: ListIndex(items, self.config.ignore_case)
+                            for list_id, items in self.lists.items()}
+                           if exact else None)
+        self._reset_lookups()
+
+    def _reset_lookups(self):
+        self._lookup_patterns: "OrderedDict[tuple, Any]" = OrderedDict()
+        self._lookup_lock = threading.Lock()
+        # `(text, words, {list id: items found})` of the last text
+        self._last_lookup: tuple = (None, None, {})
+
+    def _fill_named_lists(self, regex_str):
+        """
+        `regex_str` with named lists in its list slots and `{name: items}` to compile it with.
+        Already escaped items (eg. `J\\.`) are regex, such a list stays an alternation
+        """
+        named = {}
+
+        def fill(m):
+            list_id = int(m.group(1))
+            items = self.lists[list_id]
+            if any("\\" in item for item in items):
+                return "(?:{})".format(list_alternation(items, self.config))
+            named["list{0}".format(list_id)] = items
+            return NAMED_LIST.format(list_id)
+        return LIST_SLOT.sub(fill, regex_str), named
+
+    def _found(self, text, list_ids):
+        """
+        `{list id: items}` which may occur in the text, every list is looked up once per text
+        """
+        (last, words, found) = self._last_lookup
+        if last is not text:
+            (words, found) = (text_words(text, self.config.ignore_case), {})
+            self._last_lookup = (text, words, found)
+        for list_id in list_ids:
+            if list_id not in found:
+                found[list_id] = self.list_index[list_id].find(words)
+        return found
+
+    def _pattern_for(self, idx, text):
+        """
+        Compiled pattern of rule `idx` to run over `text`: list slots are filled with items found in the text
+        (all of them, if items can't be looked up) - compiled patterns are kept for recently seen combinations
+        """
+        if idx not in self.list_rules or self.named_lists:
+            return self.patterns[idx]
+        if self.list_index is None or not isinstance(text, str):
+            found = self.lists
+            key: tuple = (idx, None)
+        else:
+            found = self._found(text, self.list_rules[idx])
+            key = (idx,) + tuple(found[list_id] for list_id in self.list_rules[idx])
+        with self._lookup_lock:
+            pattern = self._lookup_patterns.get(key)
+            if pattern is not None:
+                self._lookup_patterns.move_to_end(key)
+                return pattern
+        (label, rules) = self.raw_patterns[idx]
+        pattern = self.regex_impl.compile(self._fill_lists(self._build_regex_str(label, rules), found),
+                                          self._flags())
+        with self._lookup_lock:
+            self._lookup_patterns[key] = pattern
+            while len(self._lookup_patterns) > LOOKUP_PATTERNS_CACHE:
+                self._lookup_patterns.popitem(last=False)
+        return pattern
+
+    def _build_prefilter(self):
+        # Literal case folding of the prefilter mirrors the stdlib `re`
+        return Prefilter.build([self._build_regex_str(label, rules)
+                                for label, rules in self.raw_patterns],
+                               ignore_case=self.config.ignore_case,
+                               exact_case_fold=self.regex_impl is re)
+
+    def _with_timeout(self, fn, *args):
         if self.match_timeout is not None:
             try:
-                return pattern.finditer(text, timeout=self.match_timeout)
+                return fn(*args, timeout=self.match_timeout)
             except TypeError:
                 raise RuntimeError(
                     "`match_timeout` requires a regex implementation which supports it, "
                     "eg. the third-party `regex` module (pass `regex_impl=regex`)"
                 )
-        return pattern.finditer(text)
-
-    def _match_task(self, pattern, text, include_submatches):
-        # Custom regex_impl pattern objects may not expose `groupindex`
-        has_anchors = any(ANCHOR_GROUP.match(k)
-                          for k in getattr(pattern, "groupindex", {}))
+        return fn(*args)
+
+    def _finditer(self, pattern, text, pos=0):
+        if pos:
+            return self._with_timeout(pattern.finditer, text, pos)
+        return self._with_timeout(pattern.finditer, text)
+
+    def _select(self, labels):
+        """
+        Indexes of the active rules of `labels`, `None` - all active rules
+        """
+        if labels is None:
+            return self.active
+        unknown = set(labels).difference(self.label_index)
+        if unknown:
+            raise ValueError("Unknown labels: {}".format(", ".join(sorted(unknown))))
+        rules = frozenset(idx for label in labels for idx in self.label_index[label])
+        return rules if self.active is None else rules.intersection(self.active)
+
+    def subset(self, labels):
+        """
+        A view of this executor running only the rules of `labels`.
+        Compiled patterns (and the prefilter, combined scan) are shared, nothing is compiled again
+        """
+        view = copy.copy(self)
+        view.active = self._select(labels)
+        return view
+
+    def _candidates(self, text, rules=None):
+        """
+        Yield `(rule_index, pos)` for every rule which has to run on the text, in rule order.
+        No rule match can start before `pos`.
+        `rules` - indexes of rules to run, all active ones if `None`
+        """
+        rules = self.active if rules is None else rules
+        allowed = self.prefilter.candidates(text) if self.prefilter else None
+        if rules is not None:
+            allowed = sorted(rules) if allowed is None else [idx for idx in allowed if idx in rules]
+        if self._batches is None:
+            for idx in (range(len(self.patterns)) if allowed is None else allowed):
+                yield idx, 0
+            return
+
+        if allowed is not None:
+            allowed = set(allowed)
+        positions = {}
+        for node in self._batches:
+            node.scan(text, 0, positions, allowed)
+
+        for idx in sorted(positions):
+            yield idx, positions[idx]
+
+    def _match_task(self, idx, context, pos=0, pattern=None):
+        """
+        Lazy stream of rule `idx` results, ordered by start
+        """
+        return (result for (_, result) in self._iter_matches(idx, context, pos, pattern)
+                if result is not None)
+
+    def _iter_matches(self, idx, context, pos=0, pattern=None):
+        """
+        Yield `(match, result)` of rule `idx` - the raw regex match next to the `RuleMatch` built from it.
+        Result is `None` for a match which has nothing but anchors
+        """
+        pattern = pattern or self._pattern_for(idx, context.text)
+        label_id = self.label_ids[idx]
+        roles = self.group_roles[idx]
+        body_groups = [i for (i, _) in roles.body]
+        has_anchors = len(roles.anchors) > 0
+        offset = context.offset
 
         def gen():
-            for match in self._finditer(pattern, text):
+            for match in self._finditer(pattern, context.text, pos):
                 if has_anchors:
                     # Anchor tokens are required context, excluded from
                     # the result - report the span of the body groups only
-                    body_spans = [(match.start(k), match.end(k))
-                                  for k, v in match.groupdict().items()
-                                  if BODY_GROUP.match(k) and v and v.strip()]
+                    body_spans = [match.span(i) for i in body_groups if _has_text(match.group(i))]
                     if len(body_spans) == 0:
+                        yield match, None
                         continue
                     start = min(s for (s, _) in body_spans)
                     end = max(e for (_, e) in body_spans)
                 else:
                     start = match.start()
                     end = match.end()
-
-                def submatches():
-                    for k, v in match.groupdict().items():
-                        if not v or v.strip() == "":
-                            continue
-                        if ANCHOR_GROUP.match(k):
-                            continue
-                        yield {
-                            "key": k,
-                            "text": v.strip(),
-                            "start": match.start(k),
-                            "end": match.end(k)
-                        }
-
-                yield {
-                    "start": start,
-                    "end": end,
-                    "text": text[start:end].strip(),
-                    "label": match.lastgroup,
-                    "submatches": sorted(list(submatches()), key=lambda x: x["start"]) if include_submatches else []
-                }
-        return list(gen())
-
-    def _results(self, text, include_submatches):
-        for pattern in self.patterns:
-            yield self._match_task(pattern, text, include_submatches)
-
-    def execute(self, text, include_submatches=True):
-        results = sorted(chain(*self._results(text, include_submatches)), key=lambda x: x["start"])
-        for k, g in groupby(results, lambda x: x["start"]):
-            group = list(g)
-            if len(group) == 1:
-                yield group[0]
-            else:
-                data = sorted(group, key=lambda x: -x["end"])
-                yield data[0]
+                yield match, RuleMatch(start + offset, end + offset, idx, label_id, match, context, roles)
+        return gen()
+
+    def _results(self, context, rules=None):
+        return [self._match_task(idx, context, pos)
+                for idx, pos in self._candidates(context.text, rules)]
+
+    def _resolve(self, results, overlap=None):
+        """
+        Resolve overlapping results with the `overlap` strategy (the executor default if not given).
+        `results` must be ordered by `(start, rule)`
+        """
+        return overlap_strategies.resolve(results, overlap or self.overlap, self.label_priority)
+
+    def execute_matches(self, text, overlap=None, labels=None):
+        """
+        Same as `execute`, but yields `RuleMatch` objects: spans and label are
+        ready, text and submatches are only built when accessed
+        """
+        yield from self._execute_matches(text, overlap, labels)
+
+    def _execute_matches(self, text, overlap=None, labels=None, cancelled=None):
+        context = MatchContext(text, self.labels, 0)
+        streams = self._results(context, self._select(labels))
+        if cancelled is not None:
+            streams = [_until(stream, cancelled) for stream in streams]
+        return self._resolve(overlap_strategies.merge(streams), overlap)
+
+    def _execute_until(self, text, cancelled, include_submatches=True, overlap=None, max_matches=None,
+                       labels=None):
+        """
+        `execute` which raises `CancelledError` as soon as `cancelled` (a `threading.Event`) is set,
+        checked every time a rule advances. Used by `AsyncRuleExecutor`
+        """
+        if cancelled.is_set():
+            raise CancelledError()
+        for result in islice(self._execute_matches(text, overlap, labels, cancelled), max_matches):
+            yield result.to_dict(include_submatches)
+
+    def execute(self, text, include_submatches=True, overlap=None, max_matches=None, labels=None):
+        """
+        Execute rules over the text. Overlapping matches are resolved with the `overlap`
+        strategy, the executor default if not given (see `rita.engine.overlap`).
+        Only rules of `labels` run if given (see also `subset`).
+
+        Results are streamed: every rule is advanced only as far as needed
+        to produce the next result, so the first ones come before the rules
+        have scanned the whole text and stopping early (or `max_matches`) skips the rest of the work
+        """
+        for result in islice(self.execute_matches(text, overlap, labels), max_matches):
+            yield result.to_dict(include_submatches)
+
+    @property
+    def query_order(self):
+        """
+        Rule indexes in the order queries (`has_match`, `labels_present`) try them, cheapest first:
+        rules without anchors are answered by a single `search`, shorter patterns tend to be cheaper
+        """
+        if not hasattr(self, "_query_order"):
+            self._query_order = sorted(
+                range(len(self.patterns)),
+                key=lambda idx: (len(self.group_roles[idx].anchors) > 0,
+                                 sum(len(r) for r in self.raw_patterns[idx][1]))
+            )
+        return self._query_order
+
+    def _has_result(self, idx, context, pos=0):
+        if len(self.group_roles[idx].anchors) == 0:
+            return self._with_timeout(self._pattern_for(idx, context.text).search, context.text, pos) is not None
+        # Anchors-only matches are no results, the first real one is needed
+        return next(self._match_task(idx, context, pos), None) is not None
+
+    def _query_candidates(self, text):
+        """
+        `(rule_index, pos)` of rules which have to run on the text, in `query_order`
+        """
+        positions = dict(self._candidates(text))
+        return [(idx, positions[idx]) for idx in self.query_order if idx in positions]
+
+    def has_match(self, text):
+        """
+        If any rule matches the text. Stops at the first hit, builds no results
+        """
+        context = MatchContext(text, self.labels, 0)
+        return any(self._has_result(idx, context, pos)
+                   for idx, pos in self._query_candidates(text))
+
+    def first_match(self, text, include_submatches=True, overlap=None):
+        """
+        The first result `execute` would give, `None` if there are no matches
+        """
+        return next(self.execute(text, include_submatches=include_submatches, overlap=overlap), None)
+
+    def labels_present(self, text):
+        """
+        Set of labels of the rules which match the text. Rules of a label
+        already found are skipped. Unlike `execute`, matches hidden by overlap resolution count as well
+        """
+        context = MatchContext(text, self.labels, 0)
+        found = set()
+        for idx, pos in self._query_candidates(text):
+            label_id = self.label_ids[idx]
+            if label_id not in found and self._has_result(idx, context, pos):
+                found.add(label_id)
+                if len(found) == len(self.labels):
+                    break
+        return {self.labels[label_id] for label_id in found}
+
+    def count_by_label(self, text, overlap=None):
+        """
+        `{label: number of results}` of `execute`, without building the results
+        """
+        counts = Counter(match.label_id for match in self.execute_matches(text, overlap))
+        return {self.labels[label_id]: count for label_id, count in counts.items()}
+
+    def execute_each(self, text, on_match, overlap=None):
+        """
+        Call `on_match(match)` with every `RuleMatch` of the text, as it is found.
+        Nothing is collected - returns the number of matches
+        """
+        count = 0
+        for match in self.execute_matches(text, overlap):
+            on_match(match)
+            count += 1
+        return count
+
+    @property
+    def byte_patterns(self):
+        """
+        UTF-8 `bytes` variants of the patterns, compiled on first use
+        """
+        if not hasattr(self, "_byte_patterns"):
+            # Items of lists are not looked up in bytes, list slots get whole lists
+            self._byte_patterns = [
+                self.regex_impl.compile(self._fill_lists(self._build_regex_str(label, rules), self.lists).encode("UTF-8"),
+                                        self._flags())
+                for label, rules in self.raw_patterns
+            ]
+        return self._byte_patterns
+
+    def execute_bytes(self, buffer, include_submatches=True, char_offsets=False, overlap=None):
+        """
+        Execute rules directly over UTF-8 encoded bytes (`bytes`, `mmap`, `memoryview`),
+        without decoding them. Offsets are byte offsets, or character offsets
+        of the decoded text with `char_offsets=True` (converted lazily, per result).
+
+        Byte patterns follow the regex rules for `bytes`: `\\w`, `\\b`, `\\d` and
+        case-insensitivity are ASCII-only. Results are the same as of `execute`
+        for ASCII texts and for rules whose non-ASCII parts are plain literals
+        """
+        conv = ByteOffsets(buffer) if char_offsets else None
+
+        def decode(result):
+            result["text"] = result["text"].decode("UTF-8", errors="replace")
+            for sub in result["submatches"]:
+                sub["text"] = sub["text"].decode("UTF-8", errors="replace")
+                if conv is not None:
+                    sub["start"], sub["end"] = conv(sub["start"]), conv(sub["end"])
+            if conv is not None:
+                result["start"], result["end"] = conv(result["start"]), conv(result["end"])
+            return result
+
+        context = MatchContext(buffer, self.labels, 0)
+        results = overlap_strategies.merge(self._match_task(idx, context, pattern=pattern)
+                                           for idx, pattern in enumerate(self.byte_patterns)
+                                           if self.active is None or idx in self.active)
+        for result in self._resolve(results, overlap):
+            yield decode(result.to_dict(include_submatches))
+
+    def execute_file(self, path, include_submatches=True, char_offsets=False, overlap=None):
+        """
+        Execute rules over an UTF-8 file, memory-mapped instead of read into memory.
+        See `execute_bytes`
+        """
+        with open(path, "rb") as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+                yield from self.execute_bytes(buffer, include_submatches=include_submatches,
+                                              char_offsets=char_offsets, overlap=overlap)
+
+    @property
+    def max_match_length(self):
+        """
+        The longest match any rule can produce, `None` if some of them are unbounded
+        """
+        if not hasattr(self, "_max_match_length"):
+            lengths = [max_length(self._build_regex_str(label, rules), self.config.ignore_case)
+                       for label, rules in self.raw_patterns]
+            self._max_match_length = None if None in lengths else max(lengths, default=0)
+        return self._max_match_length
+
+    def stream_window(self):
+        """
+        Overlap kept between chunks by `execute_stream`: enough for the longest
+        possible match and its context, or `DEFAULT_STREAM_WINDOW` if some rules are unbounded
+        """
+        if self.max_match_length is None:
+            return DEFAULT_STREAM_WINDOW
+        return 2 * self.max_match_length + 1
+
+    def execute_stream(self, chunks, window=None, include_submatches=True, overlap=None):
+        """
+        Execute rules over a text given as an iterable of chunks (eg. an open file),
+        without holding the whole of it in memory. Results are the same as `execute`
+        on the joined text, offsets are global.
+
+        Only `window` characters (see `stream_window`) are carried over between chunks:
+        matches of unbounded rules (eg. `ANY`, `WORD+`) longer than it may be cut short
+        """
+        for result in self._resolve(self._stream_matches(chunks, window or self.stream_window()), overlap):
+            yield result.to_dict(include_submatches)
+
+    def _stream_matches(self, chunks, window):
+        """
+        All matches of `execute_stream`, ordered by `(start, rule)`
+        """
+        buffer = ""
+        # Global offset of `buffer[0]`; every match starting before `watermark`
+        # has been taken; `resume` - where each rule's previous match ended
+        offset = 0
+        watermark = 0
+        resume = {}
+        carry = []
+
+        for chunk in chain(chunks, [None]):
+            final = chunk is None
+            if not final:
+                buffer += chunk
+                if len(buffer) - window <= watermark - offset:
+                    continue
+            cut = len(buffer) if final else len(buffer) - window
+
+            found = []
+            context = MatchContext(buffer, self.labels, offset)
+            for idx, pos in self._candidates(buffer):
+                pos = max(pos, watermark - offset, resume.get(idx, 0) - offset)
+                for match, result in self._iter_matches(idx, context, pos):
+                    # Not enough text after it yet - found again with the next chunk
+                    if match.start() >= cut:
+                        break
+                    resume[idx] = offset + match.end()
+                    if result is not None:
+                        found.append(result)
+
+            # Results (eg. of anchored rules) can start after the cut,
+            # they wait for the ones which may still come before them
+            found = sorted(carry + found, key=overlap_strategies.ORDER)
+            limit = offset + cut
+            carry = [] if final else [r for r in found if r.start >= limit]
+            yield from (r for r in found if final or r.start < limit)
+
+            watermark = offset + cut
+            keep = max(0, cut - window)
+            buffer = buffer[keep:]
+            offset += keep
+
+    def _options(self):
+        """
+        Keyword arguments needed to rebuild this executor in another process
+        """
+        return {
+            "regex_impl": self.regex_impl.__name__,
+            "max_workers": self.max_workers,
+            "match_timeout": self.match_timeout,
+            "combined_scan": self.combined_scan,
+            "prefilter": self.prefilter is not None,
+            "overlap": self.overlap,
+            "label_priority": self.label_priority,
+            "compile": self.compile_mode,
+            "lists": self.lists,
+            "named_lists": self.named_lists,
+        }
 
     @staticmethod
-    def load(path, regex_impl=re):
+    def load(path, regex_impl=re, **kwargs):
         from rita.config import SessionConfig
         config = SessionConfig()
         patterns = []
+        lists = {}
         with open(path, "r") as f:
             for line_no, line in enumerate(f, 1):
                 line = line.strip()
@@ -332,29 +1247,367 @@ class RuleExecutor(object):
                         config.set_config(k, v)
                 elif "label" in obj and "rules" in obj:
                     patterns.append((obj["label"], obj["rules"]))
+                elif "list" in obj and "items" in obj:
+                    lists[obj["list"]] = obj["items"]
                 else:
                     raise ValueError(
                         "Unexpected object on line {0} of '{1}': "
-                        "expected a config header or a rule with 'label' and 'rules'".format(line_no, path)
+                        "expected a config header, a rule with 'label' and 'rules' or a list".format(line_no, path)
                     )
-        return RuleExecutor(patterns, config, regex_impl=regex_impl)
+        return RuleExecutor(patterns, config, regex_impl=regex_impl, lists=lists, **kwargs)
 
-    def save(self, path):
-        with open(path, "w") as f:
-            f.write("{0}\n".format(json.dumps({
-                "config": {"ignore_case": self.config.ignore_case}
-            })))
-            for pattern in self:
-                f.write("{0}\n".format(json.dumps(pattern)))
 
-    def __iter__(self):
-        for label, rules in self.raw_patterns:
-            yield {"label": label, "rules": rules}
+def _span_text(text, start, end):
+    value = text[start:end]
+    if isinstance(value, memoryview):
+        value = value.tobytes()
+    return value
+
+
+def _until(stream, cancelled):
+    it = iter(stream)
+    while not cancelled.is_set():
+        try:
+            item = next(it)
+        except StopIteration:
+            return
+        yield item
+    raise CancelledError()
+
+
+def _has_text(value):
+    return bool(value) and bool(value.strip())
+
+
+class MatchContext(NamedTuple):
+    """
+    Shared by all matches found in one text: the text itself, label table
+    of the executor and the global offset of the text (non-zero in `execute_stream`)
+    """
+    text: Any
+    labels: List[str]
+    offset: int
+
+
+class RuleMatch(object):
+    """
+    A single rule match. Only the span and label are set up front,
+    text and submatches are built from the underlying regex match on first access.
+    `to_dict()` gives the classic result dict
+    """
+    __slots__ = ("start", "end", "rule_id", "label_id", "match", "context", "roles", "_text", "_submatches")
+
+    def __init__(self, start: int, end: int, rule_id: int, label_id: int, match, context: MatchContext,
+                 roles: GroupRoles):
+        self.start = start
+        self.end = end
+        # Index of the rule in the executor, rules defined first have lower ids
+        self.rule_id = rule_id
+        self.label_id = label_id
+        self.match = match
+        self.context = context
+        self.roles = roles
+        self._text = None
+        self._submatches: Optional[List[dict]] = None
+
+    @property
+    def label(self) -> str:
+        return self.context.labels[self.label_id]
+
+    @property
+    def raw_text(self):
+        offset = self.context.offset
+        return _span_text(self.context.text, self.start - offset, self.end - offset)
+
+    @property
+    def text(self):
+        if self._text is None:
+            self._text = self.raw_text.strip()
+        return self._text
+
+    @property
+    def submatches(self) -> List[dict]:
+        if self._submatches is None:
+            match = self.match
+            offset = self.context.offset
+            subs = []
+            for (i, key) in self.roles.submatches:
+                value = match.group(i)
+                if not _has_text(value):
+                    continue
+                (start, end) = match.span(i)
+                subs.append({
+                    "key": key,
+                    "text": value.strip(),
+                    "start": start + offset,
+                    "end": end + offset
+                })
+            self._submatches = sorted(subs, key=lambda x: x["start"])
+        return self._submatches
+
+    def to_dict(self, include_submatches=True) -> dict:
+        return {
+            "start": self.start,
+            "end": self.end,
+            "text": self.text,
+            "label": self.label,
+            "submatches": list(self.submatches) if include_submatches else []
+        }
+
+    def __repr__(self):
+        return "<RuleMatch {0} [{1}:{2}]>".format(self.label, self.start, self.end)
+
+
+def _restore_executor(cls, patterns, config_data, options):
+    from rita.config import SessionConfig
+    config = SessionConfig()
+    for k, v in config_data.items():
+        config.set_config(k, v)
+    if "regex_impl" in options:
+        options = dict(options, regex_impl=import_module(options["regex_impl"]))
+    return cls(patterns, config, **options)
+
+
+def _chunked(texts, chunksize):
+    """
+    Yield `(index of the first text, texts)` chunks
+    """
+    it = iter(texts)
+    start = 0
+    while True:
+        chunk = list(islice(it, chunksize))
+        if not chunk:
+            return
+        yield start, chunk
+        start += len(chunk)
+
+
+# Executor of an `execute_many` pool worker process, built once by `_init_worker`
+_worker_executor = None
+
+
+def _init_worker(*state):
+    global _worker_executor
+    _worker_executor = _restore_executor(*state)
+
+
+def _init_forked_worker(executor):
+    global _worker_executor
+    _worker_executor = executor.after_fork()
+
+
+def _execute_chunk(texts, include_submatches):
+    assert _worker_executor is not None
+    return [list(_worker_executor.execute(text, include_submatches=include_submatches))
+            for text in texts]
+
+
+class ScanNode(object):
+    """
+    A node of the combined scan tree: one alternation of all of its rules.
+    A single search tells if any of them can match the text at all,
+    and where the leftmost match starts - nothing in the node can match before it.
+    A hit is narrowed down by searching both halves, so only rules which
+    really match end up running their full pattern.
+    Patterns are compiled on first use - nodes under a never-hit parent cost nothing
+    """
+    def __init__(self, executor, members):
+        self.executor = executor
+        self.members = members
+        self._pattern = None
+        self._children = None
+
+    @property
+    def pattern(self):
+        if self._pattern is None:
+            executor = self.executor
+            alts = [non_capturing("".join(executor.raw_patterns[idx][1]))
+                    for idx in self.members]
+            try:
+                self._pattern = executor.regex_impl.compile("|".join(alts), executor._flags())
+            except Exception as ex:
+                logger.warning("Failed to build combined scan pattern, "
+                               "falling back to per-rule scan: {}".format(ex))
+                self._pattern = False
+        return self._pattern
+
+    @property
+    def children(self):
+        if self._children is None:
+            half = len(self.members) // 2
+            self._children = [ScanNode(self.executor, self.members[:half]),
+                              ScanNode(self.executor, self.members[half:])]
+        return self._children
+
+    def scan(self, text, pos, positions, allowed=None):
+        if allowed is not None and not any(idx in allowed for idx in self.members):
+            return
+
+        if len(self.members) == 1:
+            # The rule pattern itself is the final check
+            positions[self.members[0]] = pos
+            return
+
+        pattern = self.pattern
+        if pattern is not False:
+            match = self.executor._with_timeout(pattern.search, text, pos)
+            if match is None:
+                return
+            pos = match.start()
+
+        for child in self.children:
+            child.scan(text, pos, positions, allowed)
+
+
+def _sre_code(regex_str, flags):
+    """
+    What `re.compile` builds in Python (parsing and code generation - nearly all of its time), picklable
+    """
+    # Plain int, as in `re.compile` - `RegexFlag` arithmetic is slow
+    flags = int(flags)
+    p = sre_parser.parse(regex_str, flags)
+    code = [int(c) for c in sre_compiler._code(p, flags)]
+    groupindex = dict(p.state.groupdict)
+    indexgroup = [None] * p.state.groups
+    for k, i in groupindex.items():
+        indexgroup[i] = k
+    return flags | p.state.flags, code, p.state.groups - 1, groupindex, tuple(indexgroup)
+
+
+def _from_sre_code(regex_str, sre_code):
+    (flags, code, groups, groupindex, indexgroup) = sre_code
+    return sre_compiler._sre.compile(regex_str, flags, code, groups, groupindex, indexgroup)
+
+
+def _compile_group(config, regex_impl_name, chunk):
+    """
+    Pool worker: patterns of `chunk` rules, each with the group ids it would get in a serial compile.
+    `None` for a rule which fails
+    """
+    flags = regex_flags(re, config)
+    results = []
+    for (rule, nested_base, anchor_base) in chunk:
+        config._nested_group_count = nested_base
+        config._anchor_group_count = anchor_base
+        try:
+            (label, rules) = rules_to_patterns(*rule, config=config)
+            sre_code = None
+            if regex_impl_name == "re":
+                check_label(label)
+                sre_code = _sre_code(RuleExecutor._build_regex_str(label, rules), flags)
+        except Exception as ex:
+            logger.debug("Rule '{0}' failed in a compile worker: {1}".format(rule[0], ex))
+            results.append(None)
+            continue
+        results.append(((label, rules), sre_code))
+    return results
+
+
+def compile_patterns(rules: Rules, config: "SessionConfig", workers: int, regex_impl=None):
+    """
+    `rules_to_patterns` of every rule in a pool of `workers` processes.
+    Returns `(patterns, compiled)`: the same patterns, group ids included, as a serial compile gives,
+    and with `regex_impl=re` their compiled pattern objects (otherwise `None`) -
+    workers do the parsing and code generation, only the final (native) step runs here.
+
+    Rules which fail, or a pool which fails, are compiled serially, raising the same errors
+    """
+    regex_impl_name = regex_impl.__name__ if regex_impl is not None else None
+    try:
+        chunks = []
+        (nested, anchors) = (config._nested_group_count, config._anchor_group_count)
+        for rule in rules:
+            chunks.append((rule, nested, anchors))
+            (n, a) = group_id_count(rule[1], config)
+            nested += n
+            anchors += a
+
+        size = max(1, len(chunks) // (workers * 4))
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(_compile_group, config, regex_impl_name, chunks[i:i + size])
+                       for i in range(0, len(chunks), size)]
+            results = [result for f in futures for result in f.result()]
+    except Exception as ex:
+        logger.warning("Parallel compilation failed, compiling serially: {}".format(ex))
+        results = [None]
+
+    if any(result is None for result in results):
+        patterns = [rules_to_patterns(*rule, config=config) for rule in rules]
+        return patterns, None
+
+    config._nested_group_count = nested
+    config._anchor_group_count = anchors
+    patterns = [pattern for (pattern, _) in results]
+    if regex_impl_name != "re":
+        return patterns, None
+
+    compiled = []
+    for ((label, rules), sre_code) in results:
+        regex_str = RuleExecutor._build_regex_str(label, rules)
+        try:
+            compiled.append(_from_sre_code(regex_str, sre_code))
+        except Exception:
+            compiled.append(re.compile(regex_str, regex_flags(re, config)))
+    return patterns, compiled
+
+
+def extract_lists(rules: Rules, config: "SessionConfig", threshold=None):
+    """
+    Take lists of at least `threshold` items (`list_lookup_threshold` config value by default, `N` disables it)
+    out of `rules`: they are looked up per text (see `rita.engine.lookup`) or compiled as named lists
+    instead of being part of the rule pattern.
+    Returns `(rules, {list id: items})`, a list used by many rules is stored once
+    """
+    if threshold is None:
+        threshold = config.list_lookup_threshold
+    if not threshold:
+        return rules, {}
+    ids: dict = {}
+    lists: dict = {}
+
+    def extract(element):
+        (t, d, op) = element
+        if t != "any_of" or len(d) < int(threshold) or str(op) == "!":
+            return element
+        items = list(dict.fromkeys(d))
+        list_id = ids.setdefault(frozenset(items), len(ids))
+        lists.setdefault(list_id, items)
+        return "list", (list_id, max(map(len, items))), op
+
+    rules = [(label, [extract(element) for element in data]) for (label, data) in rules]
+    if lists:
+        logger.info("{0} lists ({1} items) are kept out of rule patterns".format(
+            len(lists), sum(len(items) for items in lists.values())))
+    return rules, lists
 
 
 def compile_rules(rules: Rules, config: "SessionConfig", regex_impl=re, **kwargs) -> RuleExecutor:
     logger.info("Using standalone rule implementation")
-    patterns = [rules_to_patterns(*group, config=config) for group in rules]
-    executor = RuleExecutor(patterns, config, regex_impl=regex_impl,
-                            match_timeout=kwargs.get("match_timeout"))
+    lists: dict = {}
+    named_lists = kwargs.get("named_lists", False)
+    if named_lists:
+        # Named lists take over from the trie
+        (rules, lists) = extract_lists(rules, config, threshold=config.list_trie_threshold)
+    elif regex_impl is re:
+        # Looked up items are only the same as regex matches with the stdlib `re` case folding
+        (rules, lists) = extract_lists(rules, config)
+    workers = kwargs.get("compile_workers")
+    try:
+        if workers and workers > 1:
+            (patterns, compiled) = compile_patterns(list(rules), config, workers, regex_impl=regex_impl)
+        else:
+            patterns = [rules_to_patterns(*group, config=config) for group in rules]
+            compiled = None
+    finally:
+        # Patterns of shared lists are part of the rule patterns by now
+        config.clear_list_patterns()
+    executor = RuleExecutor(patterns, config, regex_impl=regex_impl, compiled=compiled,
+                            match_timeout=kwargs.get("match_timeout"),
+                            combined_scan=kwargs.get("combined_scan"),
+                            prefilter=kwargs.get("prefilter", False),
+                            overlap=kwargs.get("overlap", overlap_strategies.LONGEST),
+                            label_priority=kwargs.get("label_priority"),
+                            compile=kwargs.get("compile", EAGER),
+                            lists=lists, named_lists=named_lists)
     return executor
@@ -0,0 +1,644 @@
+"""
+Token-level rule engine: needs no language model, matches rules as sequences of tokens, like spaCy's `Matcher`.
+
+Every document is tokenized once. All the rules are compiled into one automaton (an NFA):
+rules with the same leading elements share their states, so a common prefix is checked once
+for all of them, and literal transitions (`WORD`, `IN_LIST`) of a state are looked up by token
+instead of being tried one by one - matching time barely grows with the number of rules.
+
+For every rule the leftmost start of every end and the longest end of every start are found. spaCy's `Matcher`
+finds every match, but all the others lie inside of a longer match of the same rule (`{WORD+}` has n^2 of them),
+so matching stays linear in the text length. Overlaps are then resolved with a strategy from `rita.engine.overlap`
+- `longest_first` by default, which is what spaCy's `EntityRuler` does.
+"""
+import heapq
+import logging
+import re
+
+from typing import Any, Callable, Dict, Iterator, List, NamedTuple, Optional, Tuple, TYPE_CHECKING
+from unicodedata import category
+
+from rita.engine import overlap as overlap_strategies
+from rita.engine.translate_standalone import RuleCompileError, validate_anchor_positions
+from rita.types import Rules
+from rita.utils import ExtendedOp
+
+logger = logging.getLogger(__name__)
+
+if TYPE_CHECKING:
+    # We cannot simply import SessionConfig because of cyclic imports
+    from rita.config import SessionConfig
+
+
+# Numbers (with decimal and thousand separators), words, single punctuation characters
+TOKEN = re.compile(r"\d+(?:[.,]\d+)*|\w+|[^\w\s]")
+
+OPERATORS = ("", "?", "*", "+", "!")
+
+
+class Doc(object):
+    """
+    A tokenized text
+    """
+    __slots__ = ("text", "texts", "lowers", "starts", "ends")
+
+    def __init__(self, text: str):
+        self.text = text
+        tokens = list(TOKEN.finditer(text))
+        self.texts = [m.group() for m in tokens]
+        self.lowers = [t.lower() for t in self.texts]
+        self.starts = [m.start() for m in tokens]
+        self.ends = [m.end() for m in tokens]
+
+    def __len__(self):
+        return len(self.texts)
+
+
+def tokenize(text: str) -> List[str]:
+    return TOKEN.findall(text)
+
+
+class Predicate(object):
+    """
+    A test of a single token. Predicates are compared by value, equal elements of different rules are merged
+    """
+    __slots__ = ("key",)
+
+    def __init__(self, *key):
+        self.key = key
+
+    def __call__(self, doc: Doc, i: int) -> bool:
+        raise NotImplementedError()
+
+    def __eq__(self, other):
+        return type(self) is type(other) and self.key == other.key
+
+    def __hash__(self):
+        return hash((type(self).__name__, self.key))
+
+    def __repr__(self):
+        return "{0}{1}".format(type(self).__name__, self.key)
+
+
+class Literal(Predicate):
+    """
+    Token text (lowercased if `lower`) is one of `values`. Indexed by the automaton, never called while matching
+    unless negated
+    """
+    def __init__(self, values: frozenset, lower: bool):
+        super().__init__(values, lower)
+
+    @property
+    def values(self) -> frozenset:
+        return self.key[0]
+
+    @property
+    def lower(self) -> bool:
+        return self.key[1]
+
+    def __call__(self, doc, i):
+        return (doc.lowers[i] if self.lower else doc.texts[i]) in self.values
+
+
+class Regex(Predicate):
+    """
+    `re.search` over the token text, as spaCy's `REGEX`
+    """
+    __slots__ = ("pattern",)
+
+    def __init__(self, value: str, flags: int):
+        super().__init__(value, flags)
+        try:
+            self.pattern = re.compile(value, flags)
+        except re.error as ex:
+            raise RuleCompileError("Invalid regex '{0}': {1}".format(value, ex)) from ex
+
+    def __call__(self, doc, i):
+        return self.pattern.search(doc.texts[i]) is not None
+
+
+class Punct(Predicate):
+    def __call__(self, doc, i):
+        return all(category(c).startswith("P") for c in doc.texts[i])
+
+
+class Anything(Predicate):
+    def __call__(self, doc, i):
+        return True
+
+
+class Capitalized(Predicate):
+    """
+    `ENTITY("PERSON")` without a language model: a capitalized word, as in the standalone engine
+    """
+    PATTERN = re.compile(r"[A-Z]\w+")
+
+    def __call__(self, doc, i):
+        return self.PATTERN.fullmatch(doc.texts[i]) is not None
+
+
+class Not(Predicate):
+    def __init__(self, predicate: Predicate):
+        super().__init__(predicate)
+
+    def __call__(self, doc, i):
+        return not self.key[0](doc, i)
+
+
+class Element(NamedTuple):
+    """
+    A rule element: `kind` - `"atom"` (a `Predicate` as `value`), `"seq"` (a tuple of elements)
+    or `"alt"` (a tuple of alternative `"seq"` elements); `op` - one of `OPERATORS`
+    """
+    kind: str
+    value: Any
+    op: str
+    anchor: bool = False
+
+
+def not_supported(key, *args, **kwargs):
+    raise RuntimeError(
+        "Rule '{0}' is not supported in token mode"
+        .format(key)
+    )
+
+
+def _literal(value: str, config: "SessionConfig", op: ExtendedOp) -> Tuple[str, ...]:
+    tokens = tokenize(value)
+    if op.ignore_case(config):
+        tokens = [t.lower() for t in tokens]
+    return tuple(tokens)
+
+
+def _literals(values, config: "SessionConfig", op: ExtendedOp, anchor: bool) -> Element:
+    """
+    Alternatives of literal values. Values made of a few tokens (eg. "New York", "don't") become token sequences
+    """
+    lower = op.ignore_case(config)
+    single = set()
+    sequences = set()
+    for value in values:
+        tokens = _literal(value, config, op)
+        if len(tokens) == 1:
+            single.add(tokens[0])
+        elif len(tokens) > 1:
+            sequences.add(tokens)
+
+    alts = []
+    if single or not sequences:
+        alts.append(Element("seq", (Element("atom", Literal(frozenset(single), lower), ""),), ""))
+    for tokens in sorted(sequences):
+        alts.append(Element("seq", tuple(Element("atom", Literal(frozenset([t]), lower), "") for t in tokens), ""))
+
+    if len(alts) == 1 and len(alts[0].value) == 1:
+        return Element("atom", alts[0].value[0].value, str(op), anchor)
+    if str(op) == "!":
+        raise RuleCompileError("Negation of multi-token values is not supported in token mode: {}".format(values))
+    return Element("alt", tuple(alts), str(op), anchor)
+
+
+def value_element(value, config, op, anchor):
+    return _literals([value], config, op, anchor)
+
+
+def any_of_element(values, config, op, anchor):
+    # Built once per list while compiling, see `rita.preprocess.intern_lists`
+    return config.list_pattern(values, ("token", str(op), anchor, op.ignore_case(config)),
+                               lambda: _literals(values, config, op, anchor))
+
+
+def regex_element(value, config, op, anchor):
+    if not value:
+        raise RuleCompileError("Empty regex pattern")
+    flags = re.IGNORECASE if op.ignore_case(config) else 0
+    return Element("atom", Regex(value, flags), str(op), anchor)
+
+
+def fuzzy_element(values, config, op, anchor):
+    # Values are regex fragments generated by rita.modules.fuzzy
+    flags = re.IGNORECASE if op.ignore_case(config) else 0
+    return Element("atom", Regex("^(?:{0})$".format("|".join(values)), flags), str(op), anchor)
+
+
+def punct_element(_, config, op, anchor):
+    return Element("atom", Punct(), str(op), anchor)
+
+
+def any_element(_, config, op, anchor):
+    return Element("atom", Anything(), str(op), anchor)
+
+
+def entity_element(value, config, op, anchor):
+    if value == "PERSON":
+        return Element("atom", Capitalized(), str(op), anchor)
+    return not_supported(value)
+
+
+def nested_element(values, config, op, anchor):
+    from rita.macros import resolve_value
+    children = [resolve_value(v, config=config) for v in values]
+    if any(isinstance(c_op, ExtendedOp) and c_op.anchor for (_, _, c_op) in children):
+        raise RuleCompileError("ANCHOR is not supported inside PATTERN")
+    if str(op) == "!":
+        raise RuleCompileError("Negation of PATTERN is not supported in token mode")
+    return Element("seq", tuple(to_element(t, d, c_op, config) for (t, d, c_op) in children), str(op), anchor)
+
+
+ELEMENTS = {
+    "any_of": any_of_element,
+    "any": any_element,
+    "value": value_element,
+    "orth": value_element,
+    "phrase": value_element,
+    "regex": regex_element,
+    "entity": entity_element,
+    "punct": punct_element,
+    "fuzzy": fuzzy_element,
+    "nested": nested_element,
+}
+
+
+def to_element(t, d, op, config: "SessionConfig") -> Element:
+    op = ExtendedOp(op)
+    if str(op) not in OPERATORS:
+        raise RuleCompileError("Operator '{0}' is not supported in token mode".format(op))
+    if t not in ELEMENTS:
+        return not_supported(t.upper())
+    return ELEMENTS[t](d, config, op, op.anchor)
+
+
+def rule_elements(label: str, data, config: "SessionConfig") -> Tuple[Element, ...]:
+    validate_anchor_positions(label, data)
+    return tuple(to_element(t, d, op, config) for (t, d, op) in data)
+
+
+class Automaton(object):
+    """
+    One NFA of all the rules. States are numbers, the state of a rule prefix is shared
+    by all the rules starting with it. A `reverse` automaton matches the rules backwards, from their last element
+    """
+    def __init__(self, rules: List[Tuple[Element, ...]], reverse: bool = False):
+        self.reverse = reverse
+        if reverse:
+            rules = [tuple(reversed_element(e) for e in reversed(elements)) for elements in rules]
+        self.eps: List[List[int]] = []
+        self.moves: List[List[Tuple[Predicate, int]]] = []
+        self.accepts: List[List[int]] = []
+        self.root = self._state()
+
+        # Prefix tree: `(state, element) -> state` after it
+        prefixes: Dict[Tuple[int, Element], int] = {}
+        for rule_id, elements in enumerate(rules):
+            state = self.root
+            for element in elements:
+                key = (state, element)
+                if key not in prefixes:
+                    prefixes[key] = self._state()
+                    self._build(element, state, prefixes[key])
+                state = prefixes[key]
+            self.accepts[state].append(rule_id)
+        self._finish()
+
+    def _state(self) -> int:
+        self.eps.append([])
+        self.moves.append([])
+        self.accepts.append([])
+        return len(self.eps) - 1
+
+    def _build(self, element: Element, entry: int, exit: int):
+        """
+        States between `entry` and `exit` (never shared with other elements) matching `element`
+        """
+        op = element.op
+        if element.kind == "atom":
+            predicate = Not(element.value) if op == "!" else element.value
+            self.moves[entry].append((predicate, exit))
+            if op in ("?", "*"):
+                self.eps[entry].append(exit)
+            if op in ("+", "*"):
+                self.moves[exit].append((predicate, exit))
+            return
+
+        (start, end) = (self._state(), self._state())
+        self.eps[entry].append(start)
+        self.eps[end].append(exit)
+        if element.kind == "seq":
+            self._build_seq(element.value, start, end)
+        else:
+            for alt in element.value:
+                (alt_start, alt_end) = (self._state(), self._state())
+                self.eps[start].append(alt_start)
+                self.eps[alt_end].append(end)
+                self._build_seq(alt.value, alt_start, alt_end)
+        if op in ("?", "*"):
+            self.eps[entry].append(exit)
+        if op in ("+", "*"):
+            self.eps[end].append(start)
+
+    def _build_seq(self, elements, entry: int, exit: int):
+        state = entry
+        for (i, element) in enumerate(elements):
+            following = exit if i == len(elements) - 1 else self._state()
+            self._build(element, state, following)
+            state = following
+        if not elements:
+            self.eps[entry].append(exit)
+
+    def _finish(self):
+        # Every state is entered through its epsilon closure: only the states of it
+        # which consume tokens or accept rules are kept
+        self.closures: List[Tuple[int, ...]] = []
+        for state in range(len(self.eps)):
+            seen = {state}
+            stack = [state]
+            while stack:
+                for following in self.eps[stack.pop()]:
+                    if following not in seen:
+                        seen.add(following)
+                        stack.append(following)
+            self.closures.append(tuple(sorted(s for s in seen if self.moves[s] or self.accepts[s])))
+
+        # Literal moves are looked up by token, `(text index, lowercased index, other moves)` of every state
+        self.index: List[Optional[Tuple[dict, dict, list]]] = []
+        for moves in self.moves:
+            if not moves:
+                self.index.append(None)
+                continue
+            (by_text, by_lower, others) = ({}, {}, [])
+            for (predicate, target) in moves:
+                if isinstance(predicate, Literal):
+                    index = by_lower if predicate.lower else by_text
+                    for value in predicate.values:
+                        index.setdefault(value, []).append(target)
+                else:
+                    others.append((predicate, target))
+            self.index.append((by_text, by_lower, others))
+
+    @property
+    def size(self) -> int:
+        return len(self.eps)
+
+    def matches(self, doc: Doc) -> Iterator[Tuple[int, int, int]]:
+        """
+        `(rule_id, start token, end token)` ordered by start, then rule, the longest first:
+        for every end of every rule the leftmost start, with `reverse` rules - for every start the longest end.
+
+        Runs in the same state at the same token go on the same way,
+        so only one run of every state is kept - the one which started leftmost (rightmost, going back)
+        """
+        if self.reverse:
+            return self._longest(doc)
+        return self._leftmost(doc)
+
+    def _leftmost(self, doc: Doc) -> Iterator[Tuple[int, int, int]]:
+        root = self.closures[self.root]
+        # State -> leftmost start
+        current: Dict[int, int] = {}
+        # `(start, rule_id, -end)` until no run can start before them
+        found: List[Tuple[int, int, int]] = []
+        for i in range(len(doc) + 1):
+            for state in root:
+                current.setdefault(state, i)
+            for state, start in current.items():
+                if start < i:
+                    for rule_id in self.accepts[state]:
+                        heapq.heappush(found, (start, rule_id, -i))
+
+            leftmost = min(current.values(), default=i)
+            while found and found[0][0] < leftmost:
+                (start, rule_id, end) = heapq.heappop(found)
+                yield rule_id, start, -end
+            if i == len(doc):
+                break
+            current = self._advance(doc, current, i, min)
+
+        while found:
+            (start, rule_id, end) = heapq.heappop(found)
+            yield rule_id, start, -end
+
+    def _longest(self, doc: Doc) -> Iterator[Tuple[int, int, int]]:
+        root = self.closures[self.root]
+        # State -> rightmost end, tokens are matched from the last one
+        current: Dict[int, int] = {}
+        found: List[List[Tuple[int, int, int]]] = []
+        for i in range(len(doc), -1, -1):
+            for state in root:
+                current.setdefault(state, i)
+            found.append(sorted((rule_id, i, end)
+                                for state, end in current.items() if end > i
+                                for rule_id in self.accepts[state]))
+            if i == 0:
+                break
+            current = self._advance(doc, current, i - 1, max)
+
+        for matches in reversed(found):
+            yield from matches
+
+    def _advance(self, doc: Doc, current: Dict[int, int], i: int, keep: Callable[[int, int], int]) -> Dict[int, int]:
+        """
+        States after token `i`, each with the origin to `keep` of the runs reaching it
+        """
+        (text, lower) = (doc.texts[i], doc.lowers[i])
+        tested: Dict[Predicate, bool] = {}
+        following: Dict[int, int] = {}
+        for state, origin in current.items():
+            moves = self.index[state]
+            if moves is None:
+                continue
+            (by_text, by_lower, others) = moves
+            targets = by_text.get(text, []) + by_lower.get(lower, [])
+            for (predicate, target) in others:
+                result = tested.get(predicate)
+                if result is None:
+                    result = tested[predicate] = predicate(doc, i)
+                if result:
+                    targets.append(target)
+            for target in targets:
+                for s in self.closures[target]:
+                    following[s] = keep(origin, following[s]) if s in following else origin
+        return following
+
+
+def reversed_element(element: Element) -> Element:
+    """
+    `element` matching the same tokens in reverse order
+    """
+    if element.kind == "atom":
+        return element
+    if element.kind == "seq":
+        return element._replace(value=tuple(reversed_element(e) for e in reversed(element.value)))
+    return element._replace(value=tuple(reversed_element(alt) for alt in element.value))
+
+
+def _ends(element: Element, doc: Doc, i: int, end: int) -> Iterator[int]:
+    """
+    Where `element` can end when it starts at token `i` (not past `end`), greedy first
+    """
+    op = element.op
+    if element.kind == "atom":
+        predicate = element.value
+        if op == "!":
+            if i < end and not predicate(doc, i):
+                yield i + 1
+            return
+        if op in ("", "?"):
+            if i < end and predicate(doc, i):
+                yield i + 1
+            if op == "?":
+                yield i
+            return
+        j = i
+        while j < end and predicate(doc, j):
+            j += 1
+        for k in range(j, i, -1):
+            yield k
+        if op == "*":
+            yield i
+        return
+
+    def once(pos):
+        if element.kind == "seq":
+            yield from _seq_ends(element.value, doc, pos, end)
+        else:
+            for alt in element.value:
+                yield from _seq_ends(alt.value, doc, pos, end)
+
+    def repeated(pos):
+        for k in once(pos):
+            if k > pos:
+                yield from repeated(k)
+            yield k
+
+    if op in ("+", "*"):
+        yield from repeated(i)
+    else:
+        yield from once(i)
+    if op in ("?", "*"):
+        yield i
+
+
+def _seq_ends(elements, doc: Doc, i: int, end: int) -> Iterator[int]:
+    if not elements:
+        yield i
+        return
+    for k in _ends(elements[0], doc, i, end):
+        yield from _seq_ends(elements[1:], doc, k, end)
+
+
+def align(elements: Tuple[Element, ...], doc: Doc, start: int, end: int) -> Optional[List[Tuple[int, int]]]:
+    """
+    Tokens `(start, end)` of each element in a match spanning tokens `start`-`end`
+    """
+    if not elements:
+        return [] if start == end else None
+    for k in _ends(elements[0], doc, start, end):
+        rest = align(elements[1:], doc, k, end)
+        if rest is not None:
+            return [(start, k)] + rest
+    return None
+
+
+class TokenMatch(NamedTuple):
+    # Character offsets
+    start: int
+    end: int
+    rule_id: int
+    label: str
+    # Token offsets of the whole match, anchors included
+    first_token: int
+    last_token: int
+
+
+class TokenRuleExecutor(object):
+    def __init__(self, rules: List[Tuple[str, Tuple[Element, ...]]], overlap=overlap_strategies.LONGEST_FIRST,
+                 label_priority=None):
+        self.rules = rules
+        self.overlap = overlap_strategies.validate(overlap)
+        self.label_priority = label_priority
+        self.automaton = Automaton([elements for (_, elements) in rules])
+        self.reverse_automaton = Automaton([elements for (_, elements) in rules], reverse=True)
+        self.has_anchors = [any(e.anchor for e in elements) for (_, elements) in rules]
+        logger.debug("Automaton of {0} rules has {1} states".format(len(rules), self.automaton.size))
+
+    def _candidates(self, doc: Doc) -> Iterator[Tuple[int, int, int]]:
+        """
+        `(rule_id, start, end)` of every rule for every end with the leftmost start and for every start
+        with the longest end. Overlap strategies keep the same matches as out of all of them,
+        `longest_first` and rules with anchors rarely differ
+        """
+        previous = None
+        for match in heapq.merge(self.automaton.matches(doc), self.reverse_automaton.matches(doc),
+                                 key=lambda m: (m[1], m[0], -m[2])):
+            if match != previous:
+                yield match
+            previous = match
+
+    def _matches(self, doc: Doc) -> Iterator[TokenMatch]:
+        """
+        Matches ordered by `(start, rule)`, the longest first. A leading anchor moves the start of a match
+        past the start of its rule, so matches wait until no following one can start before them
+        """
+        pending: List[Tuple[int, int, int, TokenMatch]] = []
+        for (rule_id, start, end) in self._candidates(doc):
+            while pending and pending[0][0] < start:
+                yield heapq.heappop(pending)[-1]
+            (label, elements) = self.rules[rule_id]
+            (first, last) = (start, end)
+            if self.has_anchors[rule_id]:
+                spans = align(elements, doc, start, end)
+                if spans is None:
+                    continue
+                body = [span for (e, span) in zip(elements, spans) if not e.anchor and span[1] > span[0]]
+                if not body:
+                    continue
+                (first, last) = (body[0][0], body[-1][1])
+            match = TokenMatch(doc.starts[first], doc.ends[last - 1], rule_id, label, start, end)
+            heapq.heappush(pending, (first, rule_id, -last, match))
+        while pending:
+            yield heapq.heappop(pending)[-1]
+
+    def execute_matches(self, text, overlap=None) -> Iterator[TokenMatch]:
+        doc = Doc(text)
+        return overlap_strategies.resolve(self._matches(doc), overlap or self.overlap, self.label_priority)
+
+    def execute(self, text, include_submatches=True, overlap=None):
+        doc = Doc(text)
+        for m in overlap_strategies.resolve(self._matches(doc), overlap or self.overlap, self.label_priority):
+            yield {
+                "start": m.start,
+                "end": m.end,
+                "text": text[m.start:m.end],
+                "label": m.label,
+                "submatches": self._submatches(doc, m) if include_submatches else [],
+            }
+
+    def _submatches(self, doc: Doc, m: TokenMatch) -> List[dict]:
+        """
+        The whole match (anchors included) under its label, then tokens of every element as `s<index>`
+        """
+        def sub(key, first, last):
+            (start, end) = (doc.starts[first], doc.ends[last - 1])
+            return {"key": key, "text": doc.text[start:end], "start": start, "end": end}
+
+        elements = self.rules[m.rule_id][1]
+        subs = [sub(m.label, m.first_token, m.last_token)]
+        for (i, (element, (first, last))) in enumerate(zip(elements, align(elements, doc, m.first_token, m.last_token) or [])):
+            if last > first and not element.anchor:
+                subs.append(sub("s{}".format(i), first, last))
+        return subs
+
+    def __iter__(self):
+        for label, elements in self.rules:
+            yield {"label": label, "elements": elements}
+
+
+def compile_rules(rules: Rules, config: "SessionConfig", **kwargs) -> TokenRuleExecutor:
+    logger.info("Using token rule implementation")
+    try:
+        patterns = [(label, rule_elements(label, data, config)) for (label, data) in rules]
+    finally:
+        # Elements of shared lists are part of the rule elements by now
+        config.clear_list_patterns()
+    return TokenRuleExecutor(patterns,
+                             overlap=kwargs.get("overlap", overlap_strategies.LONGEST_FIRST),
+                             label_priority=kwargs.get("label_priority"))
@@ -1,4 +1,5 @@
 import logging
+import threading
 
 import ply.yacc as yacc
 
@@ -9,6 +10,9 @@ from rita import macros
 
 logger = logging.getLogger(__name__)
 
+# Rules per task of parallel parsing
+DEFAULT_BATCH_SIZE = 512
+
 
 class RitaParseError(RuntimeError):
     pass
@@ -42,7 +46,7 @@ def load_macro(name, config):
 
 def var_wrapper(variable, config):
     def wrapper(*args, **kwargs):
-        logger.debug("Variables: {}".format(config.variables))
+        logger.debug("Resolving variable: {}".format(variable))
         return config.get_variable(variable)
 
     return wrapper
@@ -62,7 +66,9 @@ class RitaParser(object):
         ("right", "AMP"),
     )
 
-    def __init__(self, config):
+    def __init__(self, config=None):
+        # Grammar tables are shared, every `parse` call gets its session config
+        # through its own lexer (`p.lexer.config` in the productions)
         self.config = config
         self.lexer = None
         self.parser = None
@@ -83,15 +89,16 @@ class RitaParser(object):
                  | DOCUMENT VARIABLE
         """
         logger.debug("Extending document {}".format(p[2]))
-        p[0] = p[1] + [p[2]]
+        p[1].append(p[2])
+        p[0] = p[1]
 
     def p_macro_chain(self, p):
         " MACRO_CHAIN : MACRO ARROW MACRO "
         logger.debug("Have {0} -> {1}".format(p[1], p[3]))
         p[0] = partial(
             p[3],
-            macros.PATTERN(p[1], config=self.config),
-            config=self.config
+            macros.PATTERN(p[1], config=p.lexer.config),
+            config=p.lexer.config
         )
 
     def p_macro_chain_from_array(self, p):
@@ -99,14 +106,14 @@ class RitaParser(object):
         logger.debug("Have {0} -> {1}".format(p[1], p[3]))
         p[0] = partial(
             p[3],
-            macros.PATTERN(*p[1], config=self.config),
-            config=self.config
+            macros.PATTERN(*p[1], config=p.lexer.config),
+            config=p.lexer.config
         )
 
     def p_macro_exec(self, p):
         " MACRO_EXEC : EXEC MACRO "
         logger.debug("Exec {0}".format(p[2]))
-        macros.EXEC(p[2], config=self.config)
+        macros.EXEC(p[2], config=p.lexer.config)
         p[0] = stub
 
     def p_macro_w_modif(self, p):
@@ -124,24 +131,24 @@ class RitaParser(object):
         " MACRO : AMP MACRO "
         # `&MACRO(...)` is a shortcut for `ANCHOR(MACRO(...))`
         logger.debug("Anchoring Macro {}".format(p[2]))
-        p[0] = partial(macros.ANCHOR, p[2], config=self.config)
+        p[0] = partial(macros.ANCHOR, p[2], config=p.lexer.config)
 
     def p_macro_wo_args(self, p):
         " MACRO : KEYWORD "
-        fn = load_macro(p[1], config=self.config)
+        fn = load_macro(p[1], config=p.lexer.config)
         logger.debug("Parsing macro (w/o args): {}".format(p[1]))
         p[0] = fn
 
     def p_macro_w_args(self, p):
         " MACRO : KEYWORD LPAREN ARGS RPAREN "
         logger.debug("Parsing macro: {0}, args: {1}".format(p[1], p[3]))
-        fn = load_macro(p[1], config=self.config)
+        fn = load_macro(p[1], config=p.lexer.config)
         p[0] = partial(fn, *p[3])
 
     def p_macro_from_array(self, p):
         " MACRO : KEYWORD ARRAY "
         logger.debug("Parsing macro: {0}, args: {1}".format(p[1], p[2]))
-        fn = load_macro(p[1], config=self.config)
+        fn = load_macro(p[1], config=p.lexer.config)
         p[0] = partial(fn, *p[2])
 
     def p_array(self, p):
@@ -150,14 +157,14 @@ class RitaParser(object):
 
     def p_variable(self, p):
         " VARIABLE_NAME : NAME "
-        p[0] = var_wrapper(p[1], self.config)
+        p[0] = var_wrapper(p[1], p.lexer.config)
 
     def p_variable_from_args(self, p):
         " VARIABLE : NAME ASSIGN ARGS "
         if len(p[3]) == 1:
-            macros.ASSIGN(p[1], p[3][0], config=self.config)
+            macros.ASSIGN(p[1], p[3][0], config=p.lexer.config)
         else:
-            macros.ASSIGN(p[1], p[3], config=self.config)
+            macros.ASSIGN(p[1], p[3], config=p.lexer.config)
 
         p[0] = stub
 
@@ -167,7 +174,8 @@ class RitaParser(object):
 
     def p_arg_list(self, p):
         " ARGS : ARGS COMMA ARG "
-        p[0] = p[1] + [p[3]]
+        p[1].append(p[3])
+        p[0] = p[1]
 
     def p_args(self, p):
         " ARGS : ARG "
@@ -198,14 +206,274 @@ class RitaParser(object):
             raise RitaParseError("Syntax error: unexpected end of input")
 
     def build(self, **kwargs):
-        self.lexer = RitaLexer().build(**kwargs)
-        self.parser = yacc.yacc(module=self, errorlog=logger, **kwargs)
+        """
+        Use the process-wide lexer and parser tables, or build own ones if `kwargs`
+        for PLY are given (eg. `debug=True`)
+        """
+        if kwargs:
+            self.lexer = RitaLexer().build(**kwargs)
+            self.parser = yacc.yacc(module=RitaParser(), errorlog=logger, **kwargs)
+        else:
+            (self.lexer, self.parser) = shared_tables()
+        return self
 
-    def parse(self, data):
+    def parse(self, data, config=None):
         if data.strip() == "":
             return []
 
         if self.parser is None:
             raise RuntimeError("Parser is not built - call `build()` first")
 
-        return self.parser.parse(r"{}".format(data), lexer=self.lexer, debug=logger)
+        lexer = self.lexer.clone()
+        lexer.config = config or self.config
+        # Tracing formats the whole parser stack on every step, only worth it when it is shown
+        debug = logger if logger.isEnabledFor(logging.DEBUG) else False
+        # PLY keeps the parsing stacks on the parser object
+        with _parse_lock:
+            return self.parser.parse(data, lexer=lexer, debug=debug)
+
+    def tokenize(self, data):
+        if self.lexer is None:
+            raise RuntimeError("Parser is not built - call `build()` first")
+        lexer = self.lexer.clone()
+        lexer.input(data)
+        return list(iter(lexer.token, None))
+
+    def parse_tokens(self, tokens, config=None):
+        """
+        Parse already lexed tokens (eg. of a single statement)
+        """
+        stream = TokenStream(tokens, config or self.config)
+        debug = logger if logger.isEnabledFor(logging.DEBUG) else False
+        with _parse_lock:
+            return self.parser.parse(lexer=stream, debug=debug)
+
+    def parse_statements(self, data, config=None, workers=None, batch_size=DEFAULT_BATCH_SIZE):
+        """
+        High-throughput parsing of large rule files: `data` is lexed once and split into
+        top-level statements, every statement is parsed on its own and yielded as soon as it is ready.
+
+        `workers` > 1 - rules are parsed (and evaluated) in a process pool, `batch_size` statements
+        at a time. Assignments and `!IMPORT`/`!CONFIG` run in order in this process,
+        every batch of rules sees the state they've left before it
+        """
+        config = config or self.config
+        statements = split_statements(self.tokenize(data))
+        if workers is None or workers <= 1:
+            for (_, tokens) in statements:
+                yield from self.parse_tokens(tokens, config)
+            return
+
+        yield from _parse_parallel(self, data, statements, config, workers, batch_size)
+
+
+class TokenStream(object):
+    """
+    Lexer interface over already lexed tokens - just what the parser uses when it is given
+    no text: `token()` and the `config` productions read through `p.lexer`
+    """
+    def __init__(self, tokens, config):
+        self.config = config
+        self._tokens = iter(tokens)
+
+    def token(self):
+        return next(self._tokens, None)
+
+
+# Statement kinds
+RULE = "rule"
+ASSIGN = "assign"
+EXEC = "exec"
+
+OPENING = ("LPAREN", "LBRACKET")
+CLOSING = ("RPAREN", "RBRACKET")
+POSTFIX = ("MODIF_PLUS", "MODIF_STAR", "MODIF_QMARK", "EXEC")
+
+
+def _skip_group(tokens, i):
+    depth = 0
+    while i < len(tokens):
+        t = tokens[i].type
+        if t in OPENING:
+            depth += 1
+        elif t in CLOSING:
+            depth -= 1
+            if depth == 0:
+                return i + 1
+        i += 1
+    return i
+
+
+def _skip_macro(tokens, i, postfix=POSTFIX):
+    n = len(tokens)
+    while i < n and tokens[i].type == "AMP":
+        i += 1
+    if i < n and tokens[i].type == "KEYWORD":
+        i += 1
+        # `KEYWORD {...}` at the end of a statement is a new statement after the keyword
+        if i < n and tokens[i].type == "LPAREN":
+            i = _skip_group(tokens, i)
+    while i < n and tokens[i].type in postfix:
+        i += 1
+    return i
+
+
+def _skip_arg(tokens, i):
+    if i < len(tokens) and tokens[i].type in ("LITERAL", "NAME"):
+        return i + 1
+    if i < len(tokens) and tokens[i].type == "LBRACKET":
+        return _skip_group(tokens, i)
+    return _skip_macro(tokens, i)
+
+
+def split_statements(tokens):
+    """
+    Split lexed document into `(kind, tokens)` of its top-level statements.
+    Statement ends follow the precedence rules of the grammar: a postfix `?`, `*`, `+`
+    belongs to the macro before it, as does `!` - unless it ends an `!EXEC` statement
+    """
+    n = len(tokens)
+    i = 0
+    while i < n:
+        start = i
+        if tokens[i].type == "NAME" and i + 1 < n and tokens[i + 1].type == "ASSIGN":
+            kind = ASSIGN
+            i = _skip_arg(tokens, i + 2)
+            while i < n and tokens[i].type in ("COMMA", "PIPE"):
+                i = _skip_arg(tokens, i + 1)
+        elif tokens[i].type == "EXEC":
+            kind = EXEC
+            i = _skip_macro(tokens, i + 1, postfix=POSTFIX[:-1])
+        else:
+            kind = RULE
+            while i < n and tokens[i].type != "ARROW":
+                i = _skip_group(tokens, i) if tokens[i].type in OPENING else i + 1
+            i = _skip_macro(tokens, i + 1)
+        yield kind, tokens[start:i]
+
+
+def _source(data, tokens):
+    (first, last) = (tokens[0], tokens[-1])
+    # Literal values come without quotes
+    end = last.lexpos + len(last.value) + (2 if last.type == "LITERAL" else 0)
+    return first.lineno, data[first.lexpos:end]
+
+
+def _snapshot(config):
+    from rita.config import SessionConfig
+    snapshot = SessionConfig()
+    snapshot._data = dict(config._data)
+    snapshot.modules = list(config.modules)
+    snapshot.variables = dict(config.variables)
+    return snapshot
+
+
+def _chunked(statements, size):
+    chunk = []
+    for statement in statements:
+        chunk.append(statement)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+class ParsedRule(object):
+    """
+    Rule already evaluated in a worker process, stands in for its macro chain
+    """
+    __slots__ = ("rule",)
+
+    def __init__(self, rule):
+        self.rule = rule
+
+    def __call__(self, *args, **kwargs):
+        return self.rule
+
+
+def _parse_parallel(parser, data, statements, config, workers, batch_size):
+    # Heavy to import, only needed here
+    from concurrent.futures import ProcessPoolExecutor
+
+    pending = []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for chunk in _chunked(statements, batch_size):
+            # Workers replay assignments and `!EXEC`s of their chunk on the state before it,
+            # here they are run for the state of the following chunks
+            snapshot = _snapshot(config)
+            names = set(tok.value for (_, tokens) in chunk for tok in tokens if tok.type == "NAME")
+            state = (snapshot._data,
+                     [mod.__name__ for mod in snapshot.modules],
+                     {k: v for (k, v) in snapshot.variables.items() if k in names})
+            sources = [(kind,) + _source(data, tokens) for (kind, tokens) in chunk]
+            future = pool.submit(_parse_batch, sources, state)
+            local = [None if kind == RULE else parser.parse_tokens(tokens, config)
+                     for (kind, tokens) in chunk]
+            pending.append((future, chunk, local, snapshot))
+
+        for (future, chunk, local, snapshot) in pending:
+            try:
+                rules = iter(future.result())
+            except Exception as ex:
+                # Eg. variables or results which can't be pickled - parsed here instead,
+                # a real syntax error is raised the same way
+                logger.debug("Parsing batch in the main process: {}".format(ex))
+                for (_, tokens) in chunk:
+                    yield from parser.parse_tokens(tokens, snapshot)
+                continue
+
+            for parsed in local:
+                if parsed is not None:
+                    yield from parsed
+                else:
+                    yield from (ParsedRule(rule) for rule in next(rules))
+
+
+def _parse_batch(sources, state):
+    from rita.config import SessionConfig
+    (data, modules, variables) = state
+    config = SessionConfig()
+    config._data.update(data)
+    for mod_name in modules:
+        config.register_module(mod_name)
+    config.variables.update(variables)
+
+    parser = RitaParser(config).build()
+    rules = []
+    for (kind, lineno, source) in sources:
+        tokens = parser.tokenize(source)
+        for tok in tokens:
+            tok.lineno += lineno - 1
+        parsed = parser.parse_tokens(tokens)
+        if kind == RULE:
+            rules.append([doc() if doc else None for doc in parsed])
+    return rules
+
+
+_tables = None
+_tables_lock = threading.Lock()
+_parse_lock = threading.RLock()
+
+
+def shared_tables():
+    """
+    `(lexer, parser)` built once per process. Parser tables come pregenerated
+    from `rita/parsetab.py` (`make parsetab` after changing the grammar),
+    nothing is written into the package directory
+    """
+    global _tables
+    with _tables_lock:
+        if _tables is None:
+            lexer = RitaLexer().build()
+            parser = yacc.yacc(module=RitaParser(), errorlog=logger, optimize=True,
+                               tabmodule="rita.parsetab", write_tables=False, debug=False)
+            _tables = (lexer, parser)
+    return _tables
+
+
+def parse(data, config, workers=None):
+    """
+    Parse the whole document statement by statement (see `RitaParser.parse_statements`)
+    """
+    return list(RitaParser(config).build().parse_statements(data, workers=workers))
@@ -0,0 +1,57 @@
+
+# parsetab.py
+# This file is automatically generated. Do not edit.
+# pylint: disable=W,C,R
+_tabversion = '3.10'
+
+_lr_method = 'LALR'
+
+_lr_signature = 'nonassocARROWnonassocPIPEnonassocCOMMAleftEXECleftASSIGNleftRBRACKETLBRACKETLPARENRPARENleftKEYWORDNAMELITERALrightMODIF_QMARKMODIF_STARMODIF_PLUSrightAMPAMP ARROW ASSIGN COMMA EXEC KEYWORD LBRACKET LITERAL LPAREN MODIF_PLUS MODIF_QMARK MODIF_STAR NAME PIPE RBRACKET RPAREN\n        DOCUMENT : MACRO_CHAIN\n                 | MACRO_EXEC\n                 | VARIABLE\n        \n        DOCUMENT : DOCUMENT MACRO_CHAIN\n                 | DOCUMENT MACRO_EXEC\n                 | DOCUMENT VARIABLE\n         MACRO_CHAIN : MACRO ARROW MACRO  MACRO_CHAIN : ARRAY ARROW MACRO  MACRO_EXEC : EXEC MACRO \n        MACRO : MACRO MODIF_PLUS\n              | MACRO MODIF_STAR\n              | MACRO MODIF_QMARK\n              | MACRO EXEC\n         MACRO : AMP MACRO  MACRO : KEYWORD  MACRO : KEYWORD LPAREN ARGS RPAREN  MACRO : KEYWORD ARRAY  ARRAY : LBRACKET ARGS RBRACKET  VARIABLE_NAME : NAME  VARIABLE : NAME ASSIGN ARGS  ARG : ARG PIPE ARG  ARGS : ARGS COMMA ARG  ARGS : ARG  ARG : LITERAL  ARG : MACRO  ARG : VARIABLE_NAME  ARGS : ARRAY '
+    
+_lr_action_items = {'EXEC':([0,1,2,3,4,5,10,12,13,14,16,17,18,19,21,23,25,27,28,29,30,31,32,33,34,35,37,40,41,42,],[7,7,-1,-2,-3,19,-15,-4,-5,-6,-10,-11,-12,-13,-9,-14,-17,-23,-27,-24,19,-26,-19,19,19,-20,-18,-16,-22,-21,]),'NAME':([0,1,2,3,4,10,11,12,13,14,16,17,18,19,21,22,23,24,25,27,28,29,30,31,32,33,34,35,37,38,39,40,41,42,],[8,8,-1,-2,-3,-15,32,-4,-5,-6,-10,-11,-12,-13,-9,32,-14,32,-17,-23,-27,-24,-25,-26,-19,-7,-8,-20,-18,32,32,-16,-22,-21,]),'AMP':([0,1,2,3,4,7,9,10,11,12,13,14,15,16,17,18,19,20,21,22,23,24,25,27,28,29,30,31,32,33,34,35,37,38,39,40,41,42,],[9,9,-1,-2,-3,9,9,-15,9,-4,-5,-6,9,-10,-11,-12,-13,9,-9,9,-14,9,-17,-23,-27,-24,-25,-26,-19,-7,-8,-20,-18,9,9,-16,-22,-21,]),'KEYWORD':([0,1,2,3,4,7,9,10,11,12,13,14,15,16,17,18,19,20,21,22,23,24,25,27,28,29,30,31,32,33,34,35,37,38,39,40,41,42,],[10,10,-1,-2,-3,10,10,-15,10,-4,-5,-6,10,-10,-11,-12,-13,10,-9,10,-14,10,-17,-23,-27,-24,-25,-26,-19,-7,-8,-20,-18,10,10,-16,-22,-21,]),'LBRACKET':([0,1,2,3,4,10,11,12,13,14,16,17,18,19,21,22,23,24,25,27,28,29,30,31,32,33,34,35,37,40,41,42,],[11,11,-1,-2,-3,-15,11,-4,-5,-6,-10,-11,-12,-13,-9,11,-14,11,-17,-23,-27,-24,-25,-26,-19,-7,-8,-20,-18,-16,-22,-21,]),'$end':([1,2,3,4,10,12,13,14,16,17,18,19,21,23,25,27,28,29,30,31,32,33,34,35,37,40,41,42,],[0,-1,-2,-3,-15,-4,-5,-6,-10,-11,-12,-13,-9,-14,-17,-23,-27,-24,-25,-26,-19,-7,-8,-20,-18,-16,-22,-21,]),'ARROW':([5,6,10,16,17,18,19,23,25,37,40,],[15,20,-15,-10,-11,-12,-13,-14,-17,-18,-16,]),'MODIF_PLUS':([5,10,16,17,18,19,21,23,25,30,33,34,37,40,],[16,-15,-10,-11,-12,-13,16,-14,-17,16,16,16,-18,-16,]),'MODIF_STAR':([5,10,16,17,18,19,21,23,25,30,33,34,37,40,],[17,-15,-10,-11,-12,-13,17,-14,-17,17,17,17,-18,-16,]),'MODIF_QMARK':([5,10,16,17,18,19,21,23,25,30,33,34,37,40,],[18,-15,-10,-11,-12,-13,18,-14,-17,18,18,18,-18,-16,]),'ASSIGN':([8,],[22,]),'PIPE':([10,16,17,18,19,23,25,27,29,30,31,32,37,40,41,42,],[-15,-10,-11,-12,-13,-14,-17,39,-24,-25,-26,-19,-18,-16,39,None,]),'RBRACKET':([10,16,17,18,19,23,25,26,27,28,29,30,31,32,37,40,41,42,],[-15,-10,-11,-12,-13,-14,-17,37,-23,-27,-24,-25,-26,-19,-18,-16,-22,-21,]),'COMMA':([10,16,17,18,19,23,25,26,27,28,29,30,31,32,35,36,37,40,41,42,],[-15,-10,-11,-12,-13,-14,-17,38,-23,-27,-24,-25,-26,-19,38,38,-18,-16,-22,-21,]),'RPAREN':([10,16,17,18,19,23,25,27,28,29,30,31,32,36,37,40,41,42,],[-15,-10,-11,-12,-13,-14,-17,-23,-27,-24,-25,-26,-19,40,-18,-16,-22,-21,]),'LPAREN':([10,],[24,]),'LITERAL':([11,22,24,38,39,],[29,29,29,29,29,]),}
+
+_lr_action = {}
+for _k, _v in _lr_action_items.items():
+   for _x,_y in zip(_v[0],_v[1]):
+      if not _x in _lr_action:  _lr_action[_x] = {}
+      _lr_action[_x][_k] = _y
+del _lr_action_items
+
+_lr_goto_items = {'DOCUMENT':([0,],[1,]),'MACRO_CHAIN':([0,1,],[2,12,]),'MACRO_EXEC':([0,1,],[3,13,]),'VARIABLE':([0,1,],[4,14,]),'MACRO':([0,1,7,9,11,15,20,22,24,38,39,],[5,5,21,23,30,33,34,30,30,30,30,]),'ARRAY':([0,1,10,11,22,24,],[6,6,25,28,28,28,]),'ARGS':([11,22,24,],[26,35,36,]),'ARG':([11,22,24,38,39,],[27,27,27,41,42,]),'VARIABLE_NAME':([11,22,24,38,39,],[31,31,31,31,31,]),}
+
+_lr_goto = {}
+for _k, _v in _lr_goto_items.items():
+   for _x, _y in zip(_v[0], _v[1]):
+       if not _x in _lr_goto: _lr_goto[_x] = {}
+       _lr_goto[_x][_k] = _y
+del _lr_goto_items
+_lr_productions = [
+  ("S' -> DOCUMENT","S'",1,None,None,None),
+  ('DOCUMENT -> MACRO_CHAIN','DOCUMENT',1,'p_document','parser.py',75),
+  ('DOCUMENT -> MACRO_EXEC','DOCUMENT',1,'p_document','parser.py',76),
+  ('DOCUMENT -> VARIABLE','DOCUMENT',1,'p_document','parser.py',77),
+  ('DOCUMENT -> DOCUMENT MACRO_CHAIN','DOCUMENT',2,'p_document_list','parser.py',84),
+  ('DOCUMENT -> DOCUMENT MACRO_EXEC','DOCUMENT',2,'p_document_list','parser.py',85),
+  ('DOCUMENT -> DOCUMENT VARIABLE','DOCUMENT',2,'p_document_list','parser.py',86),
+  ('MACRO_CHAIN -> MACRO ARROW MACRO','MACRO_CHAIN',3,'p_macro_chain','parser.py',92),
+  ('MACRO_CHAIN -> ARRAY ARROW MACRO','MACRO_CHAIN',3,'p_macro_chain_from_array','parser.py',101),
+  ('MACRO_EXEC -> EXEC MACRO','MACRO_EXEC',2,'p_macro_exec','parser.py',110),
+  ('MACRO -> MACRO MODIF_PLUS','MACRO',2,'p_macro_w_modif','parser.py',117),
+  ('MACRO -> MACRO MODIF_STAR','MACRO',2,'p_macro_w_modif','parser.py',118),
+  ('MACRO -> MACRO MODIF_QMARK','MACRO',2,'p_macro_w_modif','parser.py',119),
+  ('MACRO -> MACRO EXEC','MACRO',2,'p_macro_w_modif','parser.py',120),
+  ('MACRO -> AMP MACRO','MACRO',2,'p_macro_anchored','parser.py',127),
+  ('MACRO -> KEYWORD','MACRO',1,'p_macro_wo_args','parser.py',133),
+  ('MACRO -> KEYWORD LPAREN ARGS RPAREN','MACRO',4,'p_macro_w_args','parser.py',139),
+  ('MACRO -> KEYWORD ARRAY','MACRO',2,'p_macro_from_array','parser.py',145),
+  ('ARRAY -> LBRACKET ARGS RBRACKET','ARRAY',3,'p_array','parser.py',151),
+  ('VARIABLE_NAME -> NAME','VARIABLE_NAME',1,'p_variable','parser.py',155),
+  ('VARIABLE -> NAME ASSIGN ARGS','VARIABLE',3,'p_variable_from_args','parser.py',159),
+  ('ARG -> ARG PIPE ARG','ARG',3,'p_either','parser.py',168),
+  ('ARGS -> ARGS COMMA ARG','ARGS',3,'p_arg_list','parser.py',172),
+  ('ARGS -> ARG','ARGS',1,'p_args','parser.py',176),
+  ('ARG -> LITERAL','ARG',1,'p_arg','parser.py',180),
+  ('ARG -> MACRO','ARG',1,'p_arg_from_macro','parser.py',184),
+  ('ARG -> VARIABLE_NAME','ARG',1,'p_arg_from_var','parser.py',188),
+  ('ARGS -> ARRAY','ARGS',1,'p_arg_from_array','parser.py',192),
+]
@@ -1,44 +1,144 @@
+import os
 import re
+import hashlib
 import logging
+import threading
 
-from functools import partial
-from typing import Match
+from typing import Dict, List, Match, NamedTuple, Optional, Tuple
 
 
 logger = logging.getLogger(__name__)
 
 
-MAX_DEPTH = 5
+IMPORT_PATTERN = re.compile(r"@import\s+[\"'](?P<path>(\w|[/\-.])+)[\"']")
 ALIAS_PATTERN = re.compile(r"@alias\s+(?P<original>(\w|[_])+)\s+(?P<alias>(\w|[_])+)")
+# String literals and comments are skipped as the lexer does (neither spans lines),
+# an alias is a name used as a macro after whitespace, `->` or `{`
+ALIAS_USE = r"""(?P<skip>"(\\.|[^"\\\n])*"|'(\\.|[^'\\\n])*'|\#[^\n]*)|(?P<before>\s|->|{{)(?P<alias>{0})\("""
 
+Stamp = Tuple[int, int]
 
-def handle_import(m: Match, depth: int = 0) -> str:
-    path = m.group("path")
-    logger.debug("Importing: {}".format(path))
-    with open(path, "r") as f:
-        return precompile(f.read(), depth+1)
 
+class ImportedFile(NamedTuple):
+    text: str
+    digest: str
+    # `(mtime_ns, size)` of the file and of everything it imports, directly or not
+    stamps: Dict[str, Stamp]
+    imports: Tuple[str, ...]
+    cwd: str
 
-def precompile(raw: str, depth: int = 0) -> str:
-    if depth > MAX_DEPTH:
-        raise RuntimeError(
-            "Maximum depth limit has been reached. "
-            "Please check if you don't have cyclical imports"
-        )
 
-    raw = re.sub(
-        r"@import\s+[\"'](?P<path>(\w|[/\-.])+)[\"']",
-        partial(handle_import, depth=depth),
-        raw
-    )
+def _stamp(path: str) -> Stamp:
+    st = os.stat(path)
+    return st.st_mtime_ns, st.st_size
 
-    for m in ALIAS_PATTERN.finditer(raw):
-        # Delete alias definition
-        full = m.group(0)
-        raw = raw.replace(full, "")
 
-        original = m.group("original")
-        alias = m.group("alias")
-        raw = re.sub(r"(?:(\s|->|{{))(?P<alias>{})([\(])".format(alias), r"\1{}(".format(original), raw)
+class ImportGraph(object):
+    """
+    `@import`ed files with their expanded contents, shared by all compilations in the process.
 
-    return raw
+    A file is read again only if it or anything it imports has changed (mtime or size);
+    a changed mtime with the same content (sha256) reuses the expansion as well.
+    Import paths are resolved against the current working directory
+    """
+    def __init__(self):
+        self.files: Dict[str, ImportedFile] = {}
+        self.stats = {"hits": 0, "misses": 0}
+        self._lock = threading.RLock()
+
+    def clear(self):
+        with self._lock:
+            self.files.clear()
+
+    def imports(self, path: str) -> Tuple[str, ...]:
+        """
+        Files imported directly by `path` (absolute paths), as of its last expansion
+        """
+        entry = self.files.get(os.path.abspath(path))
+        return entry.imports if entry else ()
+
+    def _fresh(self, entry: ImportedFile, skip: Optional[str] = None) -> bool:
+        if entry.imports and entry.cwd != os.getcwd():
+            return False
+        try:
+            return all(_stamp(path) == stamp
+                       for (path, stamp) in entry.stamps.items()
+                       if path != skip)
+        except OSError:
+            return False
+
+    def load(self, path: str, chain: Tuple[str, ...] = ()) -> str:
+        """
+        Expanded contents of `path`, imported from the files in `chain`
+        """
+        key = os.path.abspath(path)
+        if key in chain:
+            raise RuntimeError(
+                "Cyclical import: {}".format(" -> ".join(chain[chain.index(key):] + (key,)))
+            )
+
+        with self._lock:
+            entry = self.files.get(key)
+            if entry is not None and self._fresh(entry):
+                self.stats["hits"] += 1
+                return entry.text
+
+            logger.debug("Importing: {}".format(path))
+            stamp = _stamp(key)
+            with open(key, "rb") as f:
+                data = f.read()
+            digest = hashlib.sha256(data).hexdigest()
+
+            if entry is not None and entry.digest == digest and self._fresh(entry, skip=key):
+                # Touched, but not changed
+                self.stats["hits"] += 1
+                self.files[key] = entry._replace(stamps=dict(entry.stamps, **{key: stamp}))
+                return entry.text
+
+            self.stats["misses"] += 1
+            imports: List[str] = []
+            text = _expand(data.decode("UTF-8"), self, chain + (key,), imports)
+            stamps = {key: stamp}
+            for imported in imports:
+                stamps.update(self.files[imported].stamps)
+            self.files[key] = ImportedFile(text, digest, stamps, tuple(imports), os.getcwd())
+            return text
+
+
+import_graph = ImportGraph()
+
+
+def resolve_aliases(raw: str) -> str:
+    """
+    Remove `@alias` definitions and rename all aliased macros in a single pass
+    """
+    aliases = {m.group("alias"): m.group("original")
+               for m in ALIAS_PATTERN.finditer(raw)}
+    if not aliases:
+        return raw
+
+    raw = ALIAS_PATTERN.sub("", raw)
+    names = "|".join(re.escape(alias) for alias in sorted(aliases, key=len, reverse=True))
+
+    def replace(m: Match) -> str:
+        if m.group("skip") is not None:
+            return m.group("skip")
+        return "{0}{1}(".format(m.group("before"), aliases[m.group("alias")])
+
+    return re.sub(ALIAS_USE.format(names), replace, raw)
+
+
+def _expand(raw: str, graph: ImportGraph, chain: Tuple[str, ...], imports: List[str]) -> str:
+    def handle_import(m: Match) -> str:
+        text = graph.load(m.group("path"), chain)
+        imports.append(os.path.abspath(m.group("path")))
+        return text
+
+    return resolve_aliases(IMPORT_PATTERN.sub(handle_import, raw))
+
+
+def precompile(raw: str, graph: Optional[ImportGraph] = None) -> str:
+    """
+    Expand `@import`s (`graph` - import cache, the process-wide `import_graph` by default) and resolve `@alias`es
+    """
+    return _expand(raw, graph or import_graph, (), [])
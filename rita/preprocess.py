@@ -1,7 +1,8 @@
 import logging
+import sys
 
 from functools import reduce
-from typing import Any, Mapping, Callable, List
+from typing import Any, Mapping, Callable, Dict, List, Tuple
 
 from rita.utils import Node, deaccent, ExtendedOp
 from rita.types import RuleGroup, Rules
@@ -234,6 +235,32 @@ def handle_rule_branching(rules: Rules, config: SessionConfig):
             yield group_label, pattern
 
 
+def intern_lists(rules: Rules, config: SessionConfig):
+    """
+    A list used by many rules (eg. a `LOAD`ed variable) is built for every one of them (see `handle_deaccent`).
+    Lists with the same items become one shared list - keyed by its items, so each distinct list
+    is stored (and built by an engine) once
+    """
+    interned: Dict[Tuple[str, ...], List[str]] = {}
+    (duplicates, saved) = (0, 0)
+    for group_label, pattern in rules:
+        data = []
+        for p in pattern:
+            (name, args, op) = p
+            if name == "any_of" and isinstance(args, list):
+                shared = interned.setdefault(tuple(args), args)
+                if shared is not args:
+                    duplicates += 1
+                    saved += sys.getsizeof(args) + sum(sys.getsizeof(item)
+                                                       for (item, kept) in zip(args, shared) if item is not kept)
+                    p = (name, shared, op)
+            data.append(p)
+        yield group_label, data
+
+    if duplicates:
+        logger.info("Interned {0} lists: {1} duplicates, {2} bytes saved".format(len(interned), duplicates, saved))
+
+
 def dummy(rules: Rules, config: SessionConfig):
     """
     Placeholder which does nothing
@@ -312,4 +339,6 @@ def preprocess_rules(root, config: SessionConfig) -> Rules:
         logger.info("Adding implicit Punctuations")
         pipeline.append(add_implicit_punct)
 
+    pipeline.append(intern_lists)
+
     return reduce(lambda acc, p: p(acc, config), pipeline, rules)
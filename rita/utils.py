@@ -203,6 +203,41 @@ def timer(title):
     t.stop()
 
 
+# UTF-8 continuation bytes: 10xxxxxx
+CONTINUATION_BYTES = bytes(range(0x80, 0xC0))
+
+
+def _char_count(encoded) -> int:
+    if isinstance(encoded, memoryview):
+        encoded = encoded.tobytes()
+    return len(encoded.translate(None, CONTINUATION_BYTES))
+
+
+class ByteOffsets(object):
+    """
+    Converts byte offsets of an UTF-8 buffer (`bytes`, `mmap`, `memoryview`)
+    into character offsets of the decoded text.
+
+    Characters are counted per block of bytes, lazily and only up to
+    the highest offset asked for - nothing is decoded or copied as a whole
+    """
+    BLOCK_SIZE = 1 << 16
+
+    def __init__(self, encoded):
+        self.encoded = encoded
+        # Number of characters before the start of each block
+        self.checkpoints = [0]
+
+    def __call__(self, idx: int) -> int:
+        block = idx // self.BLOCK_SIZE
+        while len(self.checkpoints) <= block:
+            start = (len(self.checkpoints) - 1) * self.BLOCK_SIZE
+            chars = _char_count(self.encoded[start:start + self.BLOCK_SIZE])
+            self.checkpoints.append(self.checkpoints[-1] + chars)
+        start = block * self.BLOCK_SIZE
+        return self.checkpoints[block] + _char_count(self.encoded[start:idx])
+
+
 class RitaJSONEncoder(JSONEncoder):
     def default(self, o):
         if isinstance(o, ExtendedOp):
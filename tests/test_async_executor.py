@@ -0,0 +1,151 @@
+import asyncio
+import time
+
+import pytest
+
+import rita
+
+from rita.engine.async_executor import AsyncRuleExecutor
+
+RULES = """
+{WORD("red"), WORD("car")}->MARK("CAR")
+{NUM, WORD("cm")}->MARK("SIZE")
+{&WORD("price"), NUM}->MARK("PRICE")
+"""
+
+TEXTS = ["a red car", "", "10 cm wide", "price 42 for a red car"]
+
+
+def compile_rules(rules, **kwargs):
+    return rita.compile_string(rules, use_engine="standalone", **kwargs)
+
+
+@pytest.fixture
+def executor():
+    return compile_rules(RULES)
+
+
+class SlowRegex(object):
+    """
+    Wraps the `re` module, every match takes a while
+    """
+    import re
+    DOTALL = re.DOTALL
+    IGNORECASE = re.IGNORECASE
+
+    def __init__(self, delay):
+        self.delay = delay
+        self.calls = 0
+
+    def compile(self, *args, **kwargs):
+        pattern = self.re.compile(*args, **kwargs)
+        outer = self
+
+        class Pattern(object):
+            groupindex = pattern.groupindex
+
+            def finditer(self, *args):
+                for match in pattern.finditer(*args):
+                    outer.calls += 1
+                    time.sleep(outer.delay)
+                    yield match
+
+            def search(self, *args):
+                return pattern.search(*args)
+        return Pattern()
+
+
+class TestAsyncRuleExecutor:
+    def test_execute(self, executor):
+        async def run():
+            async with AsyncRuleExecutor(executor) as wrapper:
+                return [await wrapper.execute(text) for text in TEXTS]
+        assert asyncio.run(run()) == [list(executor.execute(text)) for text in TEXTS]
+
+    def test_execute_kwargs(self, executor):
+        async def run():
+            async with AsyncRuleExecutor(executor) as wrapper:
+                return await wrapper.execute(TEXTS[3], include_submatches=False, labels={"PRICE"})
+        assert asyncio.run(run()) == list(executor.execute(TEXTS[3], include_submatches=False, labels={"PRICE"}))
+
+    @pytest.mark.parametrize("pool", ["thread", "process"])
+    def test_execute_many(self, executor, pool):
+        async def run():
+            async with AsyncRuleExecutor(executor, pool=pool, max_workers=2, concurrency=2) as wrapper:
+                return await wrapper.execute_many(TEXTS)
+        assert asyncio.run(run()) == [list(executor.execute(text)) for text in TEXTS]
+
+    def test_stream(self, executor):
+        text = "a red car, 10 cm wide. " * 20
+
+        async def run():
+            async with AsyncRuleExecutor(executor) as wrapper:
+                return [r async for r in wrapper.stream(text, batch_size=3)]
+        assert asyncio.run(run()) == list(executor.execute(text))
+
+    def test_timeout_stops_work(self):
+        slow = SlowRegex(0.01)
+        executor = rita.compile_string(RULES, use_engine="standalone", regex_impl=slow)
+        text = "a red car " * 1000
+
+        async def run():
+            async with AsyncRuleExecutor(executor, timeout=0.05) as wrapper:
+                with pytest.raises(asyncio.TimeoutError):
+                    await wrapper.execute(text)
+            return slow.calls
+
+        calls = asyncio.run(run())
+        assert calls < 100
+
+    def test_cancel_stops_work(self):
+        slow = SlowRegex(0.01)
+        executor = rita.compile_string(RULES, use_engine="standalone", regex_impl=slow)
+        text = "a red car " * 1000
+
+        async def run():
+            async with AsyncRuleExecutor(executor) as wrapper:
+                task = asyncio.ensure_future(wrapper.execute(text))
+                await asyncio.sleep(0.05)
+                task.cancel()
+                with pytest.raises(asyncio.CancelledError):
+                    await task
+            return slow.calls
+
+        calls = asyncio.run(run())
+        assert calls < 100
+
+    def test_concurrency_limit(self, executor):
+        running = []
+        peak = []
+        execute_until = executor._execute_until
+
+        def tracking(*args, **kwargs):
+            running.append(1)
+            peak.append(len(running))
+            time.sleep(0.01)
+            yield from execute_until(*args, **kwargs)
+            running.pop()
+
+        executor._execute_until = tracking
+
+        async def run():
+            async with AsyncRuleExecutor(executor, max_workers=4, concurrency=2) as wrapper:
+                await wrapper.execute_many(TEXTS * 3)
+        asyncio.run(run())
+        assert max(peak) <= 2
+
+    def test_concurrency_across_loops(self, executor):
+        wrapper = AsyncRuleExecutor(executor, concurrency=1)
+
+        async def run():
+            return await wrapper.execute_many(TEXTS)
+        try:
+            # The semaphore of the first loop isn't reused by the second one
+            first = asyncio.run(run())
+            assert asyncio.run(run()) == first
+        finally:
+            wrapper.close()
+
+    def test_unknown_pool(self, executor):
+        with pytest.raises(ValueError):
+            AsyncRuleExecutor(executor, pool="fibers")
@@ -0,0 +1,170 @@
+import os
+import tempfile
+
+import pytest
+
+import rita
+
+from rita.cache import CompileCache, cache_key, default_cache
+
+RULES = """
+colors = {"red", "blue"}
+{IN_LIST(colors), WORD("car")}->MARK("CAR")
+{NUM, WORD("cm")}->MARK("SIZE")
+"""
+
+TEXT = "a red car, 10 cm wide"
+
+
+def compile_rules(rules, **kwargs):
+    return rita.compile_string(rules, use_engine="standalone", **kwargs)
+
+
+class TestCompileCache:
+    def test_memory_hit(self):
+        cache = CompileCache()
+        first = compile_rules(RULES, cache=cache)
+        second = compile_rules(RULES, cache=cache)
+        assert second.patterns is first.patterns
+        assert cache.stats["misses"] == 1
+        assert cache.stats["hits"] == 1
+        assert cache.stats["compile_time"] > 0
+
+    def test_key_covers_options(self):
+        cache = CompileCache()
+        plain = compile_rules(RULES, cache=cache)
+        prefiltered = compile_rules(RULES, cache=cache, prefilter=True)
+        assert prefiltered is not plain
+        assert prefiltered.prefilter is not None
+        assert cache.stats["misses"] == 2
+        assert len(cache) == 2
+
+    def test_key_covers_imports(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "colors.rita")
+            rules = '@import "{}"\n{{IN_LIST(colors), WORD("car")}}->MARK("CAR")'.format(path)
+            with open(path, "w") as f:
+                f.write('colors = {"red"}')
+            cache = CompileCache()
+            red = compile_rules(rules, cache=cache)
+            with open(path, "w") as f:
+                f.write('colors = {"blue"}')
+            blue = compile_rules(rules, cache=cache)
+        assert [r["text"] for r in red.execute("red car blue car")] == ["red car"]
+        assert [r["text"] for r in blue.execute("red car blue car")] == ["blue car"]
+
+    @pytest.mark.parametrize("disk", [False, True])
+    def test_key_covers_loads(self, disk):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "words.txt")
+            rules = 'words = LOAD("{}")\n{{IN_LIST(words)}}->MARK("W")'.format(path)
+            with open(path, "w") as f:
+                f.write("a\nb\n")
+            cache = CompileCache(directory=tmp if disk else None)
+            assert [r["text"] for r in compile_rules(rules, cache=cache).execute("a c")] == ["a"]
+            with open(path, "w") as f:
+                f.write("c\n")
+            if disk:
+                # Another process: empty memory, same directory
+                cache = CompileCache(directory=tmp)
+            assert [r["text"] for r in compile_rules(rules, cache=cache).execute("a c")] == ["c"]
+            assert cache.stats["misses"] == (1 if disk else 2)
+
+    def test_load_of_variable_uncacheable(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "words.txt")
+            with open(path, "w") as f:
+                f.write("a\n")
+            rules = 'path = "{}"\nwords = LOAD(path)\n{{IN_LIST(words)}}->MARK("W")'.format(path)
+            cache = CompileCache()
+            assert [r["text"] for r in compile_rules(rules, cache=cache).execute("a c")] == ["a"]
+            assert cache.stats["uncacheable"] == 1
+            assert len(cache) == 0
+
+    def test_hits_have_own_state(self):
+        rules = '!CONFIG("list_lookup_threshold", "2")\n' + RULES
+        cache = CompileCache()
+        first = compile_rules(rules, cache=cache)
+        second = compile_rules(rules, cache=cache)
+        assert second is not first
+        assert [r["text"] for r in first.execute(TEXT)] == ["red car", "10 cm"]
+        # Lists looked up in one text by the first executor are not seen by the second
+        assert first._last_lookup[0] == TEXT
+        assert second._last_lookup[0] is None
+        assert second._lookup_lock is not first._lookup_lock
+
+    def test_key_depends_on_version(self, mocker):
+        key = cache_key(RULES, "standalone", {}, {})
+        mocker.patch("rita.__version__", "0.0.0")
+        assert cache_key(RULES, "standalone", {}, {}) != key
+
+    def test_disk_tier(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            compiled = compile_rules(RULES, cache=CompileCache(directory=tmp), combined_scan=True)
+            # Another process: empty memory, same directory
+            cache = CompileCache(directory=tmp)
+            loaded = compile_rules(RULES, cache=cache, combined_scan=True)
+            assert cache.stats["disk_hits"] == 1
+            assert cache.stats["misses"] == 0
+            assert loaded.combined_scan is True
+            assert list(loaded.execute(TEXT)) == list(compiled.execute(TEXT))
+
+    def test_unreadable_disk_entry(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            compile_rules(RULES, cache=CompileCache(directory=tmp))
+            (name, ) = os.listdir(tmp)
+            with open(os.path.join(tmp, name), "wb") as f:
+                f.write(b"garbage")
+            cache = CompileCache(directory=tmp)
+            assert list(compile_rules(RULES, cache=cache).execute(TEXT))
+            assert cache.stats["misses"] == 1
+
+    def test_eviction_by_count(self):
+        cache = CompileCache(max_entries=2)
+        for i in range(3):
+            compile_rules(RULES, cache=cache, combined_scan=i + 1)
+        assert len(cache) == 2
+        assert cache.stats["evictions"] == 1
+
+    def test_eviction_by_size(self):
+        cache = CompileCache(max_bytes=1)
+        compile_rules(RULES, cache=cache)
+        assert len(cache) == 0
+
+    def test_uncacheable_kwargs(self):
+        cache = CompileCache()
+
+        class Impl(object):
+            pass
+
+        with pytest.raises(Exception):
+            compile_rules(RULES, cache=cache, regex_impl=Impl())
+        assert cache.stats["uncacheable"] == 1
+        assert len(cache) == 0
+
+    def test_default_cache(self):
+        default_cache.clear()
+        assert compile_rules(RULES, cache=True).patterns is compile_rules(RULES, cache=True).patterns
+        default_cache.clear()
+
+    def test_invalid_cache(self):
+        with pytest.raises(ValueError):
+            compile_rules(RULES, cache="yes")
+
+
+@pytest.mark.parametrize("cache", [None, "memory", "disk"])
+def test_benchmark_compile_cache(benchmark, cache):
+    """
+    Compiling a 500 rule ruleset: no cache, in-process hit, on-disk hit (fresh process).
+    Runs only with `--benchmark-enable` or `--benchmark-only`
+    """
+    rules = "\n".join('{{WORD("word{0}"), NUM}}->MARK("LABEL_{0}")'.format(i) for i in range(500))
+    if cache is None:
+        benchmark(lambda: compile_rules(rules))
+    elif cache == "memory":
+        memory = CompileCache()
+        benchmark(lambda: compile_rules(rules, cache=memory))
+    else:
+        with tempfile.TemporaryDirectory() as tmp:
+            compile_rules(rules, cache=CompileCache(directory=tmp))
+            benchmark(lambda: compile_rules(rules, cache=CompileCache(directory=tmp)))
@@ -126,3 +126,33 @@ def test_set_config_non_string_value_stored_as_is(cfg):
 def test_get_unknown_variable_raises(cfg):
     with pytest.raises(KeyError):
         cfg.get_variable("nope")
+
+
+def test_engines_resolved_on_first_use(cfg):
+    from rita.engine.translate_standalone import compile_rules
+    cfg.register_engine(10, "lazy", "rita.engine.translate_standalone:compile_rules")
+    try:
+        assert cfg.engines_by_key["lazy"] == "rita.engine.translate_standalone:compile_rules"
+        assert cfg.set_engine("lazy") is compile_rules
+        assert cfg.engines_by_key["lazy"] is compile_rules
+    finally:
+        cfg._root.available_engines = [e for e in cfg.available_engines if e[1] != "lazy"]
+        del cfg._root.engines_by_key["lazy"]
+
+
+def test_engine_from_entry_point(cfg, mocker):
+    from importlib.metadata import EntryPoint
+    from rita.engine.translate_standalone import compile_rules
+    ep = EntryPoint(name="plugin", value="rita.engine.translate_standalone:compile_rules", group="rita.engines")
+    mocker.patch("importlib.metadata.entry_points", return_value=[ep])
+    try:
+        assert cfg.set_engine("plugin") is compile_rules
+        assert cfg.current_engine == "plugin"
+    finally:
+        del cfg._root.engines_by_key["plugin"]
+
+
+def test_unknown_engine(cfg, mocker):
+    mocker.patch("importlib.metadata.entry_points", return_value=[])
+    with pytest.raises(KeyError, match="standalone"):
+        cfg.set_engine("nope")
@@ -2,7 +2,7 @@ import pytest
 
 import rita
 
-from utils import spacy_engine, standalone_engine, rust_engine, load_rules
+from utils import spacy_engine, standalone_engine, rust_engine, token_engine, load_rules
 
 
 @pytest.fixture(scope="session")
@@ -28,7 +28,7 @@ def test_color_car(engine):
     assert entities.issuperset(expected)
 
 
-@pytest.mark.parametrize('engine', [spacy_engine, standalone_engine, rust_engine])
+@pytest.mark.parametrize('engine', [spacy_engine, standalone_engine, rust_engine, token_engine])
 def test_fuzzy_matching(engine):
     parser = engine("""
     !IMPORT("rita.modules.fuzzy")
@@ -57,7 +57,7 @@ def test_fuzzy_matching(engine):
     assert entities[0] == ("SQUIRREL", "CRITTER")
 
 
-@pytest.mark.parametrize('engine', [spacy_engine, standalone_engine, rust_engine])
+@pytest.mark.parametrize('engine', [spacy_engine, standalone_engine, rust_engine, token_engine])
 def test_election(engine):
     parser = engine(
         """
@@ -77,7 +77,7 @@ def test_election(engine):
     assert entities.issuperset(expected)
 
 
-@pytest.mark.parametrize('engine', [spacy_engine, standalone_engine, rust_engine])
+@pytest.mark.parametrize('engine', [spacy_engine, standalone_engine, rust_engine, token_engine])
 def test_dash_case(engine):
     parser = engine(load_rules("examples/dress-match.rita"))
     text = """
@@ -94,7 +94,7 @@ def test_dash_case(engine):
     assert entities.issuperset(expected)
 
 
-@pytest.mark.parametrize('engine', [spacy_engine, standalone_engine])
+@pytest.mark.parametrize('engine', [spacy_engine, standalone_engine, token_engine])
 def test_exclude_word(engine):
     # Rust engine doesn't work here, because Re2 doesn't support backtracking operator
     parser = engine(load_rules("examples/excluding-word.rita"))
@@ -109,13 +109,13 @@ def test_exclude_word(engine):
     assert len(r2) == 0
 
 
-@pytest.mark.parametrize('engine', [spacy_engine, standalone_engine, rust_engine])
+@pytest.mark.parametrize('engine', [spacy_engine, standalone_engine, rust_engine, token_engine])
 def test_escape_string(engine):
     # If it compiles - good enough
     engine(load_rules("examples/match-with-escaped-string.rita"))
 
 
-@pytest.mark.parametrize('engine', [spacy_engine, standalone_engine, rust_engine])
+@pytest.mark.parametrize('engine', [spacy_engine, standalone_engine, rust_engine, token_engine])
 def test_case_sensitive(engine):
     parser = engine(
         """
@@ -143,7 +143,7 @@ def test_case_sensitive(engine):
     assert filtered[0] == ("Bitcoin Cash", "CRYPTO")
 
 
-@pytest.mark.parametrize('engine', [spacy_engine, standalone_engine, rust_engine])
+@pytest.mark.parametrize('engine', [spacy_engine, standalone_engine, rust_engine, token_engine])
 def test_with_implicit_hyphon(engine):
     parser = engine(
         """
@@ -162,7 +162,7 @@ def test_with_implicit_hyphon(engine):
     assert results[0] == ("Hello - world", "HYPHON_LABEL")
 
 
-@pytest.mark.parametrize('engine', [spacy_engine, standalone_engine, rust_engine])
+@pytest.mark.parametrize('engine', [spacy_engine, standalone_engine, rust_engine, token_engine])
 def test_without_implicit_hyphon(engine):
     parser = engine(
         """
@@ -181,7 +181,7 @@ def test_without_implicit_hyphon(engine):
     assert results[0] == ("Hello", "HELLO_LABEL")
 
 
-@pytest.mark.parametrize('engine', [spacy_engine, standalone_engine, rust_engine])
+@pytest.mark.parametrize('engine', [spacy_engine, standalone_engine, rust_engine, token_engine])
 def test_prefix(engine):
     parser = engine(
         """
@@ -244,7 +244,7 @@ def test_compile_context(engine):
     }
 
 
-@pytest.mark.parametrize('engine', [spacy_engine, standalone_engine, rust_engine])
+@pytest.mark.parametrize('engine', [spacy_engine, standalone_engine, rust_engine, token_engine])
 def test_benchmark(benchmark, engine, bench_text):
     """
     These tests will only run if parameters:
@@ -266,7 +266,7 @@ def test_benchmark(benchmark, engine, bench_text):
     )
 
 
-@pytest.mark.parametrize('engine', [spacy_engine, standalone_engine, rust_engine])
+@pytest.mark.parametrize('engine', [spacy_engine, standalone_engine, rust_engine, token_engine])
 def test_variable_pattern(engine):
     parser = engine("""
     Complex_Number = { NUM+, WORD("/")?, NUM? }
@@ -281,7 +281,7 @@ def test_variable_pattern(engine):
     assert len(results) == 2
 
 
-@pytest.mark.parametrize('engine', [spacy_engine, standalone_engine, rust_engine])
+@pytest.mark.parametrize('engine', [spacy_engine, standalone_engine, rust_engine, token_engine])
 def test_inlist_longest(engine):
     parser = engine("""
     units = {"m", "mm", "cm"}
@@ -300,7 +300,7 @@ def test_inlist_longest(engine):
     assert result == "width 10 mm"
 
 
-@pytest.mark.parametrize('engine', [standalone_engine, rust_engine])
+@pytest.mark.parametrize('engine', [standalone_engine, rust_engine, token_engine])
 def test_inlist_word_based(engine):
     parser = engine("""
     units = {"m", "mm", "cm", "inches", "in"}
@@ -316,7 +316,7 @@ def test_inlist_word_based(engine):
     assert len(results) == 0
 
 
-@pytest.mark.parametrize('engine', [standalone_engine, spacy_engine, rust_engine])
+@pytest.mark.parametrize('engine', [standalone_engine, spacy_engine, rust_engine, token_engine])
 def test_pluralize(engine):
     pytest.importorskip("inflect")
     parser = engine("""
@@ -361,7 +361,7 @@ def test_orth_example(engine):
     assert {"IEEE", "ISO"} == results
 
 
-@pytest.mark.parametrize('engine', [standalone_engine, spacy_engine, rust_engine])
+@pytest.mark.parametrize('engine', [standalone_engine, spacy_engine, rust_engine, token_engine])
 def test_regex_module_start(engine):
     parser = engine("""
     !IMPORT("rita.modules.regex")
@@ -382,7 +382,7 @@ def test_regex_module_start(engine):
     assert {"are", "alphabet"} == results
 
 
-@pytest.mark.parametrize('engine', [standalone_engine, spacy_engine, rust_engine])
+@pytest.mark.parametrize('engine', [standalone_engine, spacy_engine, rust_engine, token_engine])
 def test_regex_module_end(engine):
     parser = engine("""
     !IMPORT("rita.modules.regex")
@@ -403,7 +403,7 @@ def test_regex_module_end(engine):
     assert {"there", "are", "the"} == results
 
 
-@pytest.mark.parametrize('engine', [standalone_engine, spacy_engine, rust_engine])
+@pytest.mark.parametrize('engine', [standalone_engine, spacy_engine, rust_engine, token_engine])
 def test_regex_module_middle(engine):
     parser = engine("""
     !IMPORT("rita.modules.regex")
@@ -424,7 +424,7 @@ def test_regex_module_middle(engine):
     assert {"letters", "alphabet"} == results
 
 
-@pytest.mark.parametrize('engine', [standalone_engine, spacy_engine, rust_engine])
+@pytest.mark.parametrize('engine', [standalone_engine, spacy_engine, rust_engine, token_engine])
 def test_regex_module_strict(engine):
     parser = engine("""
     !IMPORT("rita.modules.regex")
@@ -494,7 +494,7 @@ def test_custom_regex_impl(engine):
     assert len(results) == 1
 
 
-@pytest.mark.parametrize('engine', [standalone_engine, rust_engine])
+@pytest.mark.parametrize('engine', [standalone_engine, rust_engine, token_engine])
 def test_complex_number_match(engine):
     parser = engine("""
     fractions={"1 / 2", "3 / 4", "1 / 8", "3 / 8", "5 / 8", "7 / 8", "1 / 16", "3 / 16", "5 / 16", "7 / 16", "9 / 16",
@@ -517,7 +517,7 @@ def test_complex_number_match(engine):
     assert ("length 10 1 / 2", "NUMBER") == complex_number[0]
 
 
-@pytest.mark.parametrize('engine', [standalone_engine, rust_engine])
+@pytest.mark.parametrize('engine', [standalone_engine, rust_engine, token_engine])
 def test_simple_float_number_match(engine):
     parser = engine("""
     NUM->MARK("NUMBER")
@@ -528,7 +528,7 @@ def test_simple_float_number_match(engine):
     assert parser("19,6")[0] == ("19,6", "NUMBER")
 
 
-@pytest.mark.parametrize('engine', [standalone_engine, rust_engine])
+@pytest.mark.parametrize('engine', [standalone_engine, rust_engine, token_engine])
 def test_invalid_entity(engine):
     with pytest.raises(RuntimeError):
         engine("""
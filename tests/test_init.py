@@ -1,6 +1,10 @@
 import os
+import subprocess
+import sys
 import tempfile
 
+import pytest
+
 import rita
 from rita import get_version, compile_string, compile
 
@@ -53,3 +57,47 @@ def test_compile_string_with_kwargs():
     results = list(result.execute("hello there"))
     assert len(results) == 1
     assert results[0]["label"] == "MATCH"
+
+
+LOAD_ONLY = """
+import sys
+from rita.engine.translate_standalone import RuleExecutor
+RuleExecutor.load(sys.argv[1]).execute("hello")
+print(" ".join(sorted(sys.modules)))
+"""
+
+
+def test_load_only_skips_parser_and_other_engines(tmp_path):
+    path = str(tmp_path / "rules.jsonl")
+    compile_string('WORD("hello")->MARK("GREETING")', use_engine="standalone").save(path)
+    output = subprocess.run([sys.executable, "-c", LOAD_ONLY, path],
+                            check=True, capture_output=True, text=True).stdout
+    modules = set(output.split())
+    assert "rita.engine.translate_standalone" in modules
+    for unused in ["ply", "rita.parser", "rita.preprocess", "rita.engine.translate_spacy",
+                   "rita.engine.translate_rust", "ctypes", "multiprocessing"]:
+        assert unused not in modules
+
+
+def import_time(statement):
+    """
+    Cumulative import time (microseconds) of the whole statement, by `python -X importtime`
+    """
+    stderr = subprocess.run([sys.executable, "-X", "importtime", "-c", statement],
+                            check=True, capture_output=True, text=True).stderr
+    return sum(int(line.split("|")[1]) for line in stderr.splitlines()
+               if line.startswith("import time:") and not line.split("|")[2].startswith("  ")
+               and line.split("|")[1].strip().isdigit())
+
+
+@pytest.mark.parametrize("statement", [
+    "import rita",
+    "from rita.engine.translate_standalone import RuleExecutor",
+])
+def test_benchmark_import_time(benchmark, statement):
+    """
+    Import cost in a fresh interpreter, `extra_info` has `-X importtime` totals.
+    Runs only with `--benchmark-enable` or `--benchmark-only`
+    """
+    benchmark.extra_info["importtime_us"] = import_time(statement)
+    benchmark(lambda: subprocess.run([sys.executable, "-c", statement], check=True))
@@ -0,0 +1,168 @@
+import os
+import pickle
+import tempfile
+
+import pytest
+
+import rita
+
+from rita.engine.lookup import ListIndex, text_words
+from rita.engine.translate_standalone import RuleExecutor
+
+
+def compile_rules(rules, threshold=5, **kwargs):
+    return rita.compile_string('!CONFIG("list_lookup_threshold", "{}")\n'.format(threshold) + rules,
+                               use_engine="standalone", **kwargs)
+
+
+ITEMS = ["Paris", "New York", "New-York", "Saint-Étienne", "São Paulo", "C++", "J\\.", "-", "ﬁnal", "knee-length", "York"]
+
+RULES = """
+places = {%s}
+{IN_LIST(places)}->MARK("PLACE")
+{WORD("from"), IN_LIST(places), WORD("city")?}->MARK("FROM")
+{&WORD("to"), IN_LIST(places)}->MARK("TO")
+{IN_LIST(places)!, WORD("road")}->MARK("ROAD")
+""" % ", ".join('"{}"'.format(item) for item in ITEMS)
+
+TEXTS = [
+    "",
+    "nothing here",
+    "From new york city to PARIS, then to Sao Paulo",
+    "saint-etienne and Saint-Étienne, new-york and York road",
+    "C++ in J. Smith - FINAL, final; knee-length road",
+    "Parisian newyork",
+]
+
+
+class TestListIndex:
+    def test_single_and_multi_word(self):
+        index = ListIndex(ITEMS, ignore_case=True)
+        found = index.find(text_words("From NEW YORK to paris", ignore_case=True))
+        # Items without words are always there, "C++" needs the word "c"
+        assert set(found) == {"New York", "New-York", "York", "Paris", "J\\.", "-"}
+
+    def test_no_partial_words(self):
+        index = ListIndex(["New York", "Paris"], ignore_case=True)
+        assert index.find(text_words("Parisian newyork New", ignore_case=True)) == ()
+
+    def test_case_sensitive(self):
+        index = ListIndex(["Paris"], ignore_case=False)
+        assert index.find(text_words("paris", ignore_case=False)) == ()
+        assert index.find(text_words("Paris", ignore_case=False)) == ("Paris",)
+
+    def test_case_fold_as_re(self):
+        # `re` matches "ſ" case-insensitively with "s"
+        index = ListIndex(["Ssn"], ignore_case=True)
+        assert index.find(text_words("ſsn", ignore_case=True)) == ("Ssn",)
+
+
+class TestListLookups:
+    @pytest.fixture
+    def parsers(self):
+        return (compile_rules(RULES, threshold="N"), compile_rules(RULES))
+
+    def test_list_not_in_pattern(self, parsers):
+        (_, lookup) = parsers
+        [items] = lookup.lists.values()
+        # Accent-free variants are added by preprocessing, as for any list
+        assert set(items) == set(ITEMS) | {"Saint-Etienne", "Sao Paulo"}
+        assert "Paris" not in "".join(lookup.raw_patterns[0][1])
+        # Negation keeps its list in the pattern
+        assert sorted(lookup.list_rules) == [0, 1, 2]
+
+    def test_same_results(self, parsers):
+        (full, lookup) = parsers
+        for text in TEXTS:
+            assert list(lookup.execute(text)) == list(full.execute(text))
+            assert lookup.labels_present(text) == full.labels_present(text)
+
+    def test_same_results_all_paths(self, parsers):
+        (full, lookup) = parsers
+        text = " ".join(TEXTS)
+        chunks = [text[i:i + 16] for i in range(0, len(text), 16)]
+        assert list(lookup.execute_stream(chunks)) == list(full.execute_stream(chunks))
+        assert list(lookup.execute_bytes(text.encode("UTF-8"))) == list(full.execute_bytes(text.encode("UTF-8")))
+        for kwargs in [{"prefilter": True}, {"combined_scan": True}, {"compile": "lazy"}]:
+            parser = compile_rules(RULES, **kwargs)
+            assert list(parser.execute(text)) == list(full.execute(text))
+
+    def test_shared_list_stored_once(self):
+        parser = compile_rules('items = {"a", "b", "c", "d", "e"}\n'
+                               '{IN_LIST(items)}->MARK("ONE")\n{IN_LIST(items), WORD("x")}->MARK("TWO")')
+        assert len(parser.lists) == 1
+        assert parser.list_rules == {0: [0], 1: [0]}
+
+    def test_save_load_and_pickle(self, parsers):
+        (full, lookup) = parsers
+        path = tempfile.mktemp(suffix=".jsonl")
+        try:
+            lookup.save(path)
+            loaded = RuleExecutor.load(path)
+        finally:
+            os.unlink(path)
+        assert loaded.lists == lookup.lists
+        for parser in [loaded, pickle.loads(pickle.dumps(lookup))]:
+            assert [list(parser.execute(text)) for text in TEXTS] == [list(full.execute(text)) for text in TEXTS]
+
+    def test_other_regex_impl_uses_whole_list(self, parsers):
+        regex = pytest.importorskip("regex")
+        (full, lookup) = parsers
+        parser = compile_rules(RULES, regex_impl=regex)
+        assert parser.lists == {}
+        path = tempfile.mktemp(suffix=".jsonl")
+        try:
+            lookup.save(path)
+            loaded = RuleExecutor.load(path, regex_impl=regex)
+        finally:
+            os.unlink(path)
+        assert loaded.list_index is None
+        assert list(loaded.execute(TEXTS[2])) == list(full.execute(TEXTS[2]))
+
+
+def catalog(count):
+    return ["product{0}".format(i) if i % 3 else "product {0} max".format(i) for i in range(count)]
+
+
+@pytest.mark.parametrize("count", [10000, 100000])
+@pytest.mark.parametrize("threshold", ["N", "1000"])
+def test_benchmark_list_lookup_compile(benchmark, count, threshold):
+    """
+    Compiling a huge `IN_LIST` into a trie regex (`N`) vs. into a lookup index.
+    Runs only with `--benchmark-enable` or `--benchmark-only`
+    """
+    from rita.config import SessionConfig
+    from rita.engine.translate_standalone import compile_rules as standalone_compile
+    from rita.utils import ExtendedOp
+    rules = [("PRODUCT", [("any_of", catalog(count), ExtendedOp()), ("value", "for", ExtendedOp("?"))])]
+
+    def run():
+        config = SessionConfig()
+        config.set_config("list_lookup_threshold", threshold)
+        return standalone_compile(rules, config)
+
+    benchmark.pedantic(run, rounds=1, iterations=1)
+
+
+@pytest.mark.parametrize("threshold", ["N", "1000"])
+def test_benchmark_list_lookup_execute(benchmark, threshold):
+    """
+    Matching short texts with a 10000 item `IN_LIST`: trie regex (`N`) vs. lookups.
+    Every text is new to the executor. Runs only with `--benchmark-enable` or `--benchmark-only`
+    """
+    import re
+    from rita.config import SessionConfig
+    from rita.engine.translate_standalone import compile_rules as standalone_compile
+    from rita.utils import ExtendedOp
+    items = catalog(10000)
+    config = SessionConfig()
+    config.set_config("list_lookup_threshold", threshold)
+    parser = standalone_compile([("PRODUCT", [("any_of", items, ExtendedOp())])], config)
+    texts = ["order of {0} and {1} for today".format(items[i], items[i * 7 % len(items)]) for i in range(300)]
+
+    def run():
+        re.purge()
+        parser._lookup_patterns.clear()
+        return [list(parser.execute(text)) for text in texts]
+
+    benchmark.pedantic(run, rounds=3, iterations=1)
@@ -0,0 +1,134 @@
+from collections import namedtuple
+
+import pytest
+
+import rita
+
+from rita.engine import overlap
+from rita.engine.overlap import merge, resolve
+
+
+def compile_rules(rules, **kwargs):
+    return rita.compile_string(rules, use_engine="standalone", **kwargs)
+
+
+M = namedtuple("M", ["start", "end", "rule_id", "label"])
+
+# rule 0: [0, 10) "A"; rule 1: [0, 4) "B", [5, 8) "B"; rule 2: [3, 12) "C", [20, 25) "C"
+STREAMS = [
+    [M(0, 10, 0, "A")],
+    [M(0, 4, 1, "B"), M(5, 8, 1, "B")],
+    [M(3, 12, 2, "C"), M(20, 25, 2, "C")],
+]
+
+
+def spans(matches):
+    return [(m.start, m.end, m.label) for m in matches]
+
+
+class TestResolve:
+    def test_merge_orders_by_start_and_rule(self):
+        assert [(m.start, m.rule_id) for m in merge(STREAMS)] == [(0, 0), (0, 1), (3, 2), (5, 1), (20, 2)]
+
+    def test_all(self):
+        assert len(list(resolve(merge(STREAMS), overlap.ALL))) == 5
+
+    def test_longest(self):
+        assert spans(resolve(merge(STREAMS), overlap.LONGEST)) == [
+            (0, 10, "A"), (3, 12, "C"), (5, 8, "B"), (20, 25, "C")
+        ]
+
+    def test_longest_leftmost(self):
+        assert spans(resolve(merge(STREAMS), overlap.LONGEST_LEFTMOST)) == [(0, 10, "A"), (20, 25, "C")]
+
+    def test_longest_first(self):
+        assert spans(resolve(merge(STREAMS), overlap.LONGEST_FIRST)) == [(0, 10, "A"), (20, 25, "C")]
+
+    def test_longest_first_not_leftmost(self):
+        streams = [[M(0, 2, 0, "A")], [M(1, 5, 1, "B")], [M(5, 6, 2, "C")]]
+        assert spans(resolve(merge(streams), overlap.LONGEST_FIRST)) == [(1, 5, "B"), (5, 6, "C")]
+
+    def test_first_rule(self):
+        streams = [[M(4, 6, 0, "A")], [M(0, 5, 1, "B")], [M(6, 9, 2, "C")]]
+        assert spans(resolve(merge(streams), overlap.FIRST_RULE)) == [(4, 6, "A"), (6, 9, "C")]
+
+    def test_label_priority(self):
+        matches = resolve(merge(STREAMS), overlap.LABEL_PRIORITY, label_priority=["C", "B"])
+        assert spans(matches) == [(3, 12, "C"), (20, 25, "C")]
+
+    def test_label_priority_prefers_longer_on_tie(self):
+        streams = [[M(0, 3, 0, "A")], [M(2, 9, 1, "A")]]
+        matches = resolve(merge(streams), overlap.LABEL_PRIORITY, label_priority=[])
+        assert spans(matches) == [(2, 9, "A")]
+
+    def test_unknown_strategy(self):
+        with pytest.raises(ValueError):
+            resolve([], "shortest")
+
+
+RULES = """
+{WORD("new"), WORD("york")}->MARK("CITY")
+{WORD("york"), WORD("times")}->MARK("PAPER")
+{WORD("new"), WORD("york"), WORD("times")}->MARK("PAPER")
+{WORD("times")}->MARK("WORD")
+"""
+
+TEXT = "the new york times and york times"
+
+
+class TestExecutorOverlap:
+    def labels(self, results):
+        return [(r["text"], r["label"]) for r in results]
+
+    def test_default_is_longest_per_start(self):
+        parser = compile_rules(RULES)
+        assert self.labels(parser.execute(TEXT)) == [
+            ("new york times", "PAPER"), ("york times", "PAPER"), ("times", "WORD"),
+            ("york times", "PAPER"), ("times", "WORD"),
+        ]
+
+    def test_per_call_strategy(self):
+        parser = compile_rules(RULES)
+        assert self.labels(parser.execute(TEXT, overlap=overlap.LONGEST_LEFTMOST)) == [
+            ("new york times", "PAPER"), ("york times", "PAPER"),
+        ]
+        assert len(list(parser.execute(TEXT, overlap=overlap.ALL))) == 6
+
+    def test_executor_default(self):
+        parser = compile_rules(RULES, overlap=overlap.LABEL_PRIORITY, label_priority=["CITY", "WORD"])
+        assert self.labels(parser.execute(TEXT)) == [
+            ("new york", "CITY"), ("times", "WORD"), ("times", "WORD"),
+        ]
+
+    def test_first_rule(self):
+        parser = compile_rules(RULES)
+        assert self.labels(parser.execute(TEXT, overlap=overlap.FIRST_RULE)) == [
+            ("new york", "CITY"), ("times", "WORD"), ("york times", "PAPER"),
+        ]
+
+    def test_stream_same_as_execute(self):
+        parser = compile_rules(RULES)
+        chunks = [TEXT[i:i + 5] for i in range(0, len(TEXT), 5)]
+        for strategy in overlap.STRATEGIES:
+            assert (list(parser.execute_stream(chunks, window=20, overlap=strategy)) ==
+                    list(parser.execute(TEXT, overlap=strategy)))
+
+    def test_invalid_strategy(self):
+        with pytest.raises(ValueError):
+            compile_rules(RULES, overlap="shortest")
+
+
+def overlapping_ruleset(count):
+    return "\n".join('{{WORD("w{0}"), WORD("w{1}")}}->MARK("LABEL_{0}")'.format(i, i + 1)
+                     for i in range(count))
+
+
+@pytest.mark.parametrize("strategy", overlap.STRATEGIES)
+def test_benchmark_overlap(benchmark, strategy):
+    """
+    Many overlapping matches from many rules.
+    Runs only with `--benchmark-enable` or `--benchmark-only`
+    """
+    parser = compile_rules(overlapping_ruleset(100), overlap=strategy, label_priority=["LABEL_7"])
+    document = " ".join("w{}".format(i) for i in range(101)) * 20
+    benchmark(lambda: list(parser.execute_matches(document)))
@@ -327,3 +327,154 @@ def test_unknown_macro_raises(config):
     p.build()
     with pytest.raises(RuntimeError, match="NO_SUCH_MACRO"):
         p.parse('NO_SUCH_MACRO("a")->MARK("X")')
+
+
+def test_parser_tables_shared():
+    from rita.parser import shared_tables
+    first = RitaParser(SessionConfig()).build()
+    second = RitaParser(SessionConfig()).build()
+    assert first.parser is second.parser
+    assert (first.lexer, first.parser) == shared_tables()
+
+
+def test_parser_config_per_call():
+    from rita.parser import parse
+    (first, second) = (SessionConfig(), SessionConfig())
+    parse('x = "a"', first)
+    parse('x = "b"', second)
+    assert first.variables["x"] == "a"
+    assert second.variables["x"] == "b"
+
+
+def test_shipped_parsetab_up_to_date():
+    import ply.yacc as yacc
+    from rita import parsetab
+
+    module = RitaParser()
+    pinfo = yacc.ParserReflect({k: getattr(module, k) for k in dir(module)}, log=yacc.NullLogger())
+    pinfo.get_all()
+    assert pinfo.signature() == parsetab._lr_signature, "Grammar has changed, run `make parsetab`"
+
+
+def test_benchmark_cold_start(benchmark):
+    """
+    Fresh interpreter: import and first compile.
+    Runs only with `--benchmark-enable` or `--benchmark-only`
+    """
+    import subprocess
+    import sys
+    script = "import rita; rita.compile_string('{WORD(\"a\"), WORD(\"b\")}->MARK(\"AB\")', use_engine=\"standalone\")"
+    benchmark(lambda: subprocess.run([sys.executable, "-c", script], check=True))
+
+
+def test_split_statements(config):
+    from rita.parser import split_statements, RULE, ASSIGN, EXEC
+    p = RitaParser(config).build()
+    tokens = p.tokenize("""
+    !IMPORT("rita.modules.fuzzy")
+    !CONFIG("implicit_punct", "N")
+    x = {"a", "b"}, "c"
+    {IN_LIST(x), WORD("d")?}->MARK("X")
+    y = PUNCT
+    {WORD("e")}->MARK("Y")
+    """)
+    assert [kind for (kind, _) in split_statements(tokens)] == [EXEC, EXEC, ASSIGN, RULE, ASSIGN, RULE]
+
+
+def test_parse_statements_same_as_document(config):
+    from rita.parser import parse
+    from rita.preprocess import preprocess_rules
+    rules = """
+    !CONFIG("implicit_punct", "N")
+    x = {"a", "b"}
+    {IN_LIST(x), WORD("c")|WORD("d")}->MARK("X")
+    {WORD("e"), NUM+}->MARK("Y")
+    """
+    document = RitaParser(config).build().parse(rules)
+    other = SessionConfig()
+    statements = parse(rules, other)
+    assert len(statements) == len(document) == 4
+    assert repr(list(preprocess_rules(statements, other))) == repr(list(preprocess_rules(document, config)))
+
+
+def test_lists_interned(config, caplog):
+    from rita.parser import parse
+    from rita.preprocess import preprocess_rules
+    rules = """
+    x = {"café", "b"}
+    {IN_LIST(x), WORD("c")}->MARK("X")
+    {WORD("d"), IN_LIST(x)}->MARK("Y")
+    {IN_LIST({"b", "café"})}->MARK("Z")
+    """
+    with caplog.at_level("INFO", logger="rita.preprocess"):
+        [(_, x), (_, y), (_, z)] = preprocess_rules(parse(rules, config), config)
+    # Every rule gets its own deaccented list, the same items become one list
+    assert x[0][1] == ["café", "cafe", "b"]
+    assert x[0][1] is y[2][1]
+    assert z[0][1] is not x[0][1]
+    assert "1 duplicates" in caplog.text
+
+
+def test_parse_tokens(config):
+    from rita.parser import TokenStream
+    p = RitaParser(config).build()
+    tokens = p.tokenize('{WORD("a"), WORD("b")}->MARK("AB")')
+    assert repr(p.parse_tokens(tokens)) == repr(p.parse('{WORD("a"), WORD("b")}->MARK("AB")'))
+    # Tokens are given up front, there is no text to take
+    assert not hasattr(TokenStream(tokens, config), "input")
+
+
+def test_parse_statements_comment_only(config):
+    from rita.parser import parse
+    assert parse("# Nothing here yet", config) == []
+
+
+def test_parse_without_tracing(config, mocker):
+    import ply.yacc as yacc
+    traced = mocker.spy(yacc.LRParser, "parsedebug")
+    p = RitaParser(config).build()
+    p.parse('x = "a"\nWORD(x)->MARK("X")')
+    list(p.parse_statements('x = "a"\nWORD(x)->MARK("X")'))
+    assert traced.call_count == 0
+
+
+def test_parse_statements_parallel():
+    import rita
+    rules = generated_ruleset(300)
+    assert (list(rita.compile_string(rules, use_engine="standalone", parse_workers=2)) ==
+            list(rita.compile_string(rules, use_engine="standalone")))
+
+
+def test_parse_statements_parallel_syntax_error(config):
+    from rita.parser import RitaParseError, parse
+    with pytest.raises(RitaParseError, match="line 3"):
+        parse(generated_ruleset(1) + '\n{WORD("a"),}->MARK("A")', config, workers=2)
+
+
+def generated_ruleset(count):
+    """
+    Like the output of `rita-generate`: mostly rules, with assignments and imports in between
+    """
+    lines = ['!IMPORT("rita.modules.fuzzy")']
+    for i in range(count):
+        if i % 4 == 0:
+            lines.append('{{WORD("w{0}"), WORD("x{0}")}}->MARK("LABEL_{1}")'.format(i, i % 50))
+        elif i % 4 == 1:
+            lines.append('{{WORD("a{0}")|WORD("b{0}"), NUM+}}->MARK("LABEL_{1}")'.format(i, i % 50))
+        elif i % 4 == 2:
+            lines.append('{{IN_LIST({{"c{0}", "d{0}"}}), WORD("e{0}")?}}->MARK("LABEL_{1}")'.format(i, i % 50))
+        else:
+            lines.append('items_{0} = {{"f{0}", "g{0}"}}'.format(i))
+            lines.append('{{IN_LIST(items_{0}), PUNCT}}->MARK("LABEL_{1}")'.format(i, i % 50))
+    return "\n".join(lines)
+
+
+@pytest.mark.parametrize("count,workers", [(1000, None), (10000, None), (100000, None), (100000, 4)])
+def test_benchmark_parse_large(benchmark, count, workers):
+    """
+    Parsing of very large rule files, up to 100k rules.
+    Runs only with `--benchmark-enable` or `--benchmark-only`
+    """
+    from rita.parser import parse
+    rules = generated_ruleset(count)
+    benchmark.pedantic(lambda: parse(rules, SessionConfig(), workers=workers), rounds=1 if count > 1000 else 5)
@@ -1,6 +1,10 @@
+import os
+
 import pytest
 
-from rita.precompile import precompile
+import rita
+
+from rita.precompile import ImportGraph, precompile
 
 from utils import raw_compare
 
@@ -41,3 +45,146 @@ def test_alias():
 
     result = precompile(rules.strip())
     raw_compare(expected, result)
+
+
+def test_alias_not_in_literals():
+    rules = """
+    @alias WORD W
+    {W("W(x)"), W('W(')}->MARK("W")
+    """
+
+    expected = """
+    {WORD("W(x)"), WORD('W(')}->MARK("W")
+    """
+
+    raw_compare(expected, precompile(rules.strip()))
+
+
+def test_alias_apostrophes_in_comments():
+    rules = """
+    @alias WORD W
+    # it's a comment
+    {W("a")}->MARK("A")
+    # don't expand in here: W("b")
+    """
+
+    expected = """
+    # it's a comment
+    {WORD("a")}->MARK("A")
+    # don't expand in here: W("b")
+    """
+
+    raw_compare(expected, precompile(rules.strip()))
+    parser = rita.compile_string(rules, use_engine="standalone")
+    assert [r["text"] for r in parser.execute("a b")] == ["a"]
+
+
+def test_alias_of_alias_single_pass():
+    rules = """
+    @alias IN_LIST IL
+    @alias IL L
+    L(numbers)->MARK("A")
+    IL(numbers)->MARK("B")
+    """
+
+    expected = """
+    IL(numbers)->MARK("A")
+    IN_LIST(numbers)->MARK("B")
+    """
+
+    raw_compare(expected, precompile(rules.strip()))
+
+
+def write(path, content, mtime_ns=None):
+    with open(path, "w") as f:
+        f.write(content)
+    if mtime_ns is not None:
+        os.utime(path, ns=(mtime_ns, mtime_ns))
+    return str(path)
+
+
+class TestImportGraph:
+    def test_cached(self, tmp_path, mocker):
+        path = write(tmp_path / "vocab.rita", 'colors = {"red"}\n')
+        graph = ImportGraph()
+        rules = '@import "{}"'.format(path)
+        assert precompile(rules, graph) == 'colors = {"red"}\n'
+
+        mocker.patch("builtins.open", side_effect=AssertionError("Should not be read again"))
+        assert precompile(rules, graph) == 'colors = {"red"}\n'
+        assert graph.stats == {"hits": 1, "misses": 1}
+
+    def test_changed_file(self, tmp_path):
+        path = write(tmp_path / "vocab.rita", 'colors = {"red"}\n', mtime_ns=10 ** 18)
+        graph = ImportGraph()
+        precompile('@import "{}"'.format(path), graph)
+        write(path, 'colors = {"blue"}\n', mtime_ns=10 ** 18 + 1)
+        assert precompile('@import "{}"'.format(path), graph) == 'colors = {"blue"}\n'
+        assert graph.stats["misses"] == 2
+
+    def test_touched_file(self, tmp_path):
+        path = write(tmp_path / "vocab.rita", 'colors = {"red"}\n', mtime_ns=10 ** 18)
+        graph = ImportGraph()
+        precompile('@import "{}"'.format(path), graph)
+        os.utime(path, ns=(10 ** 18 + 1, 10 ** 18 + 1))
+        precompile('@import "{}"'.format(path), graph)
+        assert graph.stats == {"hits": 1, "misses": 1}
+
+    def test_changed_nested_import(self, tmp_path):
+        inner = write(tmp_path / "inner.rita", 'x = "a"\n', mtime_ns=10 ** 18)
+        outer = write(tmp_path / "outer.rita", '@import "{}"\ny = "b"\n'.format(inner))
+        graph = ImportGraph()
+        assert precompile('@import "{}"'.format(outer), graph) == 'x = "a"\n\ny = "b"\n'
+        assert graph.imports(outer) == (inner,)
+
+        write(inner, 'x = "c"\n', mtime_ns=10 ** 18 + 1)
+        assert precompile('@import "{}"'.format(outer), graph) == 'x = "c"\n\ny = "b"\n'
+
+    def test_shared_import(self, tmp_path):
+        vocab = write(tmp_path / "vocab.rita", 'x = "a"\n')
+        first = write(tmp_path / "first.rita", '@import "{}"\n'.format(vocab))
+        second = write(tmp_path / "second.rita", '@import "{}"\n'.format(vocab))
+        graph = ImportGraph()
+        precompile('@import "{0}"\n@import "{1}"'.format(first, second), graph)
+        assert graph.stats == {"hits": 1, "misses": 3}
+
+    def test_cycle(self, tmp_path):
+        (a, b) = (str(tmp_path / "a.rita"), str(tmp_path / "b.rita"))
+        write(a, '@import "{}"\n'.format(b))
+        write(b, '@import "{}"\n'.format(a))
+        with pytest.raises(RuntimeError, match="Cyclical import: .*a.rita -> .*b.rita -> .*a.rita"):
+            precompile('@import "{}"'.format(a), ImportGraph())
+
+    def test_deep_chain(self, tmp_path):
+        # Only cycles are limited, not the depth
+        paths = [str(tmp_path / "{}.rita".format(i)) for i in range(6)]
+        for (path, imported) in zip(paths, paths[1:]):
+            write(path, '@import "{}"\n'.format(imported))
+        write(paths[-1], 'x = "a"\n')
+
+        assert precompile('@import "{}"'.format(paths[0]), ImportGraph()).strip() == 'x = "a"'
+
+
+def aliased_ruleset(aliases, rules):
+    definitions = "\n".join("@alias WORD W{}".format(i) for i in range(aliases))
+    body = "\n".join('{{W{0}("a{1}"), W{0}("b{1}")}}->MARK("L")'.format(i % aliases, i) for i in range(rules))
+    return definitions + "\n" + body
+
+
+def test_benchmark_aliases(benchmark):
+    """
+    Many aliases over a large source.
+    Runs only with `--benchmark-enable` or `--benchmark-only`
+    """
+    rules = aliased_ruleset(200, 20000)
+    benchmark(lambda: precompile(rules))
+
+
+def test_benchmark_shared_imports(benchmark, tmp_path):
+    """
+    Rule files sharing a vocabulary import.
+    Runs only with `--benchmark-enable` or `--benchmark-only`
+    """
+    vocab = write(tmp_path / "vocab.rita", "\n".join('v{0} = {{"a{0}", "b{0}"}}'.format(i) for i in range(20000)))
+    rules = ['@import "{0}"\n{{WORD("r{1}")}}->MARK("R")'.format(vocab, i) for i in range(30)]
+    benchmark(lambda: [precompile(r) for r in rules])
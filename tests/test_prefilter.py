@@ -0,0 +1,135 @@
+import pytest
+
+import rita
+
+from rita.engine.prefilter import analyze, case_fold, Prefilter
+
+
+def compile_rules(rules, **kwargs):
+    return rita.compile_string(rules, use_engine="standalone", **kwargs)
+
+
+RULES = """
+!IMPORT("rita.modules.regex")
+colors = {"red", "rose", "blue"}
+units = {"mm", "cm", "m"}
+{IN_LIST(colors), WORD("car")}->MARK("CAR_COLOR")
+{NUM, IN_LIST(units)}->MARK("SIZE")
+{WORD("New"), WORD("York")}->MARK("CITY")
+{&WORD("price"), NUM}->MARK("PRICE")
+{WORD("knee-length"), WORD("dress")?}->MARK("DRESS")
+{WORD("naïve"), WORD("bayes")}->MARK("ALGO")
+{PREFIX("mega"), WORD("byte")}->MARK("UNIT")
+{WORD("no"), WORD("cat")!}->MARK("NO_CAT")
+{REGEX("^sk")}->MARK("SK")
+{WORD, WORD("runs")}->MARK("RUNS")
+"""
+
+TEXTS = [
+    "",
+    "nothing to see here",
+    "a RED car and a Rose car, 10 cm wide, 5 m long",
+    "in new york the PRICE 42 is fine",
+    "a knee-length dress and a naive bayes model",
+    "one megabyte, no bird, skating dog runs",
+    "ſome Ṙose car",
+]
+
+
+class TestAnalyze:
+    def test_word_literals(self):
+        req = analyze(r"(?P<X>(?P<s0>(\bnew york\b\s?))(?P<s1>(\bcar\b)))", ignore_case=True)
+        assert req.clauses == [frozenset([("new york", False)]), frozenset([("car", True)])]
+        assert req.min_length == 11
+        assert not req.digit
+
+    def test_list_is_one_clause(self):
+        # the regex parser moves the common `r` out of the alternatives
+        req = analyze(r"(?P<X>(\bred\b|\brose\b)\s?)", ignore_case=True)
+        assert req.clauses == [frozenset([("red", True), ("rose", True)])]
+
+    def test_optional_tokens_are_not_required(self):
+        req = analyze(r"(?P<X>(\bcar\b)(\bred\b)?(\bblue\b)*)", ignore_case=True)
+        assert req.clauses == [frozenset([("car", True)])]
+
+    def test_num_requires_digit(self):
+        req = analyze(r"(?P<X>(((\d+[\.,]\d+)|(\d+))\s?))", ignore_case=True)
+        assert req.digit
+        assert req.clauses == []
+
+    def test_case_sensitive_keeps_case(self):
+        req = analyze(r"(?P<X>\bHello\b)", ignore_case=False)
+        assert req.clauses == [frozenset([("Hello", True)])]
+
+    def test_unparseable_pattern_has_no_requirements(self):
+        req = analyze(r"(?P<X>\p{L}+)", ignore_case=True)
+        assert req.clauses == []
+        assert req.min_length == 0
+
+
+class TestCaseFold:
+    def test_matches_re_equivalences(self):
+        assert case_fold("ſ") == case_fold("s")
+        assert case_fold("ı") == case_fold("I")
+        assert case_fold("İx") == case_fold("ix")
+        assert case_fold("Hello") == "hello"
+
+
+class TestPrefilter:
+    def test_irrelevant_rules_are_skipped(self):
+        prefilter = Prefilter.build([r"(?P<A>\bcat\b)", r"(?P<B>\bdog\b)", r"(?P<C>\d+)"], ignore_case=True)
+        assert prefilter.candidates("a Dog here") == [1]
+        assert prefilter.candidates("a cat and 2 dogs") == [0, 2]
+
+    def test_min_length(self):
+        prefilter = Prefilter.build([r"(?P<A>\w{5,})"], ignore_case=True)
+        assert prefilter.candidates("abcd") == []
+        assert prefilter.candidates("abcde") == [0]
+
+    @pytest.mark.parametrize("kwargs", [
+        {"prefilter": True},
+        {"prefilter": True, "combined_scan": True},
+    ])
+    def test_results_identical(self, kwargs):
+        expected = compile_rules(RULES)
+        parser = compile_rules(RULES, **kwargs)
+        for text in TEXTS:
+            assert list(parser.execute(text)) == list(expected.execute(text))
+
+    def test_results_identical_case_sensitive(self):
+        rules = '!CONFIG("ignore_case", "F")\n' + RULES
+        expected = compile_rules(rules)
+        parser = compile_rules(rules, prefilter=True)
+        for text in TEXTS:
+            assert list(parser.execute(text)) == list(expected.execute(text))
+
+    def test_results_identical_regex_module(self):
+        regex = pytest.importorskip("regex")
+        expected = compile_rules(RULES, regex_impl=regex)
+        parser = compile_rules(RULES, regex_impl=regex, prefilter=True)
+        for text in TEXTS:
+            assert list(parser.execute(text)) == list(expected.execute(text))
+
+
+def relevant_ruleset(count):
+    """
+    `count` rules where only every 20th can match `BENCH_DOCUMENT`
+    """
+    rules = []
+    for i in range(count):
+        word = "price" if i % 20 == 0 else "word{}".format(i)
+        rules.append('{{WORD("{0}"), NUM}}->MARK("LABEL_{1}")'.format(word, i))
+    return "\n".join(rules)
+
+
+BENCH_DOCUMENT = "The new red car costs 20000 eur, price 42 is negotiable."
+
+
+@pytest.mark.parametrize("prefilter", [False, True])
+def test_benchmark_prefilter(benchmark, prefilter):
+    """
+    Short document, 95% of rules irrelevant.
+    Runs only with `--benchmark-enable` or `--benchmark-only`
+    """
+    parser = compile_rules(relevant_ruleset(1000), prefilter=prefilter)
+    benchmark(lambda: list(parser.execute(BENCH_DOCUMENT)))
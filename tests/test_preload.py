@@ -0,0 +1,158 @@
+import gc
+import multiprocessing
+import os
+
+from concurrent.futures import ProcessPoolExecutor
+
+import pytest
+
+import rita
+
+from rita.config import SessionConfig
+from rita.engine import preload, translate_standalone
+
+RULES = """
+{WORD("red"), WORD("car")}->MARK("CAR")
+{NUM, WORD("cm")}->MARK("SIZE")
+{&WORD("price"), NUM}->MARK("PRICE")
+"""
+
+TEXTS = ["a red car", "", "10 cm wide", "price 42 for a red car"]
+
+fork = pytest.mark.skipif("fork" not in multiprocessing.get_all_start_methods(),
+                          reason="Needs the fork start method")
+
+
+def compile_rules(rules, **kwargs):
+    return rita.compile_string(rules, use_engine="standalone", **kwargs)
+
+
+@pytest.fixture
+def unfreeze():
+    yield
+    gc.unfreeze()
+
+
+def execute_in_worker(text):
+    return list(preload.worker_executor().execute(text))
+
+
+def is_inherited(_):
+    # State built by `preload` in the parent, a rebuilt executor wouldn't have it
+    return "_query_order" in preload.worker_executor().__dict__
+
+
+def private_memory(_):
+    """
+    Private dirty memory of the worker, in kB
+    """
+    with open("/proc/self/smaps_rollup") as f:
+        for line in f:
+            if line.startswith("Private_Dirty:"):
+                return int(line.split()[1])
+    return None
+
+
+@fork
+class TestPreload:
+    def test_forked_workers_share_executor(self, unfreeze):
+        executor = preload.preload(compile_rules(RULES))
+        assert gc.get_freeze_count() > 0
+        with ProcessPoolExecutor(max_workers=2, mp_context=multiprocessing.get_context("fork"),
+                                 initializer=preload.init_worker, initargs=(executor,)) as pool:
+            assert all(pool.map(is_inherited, range(4)))
+            assert list(pool.map(execute_in_worker, TEXTS)) == [list(executor.execute(text)) for text in TEXTS]
+
+    def test_default_is_preloaded_executor(self, unfreeze):
+        executor = preload.preload(compile_rules(RULES), freeze=False)
+        assert gc.get_freeze_count() == 0
+        with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("fork"),
+                                 initializer=preload.init_worker) as pool:
+            assert pool.submit(execute_in_worker, "a red car").result() == list(executor.execute("a red car"))
+
+    def test_background_compile_is_finished(self, unfreeze):
+        executor = preload.preload(compile_rules(RULES, compile="background"), freeze=False)
+        assert executor.ready.done()
+
+    def test_spawned_workers_rebuild_executor(self):
+        executor = compile_rules(RULES)
+        with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn"),
+                                 initializer=preload.init_worker, initargs=(executor,)) as pool:
+            assert pool.submit(execute_in_worker, "10 cm wide").result() == list(executor.execute("10 cm wide"))
+
+    def test_execute_many_inherits_executor(self):
+        executor = compile_rules(RULES, compile="lazy")
+        assert list(executor.execute_many(TEXTS, workers=2)) == [list(executor.execute(text)) for text in TEXTS]
+
+
+def test_init_worker_without_executor(monkeypatch):
+    monkeypatch.setattr(preload, "_preloaded", None)
+    with pytest.raises(RuntimeError):
+        preload.init_worker()
+
+
+def test_worker_executor_not_initialized(monkeypatch):
+    monkeypatch.setattr(translate_standalone, "_worker_executor", None)
+    with pytest.raises(RuntimeError):
+        preload.worker_executor()
+
+
+class TestRustAfterFork:
+    @pytest.fixture
+    def executor(self, mocker):
+        from rita.engine import translate_rust
+        lib = mocker.MagicMock()
+        mocker.patch.object(translate_rust, "load_lib", return_value=lib)
+        return translate_rust.RustRuleExecutor([("CAR", [r"(\bred\b\s?)"])], SessionConfig())
+
+    def test_same_process_keeps_context(self, executor):
+        executor.after_fork()
+        assert executor.lib.compile.call_count == 1
+
+    def test_forked_child_compiles_own_context(self, executor):
+        inherited = executor.context
+        # As seen from a forked child
+        executor._context_pid = os.getpid() + 1
+        executor.after_fork()
+        assert executor.lib.compile.call_count == 2
+        assert executor._context_pid == os.getpid()
+        executor.lib.clean_env.assert_not_called()
+        assert inherited is not None
+
+    def test_inherited_context_is_not_freed(self, executor):
+        executor._context_pid = os.getpid() + 1
+        executor.clean_context()
+        executor.lib.clean_env.assert_not_called()
+        assert executor.context is None
+
+
+def large_ruleset(count):
+    return "\n".join('{{WORD("word{0}"), NUM, WORD("unit{0}")?}}->MARK("LABEL_{1}")'.format(i, i % 50)
+                     for i in range(count))
+
+
+@fork
+@pytest.mark.parametrize("preloaded", [True, False])
+def test_benchmark_worker_startup(benchmark, preloaded):
+    """
+    Pool startup until every worker is ready, inheriting a preloaded executor vs. rebuilding it in every worker.
+    Private (unshared) memory of a worker is reported in `extra_info`.
+    Runs only with `--benchmark-enable` or `--benchmark-only`
+    """
+    executor = compile_rules(large_ruleset(2000))
+    if preloaded:
+        preload.preload(executor)
+        (initializer, initargs) = (preload.init_worker, (executor,))
+    else:
+        (initializer, initargs) = (translate_standalone._init_worker, executor.__reduce__()[1])
+
+    def run():
+        with ProcessPoolExecutor(max_workers=2, mp_context=multiprocessing.get_context("fork"),
+                                 initializer=initializer, initargs=initargs) as pool:
+            return list(pool.map(private_memory, range(2)))
+
+    try:
+        memory = benchmark.pedantic(run, rounds=3, iterations=1)
+        benchmark.extra_info["worker_private_kb"] = memory
+    finally:
+        gc.unfreeze()
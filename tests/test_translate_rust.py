@@ -0,0 +1,125 @@
+import multiprocessing
+import os
+import pickle
+import tempfile
+
+import pytest
+
+import rita
+
+from rita.config import SessionConfig
+from rita.engine import translate_rust
+from rita.engine.translate_standalone import RuleExecutor
+
+PATTERNS = [("CAR", [r"(\bred\b\s?)", r"(\bcar\b\s?)"]), ("BIKE", [r"(\bbike\b\s?)"])]
+
+
+@pytest.fixture
+def lib(mocker):
+    lib = mocker.MagicMock()
+    # No matches for any text
+    lib.execute.return_value.__getitem__.return_value.count = 0
+    mocker.patch.object(translate_rust, "load_lib", return_value=lib)
+    return lib
+
+
+def match(label, start, end):
+    return translate_rust.ResultEntity(label.encode("UTF-8"), start, end, 0)
+
+
+@pytest.fixture
+def executor(lib):
+    return translate_rust.RustRuleExecutor(PATTERNS, SessionConfig())
+
+
+@pytest.fixture
+def path():
+    (fd, path) = tempfile.mkstemp(suffix=".jsonl")
+    os.close(fd)
+    yield path
+    os.unlink(path)
+
+
+class TestRustExecutor:
+    def test_iter(self, executor):
+        assert list(executor) == [{"label": label, "rules": rules} for (label, rules) in PATTERNS]
+
+    def test_save_load(self, executor, path):
+        executor.save(path)
+        assert translate_rust.RustRuleExecutor.load(path).raw_patterns == PATTERNS
+        assert RuleExecutor.load(path).raw_patterns == PATTERNS
+
+    def test_pickle(self, executor):
+        restored = pickle.loads(pickle.dumps(executor))
+        assert isinstance(restored, translate_rust.RustRuleExecutor)
+        assert restored.raw_patterns == PATTERNS
+        assert list(restored.execute("red car")) == []
+
+    def test_execute_many(self, lib):
+        executor = translate_rust.RustRuleExecutor(PATTERNS, SessionConfig(), max_workers=1)
+        assert list(executor.execute_many(["red car", "a bike"])) == [[], []]
+        assert lib.execute.call_count == 2
+        assert pickle.loads(pickle.dumps(executor)).max_workers == 1
+
+    @pytest.mark.skipif(multiprocessing.get_start_method() != "fork", reason="Workers inherit the stubbed lib when forked")
+    def test_execute_many_workers(self, executor):
+        assert list(executor.execute_many(["red car", "a bike", "car"], workers=2)) == [[], [], []]
+
+    def test_subset(self, lib, executor):
+        found = [("CAR", 0, 3), ("BIKE", 4, 8)]
+        lib.execute.return_value.__getitem__.return_value.count = len(found)
+        lib.read_result.side_effect = lambda ptr, i: [match(*found[i])]
+
+        view = executor.subset(["BIKE"])
+        assert [r["label"] for r in view.execute("car bike")] == ["BIKE"]
+        assert [r["label"] for r in view.execute("car bike", labels=["CAR"])] == []
+        assert [r["label"] for r in executor.execute("car bike")] == ["CAR", "BIKE"]
+        assert list(view) == [{"label": "BIKE", "rules": PATTERNS[1][1]}]
+        assert pickle.loads(pickle.dumps(view)).raw_patterns == [PATTERNS[1]]
+        with pytest.raises(ValueError):
+            executor.subset(["BOAT"])
+
+    def test_subset_context(self, lib, executor):
+        # The view runs the context of its executor, only the executor frees it
+        view = executor.subset(["BIKE"])
+        assert view.context is executor.context
+        view.clean_context()
+        lib.clean_env.assert_not_called()
+        executor.clean_context()
+        lib.clean_env.assert_called_once()
+
+    @pytest.mark.parametrize("name", ["execute_matches", "execute_each", "execute_stream", "execute_bytes",
+                                      "execute_file"])
+    def test_standalone_only(self, executor, name):
+        # Built on Python regex matches, not a part of the shared executor interface
+        with pytest.raises(AttributeError):
+            getattr(executor, name)
+
+
+class TestListsAcrossEngines:
+    RULES = '!CONFIG("list_lookup_threshold", "5")\nitems = {"red", "green", "blue", "black", "white"}\n' \
+            '{IN_LIST(items), WORD("car")}->MARK("CAR")'
+
+    def test_standalone_lists_filled(self, lib, path):
+        standalone = rita.compile_string(self.RULES, use_engine="standalone")
+        assert standalone.lists
+        standalone.save(path)
+        executor = translate_rust.RustRuleExecutor.load(path)
+        [pattern] = executor.patterns
+        assert "(?#list" not in pattern
+        assert "green" in pattern
+
+        # And back, the lists are still there
+        executor.save(path)
+        loaded = RuleExecutor.load(path)
+        assert loaded.lists == standalone.lists
+        assert list(loaded.execute("a green car")) == list(standalone.execute("a green car"))
+
+    def test_missing_list(self, lib, path):
+        rita.compile_string(self.RULES, use_engine="standalone").save(path)
+        with open(path) as f:
+            lines = [line for line in f if '"list"' not in line]
+        with open(path, "w") as f:
+            f.writelines(lines)
+        with pytest.raises(ValueError):
+            translate_rust.RustRuleExecutor.load(path)
@@ -1,4 +1,5 @@
 import os
+import re
 import tempfile
 
 import pytest
@@ -8,9 +9,17 @@ import rita
 from rita.engine.translate_standalone import (
     RuleExecutor,
     RuleCompileError,
+    RuleMatch,
+    DEFAULT_STREAM_WINDOW,
     escape_literal,
+    non_capturing,
+    named_groups,
+    group_roles,
     regex_parse,
+    bound_literal,
+    trie_alternation,
 )
+from rita.config import SessionConfig
 from rita.utils import ExtendedOp
 
 
@@ -228,6 +237,17 @@ class TestPreprocessing:
                                '{PREFIX("meta"), IN_LIST(science)}->MARK("X")')
         assert [r["text"] for r in parser.execute("study metaphysics now")] == ["metaphysics"]
 
+    def test_shared_list_built_once(self):
+        parser = compile_rules('items = {"naïve", "bayes"}\n'
+                               '{IN_LIST(items)}->MARK("X")\n{WORD("a"), IN_LIST(items)}->MARK("Y")')
+        assert parser.raw_patterns[0][1][0] is parser.raw_patterns[1][1][2]
+
+    def test_list_patterns_freed(self, mocker):
+        config = SessionConfig()
+        mocker.patch("rita.config.SessionConfig", return_value=config)
+        compile_rules('items = {"red", "green"}\n{IN_LIST(items)}->MARK("X")\n{IN_LIST(items)?}->MARK("Y")')
+        assert config.list_patterns == {}
+
 
 class TestUnsupportedRules:
     @pytest.mark.parametrize("rules,name", [
@@ -250,6 +270,11 @@ class TestMatchSemantics:
         results = list(parser.execute("in New York now"))
         assert [r["label"] for r in results] == ["LONG"]
 
+    def test_longest_list_item_wins(self):
+        # Items are tried by their length: `\ba\b` (a longer regex) must not hide "a-"
+        parser = compile_rules('{IN_LIST({"a", "a-"})}->MARK("X")')
+        assert [r["text"] for r in parser.execute("a- b")] == ["a-"]
+
     def test_submatch_offsets_point_into_text(self):
         text = "the answer is 42 indeed"
         parser = compile_rules('{WORD("is"), NUM}->MARK("X")')
@@ -440,3 +465,814 @@ class TestRuleExecutorAPI:
                 RuleExecutor.load(path)
         finally:
             os.unlink(path)
+
+
+COMBINED_SCAN_RULES = """
+!IMPORT("rita.modules.regex")
+colors = {"red", "green", "blue"}
+units = {"mm", "cm", "m"}
+{IN_LIST(colors), WORD("car")}->MARK("CAR_COLOR")
+{NUM, IN_LIST(units)}->MARK("SIZE")
+{WORD("New")}->MARK("SHORT")
+{WORD("New"), WORD("York")}->MARK("LONG")
+{&WORD("price"), NUM}->MARK("PRICE")
+{WORD("t")}->MARK("A")
+{WORD("t")}->MARK("B")
+{REGEX("(?P<rep>ab)(?P=rep)")}->MARK("REPEAT")
+"""
+
+COMBINED_SCAN_TEXTS = [
+    "",
+    "nothing to see here",
+    "a red car and a blue car, 10 cm wide",
+    "in New York the price 42 is a t here",
+    "abab and 5 m of green car",
+]
+
+
+class TestCombinedScan:
+    @pytest.mark.parametrize("combined_scan", [True, 1, 2, 3])
+    def test_results_identical_to_per_rule_scan(self, combined_scan):
+        expected = compile_rules(COMBINED_SCAN_RULES)
+        parser = compile_rules(COMBINED_SCAN_RULES, combined_scan=combined_scan)
+        for text in COMBINED_SCAN_TEXTS:
+            assert list(parser.execute(text)) == list(expected.execute(text))
+
+    def test_rules_with_backreferences_are_not_merged(self):
+        parser = compile_rules(COMBINED_SCAN_RULES, combined_scan=True)
+        assert [node.members for node in parser._batches] == [[7], [0, 1, 2, 3, 4, 5, 6]]
+
+    def test_only_matching_rules_run(self):
+        parser = compile_rules(COMBINED_SCAN_RULES, combined_scan=True)
+        assert [idx for (idx, _) in parser._candidates("a red car here")] == [0, 7]
+
+    def test_non_capturing(self):
+        assert non_capturing(r"(?P<s0>(a)[(]\(b(?:c))") == r"(?:(?:a)[(]\(b(?:c))"
+
+    def test_batch_without_hit_is_skipped(self):
+        parser = compile_rules(COMBINED_SCAN_RULES, combined_scan=True)
+        assert list(parser._candidates("nothing to see here")) == [(7, 0)]
+
+    def test_load_with_combined_scan(self):
+        parser = compile_rules(COMBINED_SCAN_RULES)
+        path = tempfile.mktemp(suffix=".jsonl")
+        try:
+            parser.save(path)
+            loaded = RuleExecutor.load(path, combined_scan=True)
+            for text in COMBINED_SCAN_TEXTS:
+                assert list(loaded.execute(text)) == list(parser.execute(text))
+        finally:
+            os.unlink(path)
+
+
+BENCH_DOCUMENT = (
+    "The new red car costs 20000 eur, the blue one is 150 cm longer. "
+    "Delivery to New York takes 5 days, price 42 is negotiable. "
+) * 20
+
+
+def generated_rules(count):
+    return "\n".join('{{WORD("word{0}"), NUM}}->MARK("LABEL_{0}")'.format(i)
+                     for i in range(count)) + '\n{WORD("price"), NUM}->MARK("PRICE")'
+
+
+@pytest.mark.parametrize("rule_count", [1, 10, 100, 1000])
+@pytest.mark.parametrize("combined_scan", [None, 64, True])
+def test_benchmark_combined_scan(benchmark, rule_count, combined_scan):
+    """
+    Per-rule loop (`None`) vs. combined scan, to find the crossover point.
+    Runs only with `--benchmark-enable` or `--benchmark-only`
+    """
+    parser = compile_rules(generated_rules(rule_count), combined_scan=combined_scan)
+    benchmark(lambda: list(parser.execute(BENCH_DOCUMENT)))
+
+
+class TestExecuteMany:
+    TEXTS = ["a red car", "", "10 cm wide", "in New York now", "price 42"] * 3
+
+    def expected(self, parser):
+        return [list(parser.execute(text)) for text in self.TEXTS]
+
+    @pytest.mark.parametrize("workers,chunksize", [(1, 1), (2, 1), (2, 4)])
+    def test_ordered(self, workers, chunksize):
+        parser = compile_rules(COMBINED_SCAN_RULES)
+        results = list(parser.execute_many(iter(self.TEXTS), workers=workers, chunksize=chunksize))
+        assert results == self.expected(parser)
+
+    def test_unordered_yields_indexes(self):
+        parser = compile_rules(COMBINED_SCAN_RULES, prefilter=True)
+        results = list(parser.execute_many(self.TEXTS, workers=2, chunksize=2, ordered=False))
+        assert [r for (_, r) in sorted(results, key=lambda x: x[0])] == self.expected(parser)
+
+    def test_include_submatches(self):
+        parser = compile_rules(COMBINED_SCAN_RULES)
+        for results in parser.execute_many(self.TEXTS, workers=2, include_submatches=False):
+            assert all(r["submatches"] == [] for r in results)
+
+    def test_early_close(self):
+        parser = compile_rules(COMBINED_SCAN_RULES)
+        gen = parser.execute_many(iter(self.TEXTS * 10), workers=2)
+        assert next(gen) == list(parser.execute(self.TEXTS[0]))
+        gen.close()
+
+    def test_pickle_round_trip(self):
+        import pickle
+        regex = pytest.importorskip("regex")
+        parser = compile_rules('!CONFIG("ignore_case", "F")\n' + COMBINED_SCAN_RULES,
+                               regex_impl=regex, combined_scan=4)
+        restored = pickle.loads(pickle.dumps(parser))
+        assert restored.regex_impl is regex
+        assert restored.combined_scan == 4
+        assert list(restored) == list(parser)
+        for text in COMBINED_SCAN_TEXTS + ["New york"]:
+            assert list(restored.execute(text)) == list(parser.execute(text))
+
+
+@pytest.mark.parametrize("workers", [1, None])
+def test_benchmark_execute_many(benchmark, workers):
+    """
+    Single process vs. all cores.
+    Runs only with `--benchmark-enable` or `--benchmark-only`
+    """
+    parser = compile_rules(generated_rules(100))
+    texts = [BENCH_DOCUMENT] * 200
+    benchmark.pedantic(lambda: list(parser.execute_many(texts, workers=workers, chunksize=10)),
+                       iterations=1, rounds=3)
+
+
+class TestExecuteStream:
+    TEXT = " ".join(COMBINED_SCAN_TEXTS + ["the price is 42 eur. a t here, New York"]) * 20
+
+    @staticmethod
+    def chunks(text, size):
+        return (text[i:i + size] for i in range(0, len(text), size))
+
+    @pytest.mark.parametrize("size", [1, 7, 64, 100000])
+    @pytest.mark.parametrize("kwargs", [{}, {"combined_scan": True, "prefilter": True}])
+    def test_same_as_execute(self, size, kwargs):
+        parser = compile_rules(COMBINED_SCAN_RULES, **kwargs)
+        expected = list(parser.execute(self.TEXT))
+        assert list(parser.execute_stream(self.chunks(self.TEXT, size), window=50)) == expected
+
+    def test_offsets_are_global(self):
+        parser = compile_rules('{WORD("car")}->MARK("X")')
+        results = list(parser.execute_stream(self.chunks(self.TEXT, 10), window=20))
+        assert len(results) > 2
+        for r in results:
+            assert self.TEXT[r["start"]:r["end"]].strip() == r["text"]
+
+    def test_match_across_chunk_boundary(self):
+        parser = compile_rules('{WORD("New"), WORD("York")}->MARK("CITY")')
+        (result,) = parser.execute_stream(["going to Ne", "w Yo", "rk now"])
+        assert (result["start"], result["end"], result["text"]) == (9, 18, "New York")
+
+    def test_window_derived_from_rules(self):
+        bounded = compile_rules('colors = {"red", "blue"}\n{IN_LIST(colors), WORD("car")}->MARK("X")')
+        assert bounded.max_match_length is not None
+        assert bounded.stream_window() == 2 * bounded.max_match_length + 1
+
+        unbounded = compile_rules('{WORD("price"), NUM}->MARK("X")')
+        assert unbounded.max_match_length is None
+        assert unbounded.stream_window() == DEFAULT_STREAM_WINDOW
+
+    def test_empty_stream(self):
+        parser = compile_rules('{WORD("car")}->MARK("X")')
+        assert list(parser.execute_stream([])) == []
+        assert list(parser.execute_stream(["", ""])) == []
+
+
+class TestExecuteBytes:
+    def test_same_as_execute_for_ascii(self):
+        parser = compile_rules(COMBINED_SCAN_RULES)
+        for text in COMBINED_SCAN_TEXTS:
+            assert list(parser.execute_bytes(text.encode("UTF-8"))) == list(parser.execute(text))
+
+    def test_byte_and_char_offsets(self):
+        text = "žodis: red car, žodis 10 cm"
+        encoded = text.encode("UTF-8")
+        parser = compile_rules(COMBINED_SCAN_RULES)
+        expected = list(parser.execute(text))
+        assert [r["text"] for r in expected] == ["red car", "10 cm"]
+
+        by_bytes = list(parser.execute_bytes(encoded))
+        for r in by_bytes:
+            assert encoded[r["start"]:r["end"]].decode("UTF-8").strip() == r["text"]
+        assert list(parser.execute_bytes(encoded, char_offsets=True)) == expected
+
+    def test_memoryview(self):
+        parser = compile_rules(COMBINED_SCAN_RULES)
+        text = "a red car and 10 cm"
+        assert list(parser.execute_bytes(memoryview(text.encode("UTF-8")))) == list(parser.execute(text))
+
+    def test_execute_file(self):
+        text = "ėė red car, " * 10000 + "price 42"
+        parser = compile_rules(COMBINED_SCAN_RULES)
+        path = tempfile.mktemp(suffix=".txt")
+        try:
+            with open(path, "w", encoding="UTF-8") as f:
+                f.write(text)
+            assert list(parser.execute_file(path, char_offsets=True)) == list(parser.execute(text))
+        finally:
+            os.unlink(path)
+
+    def test_empty_file(self):
+        parser = compile_rules(COMBINED_SCAN_RULES)
+        path = tempfile.mktemp(suffix=".txt")
+        try:
+            open(path, "w").close()
+            assert list(parser.execute_file(path)) == []
+        finally:
+            os.unlink(path)
+
+
+class TestRuleMatch:
+    def test_to_dict_same_as_execute(self):
+        parser = compile_rules(COMBINED_SCAN_RULES)
+        for text in COMBINED_SCAN_TEXTS:
+            assert [m.to_dict() for m in parser.execute_matches(text)] == list(parser.execute(text))
+
+    def test_lazy_fields(self):
+        parser = compile_rules('{WORD("red"), WORD("car")}->MARK("CAR")')
+        (match, ) = parser.execute_matches("a red car ")
+        assert isinstance(match, RuleMatch)
+        assert not hasattr(match, "__dict__")
+        assert match._text is None and match._submatches is None
+        assert (match.start, match.end, match.label) == (2, 10, "CAR")
+        assert match.label_id == 0
+        assert match.text == "red car"
+        assert match.raw_text == "red car "
+        assert [s["key"] for s in match.submatches] == ["CAR", "s0", "s2"]
+        assert match.to_dict(include_submatches=False)["submatches"] == []
+
+    def test_labels_are_interned(self):
+        parser = compile_rules("""
+        {WORD("red")}->MARK("COLOR")
+        {WORD("blue")}->MARK("COLOR")
+        {WORD("car")}->MARK("VEHICLE")
+        """)
+        assert parser.labels == ["COLOR", "VEHICLE"]
+        assert parser.label_ids == [0, 0, 1]
+        assert [m.label_id for m in parser.execute_matches("red car, blue car")] == [0, 1, 0, 1]
+
+
+MATCH_DENSE_DOCUMENT = "a red car and a blue car, 10 cm wide. " * 200
+
+
+@pytest.mark.parametrize("method", ["execute", "execute_matches"])
+def test_benchmark_match_dense(benchmark, method):
+    """
+    Spans only, on a document with thousands of matches: result dicts vs. lazy `RuleMatch`.
+    Runs only with `--benchmark-enable` or `--benchmark-only`
+    """
+    parser = compile_rules(COMBINED_SCAN_RULES)
+    execute = getattr(parser, method)
+    if method == "execute":
+        benchmark(lambda: [(r["start"], r["end"]) for r in execute(MATCH_DENSE_DOCUMENT)])
+    else:
+        benchmark(lambda: [(r.start, r.end) for r in execute(MATCH_DENSE_DOCUMENT)])
+
+
+class TestGroupRoles:
+    def test_named_groups_without_compiling(self):
+        import re
+        for regex_str in [r"(?P<X>(?P<s0>(\bred\b))(?P<a1>\(x)[(?P<y>]((?P<g2>a)))",
+                          r"(?P<A>(?:a)(b)(?P<s1>c))"]:
+            assert named_groups(regex_str) == dict(re.compile(regex_str).groupindex)
+
+    def test_roles(self):
+        roles = group_roles({"X": 1, "a0": 2, "s1": 3, "g2": 5})
+        assert roles.body == ((3, "s1"), (5, "g2"))
+        assert roles.anchors == ((2, "a0"), )
+        assert roles.submatches == ((1, "X"), (3, "s1"), (5, "g2"))
+
+    def test_computed_at_compile(self):
+        parser = compile_rules('{&WORD("price"), NUM}->MARK("PRICE")')
+        (roles, ) = parser.group_roles
+        assert [name for (_, name) in roles.anchors] == ["a1", "a2"]
+        assert [name for (_, name) in roles.body] == ["s2"]
+
+
+def anchor_ruleset(count):
+    return "\n".join('{{&WORD("word{0}"), NUM, &WORD("eur")}}->MARK("LABEL_{0}")'.format(i)
+                     for i in range(count)) + '\n{&WORD("costs"), NUM, &WORD("eur")}->MARK("PRICE")'
+
+
+@pytest.mark.parametrize("rule_count", [10, 100])
+def test_benchmark_anchors(benchmark, rule_count):
+    """
+    Anchor-heavy rules on a match-dense document.
+    Runs only with `--benchmark-enable` or `--benchmark-only`
+    """
+    parser = compile_rules(anchor_ruleset(rule_count))
+    document = "The car costs 20000 eur, word3 42 eur. " * 100
+    benchmark(lambda: list(parser.execute(document)))
+
+
+class TestStreamingExecute:
+    def counting_parser(self, rules):
+        parser = compile_rules(rules)
+        consumed = []
+        finditer = parser._finditer
+
+        def counting(pattern, text, pos=0):
+            for match in finditer(pattern, text, pos):
+                consumed.append(match)
+                yield match
+
+        parser._finditer = counting
+        return parser, consumed
+
+    def test_yields_before_rules_finish(self):
+        parser, consumed = self.counting_parser(COMBINED_SCAN_RULES)
+        text = "a red car, 10 cm wide. " * 1000
+        first = next(parser.execute(text))
+        assert first["text"] == "red car"
+        assert len(consumed) < 10
+
+    def test_same_results(self):
+        parser, _ = self.counting_parser(COMBINED_SCAN_RULES)
+        expected = compile_rules(COMBINED_SCAN_RULES)
+        for text in COMBINED_SCAN_TEXTS:
+            assert list(parser.execute(text)) == list(expected.execute(text))
+
+    def test_execute_each(self):
+        parser = compile_rules(COMBINED_SCAN_RULES)
+        text = "a red car, 10 cm wide, price 42"
+        seen = []
+        assert parser.execute_each(text, seen.append) == 3
+        assert [m.to_dict() for m in seen] == list(parser.execute(text))
+
+
+@pytest.mark.parametrize("first", [True, False])
+def test_benchmark_first_result(benchmark, first):
+    """
+    Time to the first result vs. all results on a long match-dense document.
+    Runs only with `--benchmark-enable` or `--benchmark-only`
+    """
+    parser = compile_rules(COMBINED_SCAN_RULES)
+    document = MATCH_DENSE_DOCUMENT * 10
+    if first:
+        benchmark(lambda: next(parser.execute(document)))
+    else:
+        benchmark(lambda: list(parser.execute(document)))
+
+
+class TestQueries:
+    @pytest.mark.parametrize("kwargs", [{}, {"prefilter": True}, {"combined_scan": 4}])
+    def test_same_as_execute(self, kwargs):
+        parser = compile_rules(COMBINED_SCAN_RULES, **kwargs)
+        for text in COMBINED_SCAN_TEXTS:
+            results = list(parser.execute(text))
+            assert parser.has_match(text) == (len(results) > 0)
+            assert parser.first_match(text) == (results[0] if results else None)
+            assert parser.count_by_label(text) == {
+                label: len([r for r in results if r["label"] == label])
+                for label in {r["label"] for r in results}
+            }
+            all_results = list(parser.execute(text, overlap="all"))
+            assert parser.labels_present(text) == {r["label"] for r in all_results}
+
+    def test_anchors_only_is_no_match(self):
+        parser = compile_rules('{&WORD("price"), NUM}->MARK("PRICE")')
+        assert not parser.has_match("price tag")
+        assert parser.labels_present("price tag") == set()
+        assert parser.has_match("price 42")
+
+    def test_query_order(self):
+        parser = compile_rules("""
+        {&WORD("price"), NUM}->MARK("PRICE")
+        {WORD("new"), WORD("york"), WORD("city")}->MARK("CITY")
+        {WORD("car")}->MARK("CAR")
+        """)
+        assert parser.query_order == [2, 1, 0]
+
+    def test_max_matches(self):
+        parser = compile_rules(COMBINED_SCAN_RULES)
+        text = "a red car, 10 cm wide. " * 10
+        assert list(parser.execute(text, max_matches=3)) == list(parser.execute(text))[:3]
+        assert list(parser.execute(text, max_matches=0)) == []
+
+
+CLASSIFICATION_TEXTS = ["a short message, {0} {1} in particular".format("price" if i % 2 else "number", i)
+                        for i in range(50)]
+
+
+@pytest.mark.parametrize("method", ["execute", "has_match"])
+def test_benchmark_has_match(benchmark, method):
+    """
+    Classification: does any rule fire on short texts, half of which match.
+    Runs only with `--benchmark-enable` or `--benchmark-only`
+    """
+    parser = compile_rules(generated_rules(100))
+    if method == "execute":
+        benchmark(lambda: [len(list(parser.execute(text))) > 0 for text in CLASSIFICATION_TEXTS])
+    else:
+        benchmark(lambda: [parser.has_match(text) for text in CLASSIFICATION_TEXTS])
+
+
+class TestLabelSubset:
+    RULES = """
+    {WORD("red"), WORD("car")}->MARK("CAR")
+    {NUM, WORD("cm")}->MARK("SIZE")
+    {WORD("blue"), WORD("car")}->MARK("CAR")
+    {&WORD("price"), NUM}->MARK("PRICE")
+    """
+    TEXT = "a red car and a blue car, 10 cm wide, price 42"
+
+    def labels(self, results):
+        return [r["label"] for r in results]
+
+    def test_label_index(self):
+        parser = compile_rules(self.RULES)
+        assert parser.label_index == {"CAR": [0, 2], "SIZE": [1], "PRICE": [3]}
+
+    @pytest.mark.parametrize("kwargs", [{}, {"prefilter": True}, {"combined_scan": 2}])
+    def test_execute_labels(self, kwargs):
+        parser = compile_rules(self.RULES, **kwargs)
+        assert self.labels(parser.execute(self.TEXT, labels={"CAR", "PRICE"})) == ["CAR", "CAR", "PRICE"]
+        assert self.labels(parser.execute(self.TEXT, labels=[])) == []
+
+    def test_unknown_label(self):
+        parser = compile_rules(self.RULES)
+        with pytest.raises(ValueError):
+            list(parser.execute(self.TEXT, labels={"CITY"}))
+
+    def test_subset_shares_patterns(self):
+        parser = compile_rules(self.RULES, prefilter=True)
+        view = parser.subset({"SIZE", "PRICE"})
+        assert view.patterns is parser.patterns
+        assert view.prefilter is parser.prefilter
+        assert self.labels(view.execute(self.TEXT)) == ["SIZE", "PRICE"]
+        assert view.labels_present(self.TEXT) == {"SIZE", "PRICE"}
+        assert self.labels(parser.execute(self.TEXT)) == ["CAR", "CAR", "SIZE", "PRICE"]
+
+    def test_subset_of_subset(self):
+        parser = compile_rules(self.RULES)
+        view = parser.subset({"SIZE", "PRICE"}).subset({"PRICE", "CAR"})
+        assert self.labels(view.execute(self.TEXT)) == ["PRICE"]
+
+    def test_subset_pickles_active_rules(self):
+        import pickle
+        parser = compile_rules(self.RULES)
+        view = parser.subset({"CAR"})
+        restored = pickle.loads(pickle.dumps(view))
+        assert [p["label"] for p in restored] == ["CAR", "CAR"]
+        assert list(restored.execute(self.TEXT)) == list(view.execute(self.TEXT))
+
+
+def grouped_ruleset(count):
+    """
+    Rules with nested patterns and anchors, every one of them takes group ids
+    """
+    lines = ['fraction = {NUM, WORD("/"), NUM}', 'number = {NUM|PATTERN(fraction)}']
+    for i in range(count):
+        if i % 3 == 0:
+            lines.append('{{WORD("size{0}"), PATTERN(number)}}->MARK("SIZE_{1}")'.format(i, i % 20))
+        elif i % 3 == 1:
+            lines.append('{{ANCHOR(WORD("price{0}")), NUM, ANCHOR(WORD("eur"))?}}->MARK("PRICE_{1}")'.format(i, i % 20))
+        else:
+            lines.append('{{WORD("w{0}"), WORD("x{0}")?}}->MARK("WORD_{1}")'.format(i, i % 20))
+    return "\n".join(lines)
+
+
+class TestParallelCompile:
+    TEXT = "size0 3 / 4, price1 20 eur and w2 x2 or size3 5"
+
+    def test_same_as_serial(self):
+        serial = compile_rules(grouped_ruleset(30))
+        parallel = compile_rules(grouped_ruleset(30), compile_workers=2)
+        assert list(parallel) == list(serial)
+        assert [p.groupindex for p in parallel.patterns] == [p.groupindex for p in serial.patterns]
+        assert list(parallel.execute(self.TEXT)) == list(serial.execute(self.TEXT))
+
+    def test_workers_compile_patterns(self):
+        import re
+        from rita.config import SessionConfig
+        from rita.engine.translate_standalone import compile_patterns, regex_flags
+        from rita.parser import parse
+        from rita.preprocess import preprocess_rules
+        config = SessionConfig()
+        rules = list(preprocess_rules(parse(grouped_ruleset(10), config), config))
+        (patterns, compiled) = compile_patterns(rules, config, 2, regex_impl=re)
+        assert compiled is not None
+        assert compiled == [re.compile(RuleExecutor._build_regex_str(label, rules), regex_flags(re, config))
+                            for (label, rules) in patterns]
+
+    def test_group_ids_are_deterministic(self):
+        runs = [list(compile_rules(grouped_ruleset(30), compile_workers=workers)) for workers in (2, 3, 2)]
+        assert runs[0] == runs[1] == runs[2]
+
+    def test_other_regex_impl(self):
+        import regex
+        serial = compile_rules(grouped_ruleset(10), regex_impl=regex)
+        parallel = compile_rules(grouped_ruleset(10), regex_impl=regex, compile_workers=2)
+        assert list(parallel) == list(serial)
+        assert list(parallel.execute(self.TEXT)) == list(serial.execute(self.TEXT))
+
+    def test_errors_are_the_same(self):
+        rules = grouped_ruleset(10) + '\n{WORD("hi")}->MARK("MY-LABEL")'
+        with pytest.raises(RuleCompileError, match="MY-LABEL"):
+            compile_rules(rules, compile_workers=2)
+
+
+@pytest.mark.parametrize("compile_workers", [None, 2, 4])
+def test_benchmark_compile_large(benchmark, compile_workers):
+    """
+    Serial vs. parallel compilation of a large ruleset (parsing excluded).
+    Runs only with `--benchmark-enable` or `--benchmark-only`
+    """
+    from rita.config import SessionConfig
+    from rita.engine.translate_standalone import compile_rules as standalone_compile
+    from rita.parser import parse
+    from rita.preprocess import preprocess_rules
+    config = SessionConfig()
+    rules = list(preprocess_rules(parse(grouped_ruleset(5000), config), config))
+    benchmark.pedantic(lambda: standalone_compile(rules, config, compile_workers=compile_workers),
+                       rounds=3, iterations=1)
+
+
+BROKEN_RULES = """
+!IMPORT("rita.modules.regex")
+{WORD("hi")}->MARK("GREETING")
+{REGEX("a(b")}->MARK("BROKEN")
+"""
+
+
+class TestCompileModes:
+    TEXT = "size0 3 / 4, price1 20 eur and w2 x2 or size3 5"
+
+    @pytest.mark.parametrize("mode", ["lazy", "background"])
+    def test_same_as_eager(self, mode):
+        eager = compile_rules(grouped_ruleset(30))
+        parser = compile_rules(grouped_ruleset(30), compile=mode)
+        assert parser.compile_mode == mode
+        assert parser.group_roles == eager.group_roles
+        assert list(parser.execute(self.TEXT)) == list(eager.execute(self.TEXT))
+        parser.wait_ready()
+        assert list(parser.patterns) == list(eager.patterns)
+
+    def test_lazy_compiles_on_first_use(self):
+        parser = compile_rules(grouped_ruleset(30), compile="lazy", prefilter=True)
+        assert not parser.ready.done()
+        list(parser.execute("w2 x2"))
+        compiled = [p for p in parser.patterns._compiled if p is not None]
+        assert 0 < len(compiled) < 30
+        parser.wait_ready()
+        assert parser.ready.done()
+
+    def test_background_becomes_ready(self):
+        parser = compile_rules(grouped_ruleset(30), compile="background")
+        parser.wait_ready(timeout=30)
+        assert parser.ready.done()
+        assert None not in parser.patterns._compiled
+
+    def test_eager_is_ready(self):
+        parser = compile_rules(grouped_ruleset(3))
+        assert parser.ready.done()
+        parser.wait_ready()
+
+    def test_invalid_pattern_fails_on_use(self):
+        parser = compile_rules(BROKEN_RULES, compile="lazy")
+        assert [r["label"] for r in parser.execute("hi", labels={"GREETING"})] == ["GREETING"]
+        with pytest.raises(RuleCompileError, match="BROKEN"):
+            list(parser.execute("hi"))
+        with pytest.raises(RuleCompileError, match="BROKEN"):
+            parser.wait_ready()
+
+    def test_background_error_fails_ready(self):
+        parser = compile_rules(BROKEN_RULES, compile="background")
+        with pytest.raises(RuleCompileError, match="BROKEN"):
+            parser.wait_ready(timeout=30)
+
+    def test_invalid_label_fails_upfront(self):
+        with pytest.raises(RuleCompileError, match="MY-LABEL"):
+            compile_rules('{WORD("hi")}->MARK("MY-LABEL")', compile="lazy")
+
+    def test_unknown_mode(self):
+        with pytest.raises(ValueError):
+            compile_rules(grouped_ruleset(3), compile="later")
+
+    def test_load_and_pickle_keep_mode(self):
+        import pickle
+        parser = compile_rules(grouped_ruleset(10))
+        path = tempfile.mktemp(suffix=".jsonl")
+        try:
+            parser.save(path)
+            loaded = RuleExecutor.load(path, compile="background")
+        finally:
+            os.unlink(path)
+        assert loaded.compile_mode == "background"
+        assert pickle.loads(pickle.dumps(loaded)).compile_mode == "background"
+        assert list(loaded.execute(self.TEXT)) == list(parser.execute(self.TEXT))
+
+
+@pytest.fixture(scope="module")
+def large_ruleset_path():
+    parser = compile_rules(grouped_ruleset(3000))
+    path = tempfile.mktemp(suffix=".jsonl")
+    parser.save(path)
+    yield path
+    os.unlink(path)
+
+
+@pytest.mark.parametrize("mode", ["eager", "lazy", "background"])
+def test_benchmark_load_first_result(benchmark, large_ruleset_path, mode):
+    """
+    `RuleExecutor.load` of a large ruleset until the first results of a short text, by compile mode.
+    Runs only with `--benchmark-enable` or `--benchmark-only`
+    """
+    def run():
+        parser = RuleExecutor.load(large_ruleset_path, compile=mode, prefilter=True)
+        return list(parser.execute("w2 x2"))
+
+    benchmark.pedantic(run, rounds=3, iterations=1)
+
+
+def vocabulary(count):
+    """
+    Gazetteer-like list: words sharing prefixes, multi-word and punctuated entries
+    """
+    stems = ["north", "new", "san", "saint", "port", "lake", "mount", "fort"]
+    endings = ["", "s", "ville", "ton", "field", " city", "-on-sea", " bay", ".", "ford"]
+    items = []
+    i = 0
+    while len(items) < count:
+        items.append("{0}{1}{2}".format(stems[i % len(stems)], i // (len(stems) * len(endings)) or "",
+                                        endings[(i // len(stems)) % len(endings)]))
+        i += 1
+    return items
+
+
+def flat_alternation(items):
+    return "|".join(bound_literal(item) for item in sorted(items, key=lambda x: (-len(x), x)))
+
+
+class TestTrieAlternation:
+    ITEMS = ["car", "cars", "carpet", "cat", "C++", "New York", "New-York", "-", r"J\.", "a", "b"]
+
+    def test_factored_by_prefix(self):
+        assert trie_alternation(["car", "cars", "carpet", "cat"]) == r"\bca(?:r(?:pet\b|s\b|\b)|t\b)"
+
+    def test_single_chars_as_class(self):
+        assert trie_alternation(["a", "b", "c"]) == r"\b[abc]\b"
+
+    def test_same_matches_as_flat(self):
+        text = "a carpet, cars and a cat, C++ in New York or New-York - J. b cart"
+        for template in [r"((^|\s)(({0})\s?))", r"((?!(?:{0}))\w+)"]:
+            (flat, trie) = (template.format(flat_alternation(self.ITEMS)), template.format(trie_alternation(self.ITEMS)))
+            assert [m.span() for m in re.finditer(trie, text)] == [m.span() for m in re.finditer(flat, text)]
+
+    def test_longest_value_wins(self):
+        assert re.match(trie_alternation(["ab", "ab-c", "ab-"]), "ab-cd ab-c").group() == "ab-"
+        assert re.match(trie_alternation(["ab", "ab-c", "ab-"]), "ab-c d").group() == "ab-c"
+
+    def test_fold_case(self):
+        pattern = trie_alternation(["Apple", "apple", "APPLES"], fold_case=True)
+        assert pattern == r"\bapple(?:s\b|\b)"
+        assert re.findall(pattern, "Apples and APPLE", re.IGNORECASE) == ["Apples", "APPLE"]
+
+    def test_fold_case_as_re(self):
+        # `re` matches "ſ" with "s" and the Kelvin sign with "k" case-insensitively, `str.lower` doesn't
+        items = ["sss", "ſss bar", "k", "\u212a ok"] + ["filler{}".format(i) for i in range(25)]
+        rules = "items = {{{0}}}\n{{IN_LIST(items)}}->MARK(\"X\")".format(", ".join('"{}"'.format(item) for item in items))
+        trie = compile_rules(rules)
+        flat = compile_rules('!CONFIG("list_trie_threshold", "N")\n' + rules)
+        for text in ["ſss bar", "sss bar", "k ok", "\u212a ok"]:
+            assert [r["text"] for r in trie.execute(text)] == [r["text"] for r in flat.execute(text)] == [text]
+
+    def test_in_list_same_results(self):
+        items = vocabulary(200)
+        rules = "items = {{{0}}}\n{{IN_LIST(items), WORD(\"road\")?}}->MARK(\"PLACE\")".format(
+            ", ".join('"{}"'.format(item) for item in items))
+        text = "From north1ville road to new2 city, lake-on-sea bay and Port. Saint-on-sea, forts road"
+        trie = compile_rules(rules)
+        flat = compile_rules('!CONFIG("list_trie_threshold", "N")\n' + rules)
+        assert trie.patterns[0].pattern != flat.patterns[0].pattern
+        assert list(trie.execute(text)) == list(flat.execute(text))
+        assert len(list(trie.execute(text))) > 0
+
+    def test_below_threshold_is_flat(self):
+        parser = compile_rules('items = {"car", "cars"}\n{IN_LIST(items)}->MARK("CAR")')
+        assert r"\bcars\b|\bcar\b" in parser.patterns[0].pattern
+
+
+def list_pattern(method, count):
+    items = vocabulary(count)
+    return flat_alternation(items) if method == "flat" else trie_alternation(items, fold_case=True)
+
+
+@pytest.mark.parametrize("count", [100, 1000, 10000])
+@pytest.mark.parametrize("method", ["flat", "trie"])
+def test_benchmark_list_compile(benchmark, method, count):
+    """
+    Building and compiling the alternation of an `IN_LIST`, flat vs. trie. Pattern size is reported in `extra_info`.
+    Runs only with `--benchmark-enable` or `--benchmark-only`
+    """
+    def run():
+        return re.compile(r"((^|\s)(({0})\s?))".format(list_pattern(method, count)), re.IGNORECASE)
+
+    benchmark.pedantic(run, setup=re.purge, rounds=3, iterations=1)
+    benchmark.extra_info["pattern_size"] = len(list_pattern(method, count))
+
+
+@pytest.mark.parametrize("count", [100, 1000, 10000])
+@pytest.mark.parametrize("method", ["flat", "trie"])
+def test_benchmark_list_match(benchmark, method, count):
+    """
+    Matching throughput of an `IN_LIST` alternation, flat vs. trie.
+    Runs only with `--benchmark-enable` or `--benchmark-only`
+    """
+    pattern = re.compile(r"((^|\s)(({0})\s?))".format(list_pattern(method, count)), re.IGNORECASE)
+    text = " ".join(vocabulary(count)[::7] + BENCH_DOCUMENT.split())
+    benchmark(lambda: len(pattern.findall(text)))
+
+
+class TestNamedLists:
+    RULES = "items = {{{0}}}\n{{IN_LIST(items), WORD(\"road\")?}}->MARK(\"PLACE\")"
+    TEXT = "From north1ville road to NEW2 city, lake-on-sea bay and Port. Saint-on-sea, forts road, san"
+
+    @pytest.fixture
+    def regex(self):
+        return pytest.importorskip("regex")
+
+    def rules(self, items):
+        return self.RULES.format(", ".join('"{}"'.format(item) for item in items))
+
+    def test_same_results_as_alternation(self, regex):
+        rules = self.rules(vocabulary(200))
+        for ignore_case in ["Y", "N"]:
+            config = '!CONFIG("ignore_case", "{}")\n'.format(ignore_case)
+            named = compile_rules(config + rules, regex_impl=regex, named_lists=True)
+            flat = compile_rules(config + '!CONFIG("list_trie_threshold", "N")\n' + rules, regex_impl=regex)
+            assert r"\L<list0>" in named.patterns[0].pattern
+            assert list(named.execute(self.TEXT)) == list(flat.execute(self.TEXT))
+        assert len(list(named.execute(self.TEXT))) > 0
+
+    def test_escaped_items_stay_alternation(self, regex):
+        parser = compile_rules(self.rules(vocabulary(30) + ["J\\."]), regex_impl=regex, named_lists=True)
+        assert r"\L<" not in parser.patterns[0].pattern
+        assert [r["text"] for r in parser.execute("J. road")] == ["J. road"]
+
+    def test_pickled(self, regex):
+        import pickle
+        parser = pickle.loads(pickle.dumps(compile_rules(self.rules(vocabulary(30)), regex_impl=regex, named_lists=True)))
+        assert parser.named_lists
+        assert [r["text"] for r in parser.execute("to saints road")] == ["saints road"]
+
+    def test_needs_regex_module(self):
+        with pytest.raises(ValueError):
+            compile_rules(self.rules(vocabulary(30)), named_lists=True)
+
+
+def list_backend(backend):
+    """
+    `(rita.compile kwargs, !CONFIG lines)` of `re` (trie), `regex` with a flat alternation, a trie or named lists
+    """
+    if backend == "re":
+        return {}, ""
+    regex = pytest.importorskip("regex")
+    if backend == "regex_named":
+        return {"regex_impl": regex, "named_lists": True}, ""
+    if backend == "regex_flat":
+        return {"regex_impl": regex}, '!CONFIG("list_trie_threshold", "N")\n'
+    return {"regex_impl": regex}, ""
+
+
+def list_rules(count):
+    return TestNamedLists().rules(vocabulary(count))
+
+
+@pytest.mark.parametrize("count", [1000, 10000])
+@pytest.mark.parametrize("backend", ["re", "regex_flat", "regex_trie", "regex_named"])
+def test_benchmark_named_lists_compile(benchmark, backend, count):
+    """
+    Compiling an `IN_LIST` rule with `re` (trie) and `regex` (flat alternation, trie, named list).
+    Runs only with `--benchmark-enable` or `--benchmark-only`
+    """
+    (kwargs, config) = list_backend(backend)
+    rules = config + list_rules(count)
+    benchmark.pedantic(lambda: compile_rules(rules, **kwargs), setup=re.purge, rounds=1, iterations=1)
+
+
+@pytest.mark.parametrize("count", [1000, 10000])
+@pytest.mark.parametrize("backend", ["re", "regex_flat", "regex_trie", "regex_named"])
+def test_benchmark_named_lists_match(benchmark, backend, count):
+    """
+    Matching an `IN_LIST` rule with `re` (trie) and `regex` (flat alternation, trie, named list).
+    Runs only with `--benchmark-enable` or `--benchmark-only`
+    """
+    (kwargs, config) = list_backend(backend)
+    parser = compile_rules(config + list_rules(count), **kwargs)
+    text = " ".join(vocabulary(count)[::7] + BENCH_DOCUMENT.split())
+    benchmark(lambda: len(list(parser.execute(text))))
+
+
+@pytest.mark.parametrize("engine", ["standalone", "token"])
+def test_benchmark_shared_list_compile(benchmark, engine):
+    """
+    Compiling 50 rules which use the same 2000 item list, built once for all of them.
+    Runs only with `--benchmark-enable` or `--benchmark-only`
+    """
+    rules = "items = {{{0}}}\n".format(", ".join('"{}"'.format(item) for item in vocabulary(2000)))
+    rules += "\n".join('{{WORD("w{0}"), IN_LIST(items)}}->MARK("L{0}")'.format(i) for i in range(50))
+    benchmark.pedantic(lambda: rita.compile_string(rules, use_engine=engine), setup=re.purge, rounds=1, iterations=1)
@@ -0,0 +1,188 @@
+import time
+
+import pytest
+
+import rita
+
+from rita.config import SessionConfig
+from rita.engine import overlap
+from rita.engine.translate_token import Doc, RuleCompileError, tokenize
+
+
+def compile_rules(rules, **kwargs):
+    return rita.compile_string(rules, use_engine="token", **kwargs)
+
+
+def texts(parser, text, **kwargs):
+    return [(r["text"], r["label"]) for r in parser.execute(text, include_submatches=False, **kwargs)]
+
+
+class TestTokenize:
+    def test_words_numbers_punctuation(self):
+        assert tokenize("It costs 1,200.50 eur, (approx.)") == [
+            "It", "costs", "1,200.50", "eur", ",", "(", "approx", ".", ")"
+        ]
+
+    def test_offsets(self):
+        doc = Doc("red  car!")
+        assert doc.texts == ["red", "car", "!"]
+        assert list(zip(doc.starts, doc.ends)) == [(0, 3), (5, 8), (8, 9)]
+
+
+class TestLiterals:
+    def test_word(self):
+        parser = compile_rules('{WORD("red"), WORD("car")}->MARK("CAR")')
+        assert texts(parser, "A Red car and a red bike") == [("Red car", "CAR")]
+
+    def test_case_sensitive(self):
+        parser = compile_rules('!CONFIG("ignore_case", "N")\n{WORD("Apple")}->MARK("ORG")')
+        assert texts(parser, "apple and Apple") == [("Apple", "ORG")]
+
+    def test_multi_token_values(self):
+        parser = compile_rules('cities = {"New York", "Paris", "U.S."}\n{IN_LIST(cities)}->MARK("GPE")')
+        assert texts(parser, "From New York to Paris via the U.S. today") == [
+            ("New York", "GPE"), ("Paris", "GPE"), ("U.S.", "GPE")
+        ]
+
+    def test_no_partial_tokens(self):
+        parser = compile_rules('{WORD("car")}->MARK("CAR")')
+        assert texts(parser, "cars and a carpet") == []
+
+    def test_negated_multi_token_value(self):
+        with pytest.raises(RuleCompileError):
+            compile_rules('{WORD("New York")!, WORD("city")}->MARK("CITY")')
+
+
+class TestOperators:
+    def test_optional(self):
+        parser = compile_rules('{WORD("red")?, WORD("car")}->MARK("CAR")')
+        assert texts(parser, "a red car, a car") == [("red car", "CAR"), ("car", "CAR")]
+
+    def test_zero_or_more(self):
+        parser = compile_rules('{WORD("very")*, WORD("fast")}->MARK("SPEED")')
+        assert texts(parser, "very very fast and fast") == [("very very fast", "SPEED"), ("fast", "SPEED")]
+
+    def test_one_or_more(self):
+        parser = compile_rules('{WORD("ha")+}->MARK("LAUGH")')
+        assert texts(parser, "ha ha ha, ha") == [("ha ha ha", "LAUGH"), ("ha", "LAUGH")]
+
+    def test_not(self):
+        parser = compile_rules('{WORD("not")!, WORD("good")}->MARK("GOOD")')
+        assert texts(parser, "not good, very good") == [("very good", "GOOD")]
+
+    def test_nested_pattern(self):
+        parser = compile_rules('bc = {WORD("b"), WORD("c")?}\n{WORD("a"), PATTERN(bc), WORD("d")}->MARK("X")')
+        assert texts(parser, "a b c d, a b d, a d") == [("a b c d", "X"), ("a b d", "X")]
+
+    def test_regex_searches_token(self):
+        # As spaCy's REGEX: a search within a single token
+        parser = compile_rules('!IMPORT("rita.modules.regex")\n{REGEX("ing"), WORD("fast")}->MARK("X")')
+        assert texts(parser, "running fast, run fast") == [("running fast", "X")]
+
+    def test_punct(self):
+        parser = compile_rules('{WORD("wait"), PUNCT+}->MARK("X")')
+        assert texts(parser, "wait!!! wait") == [("wait!!!", "X")]
+
+
+class TestAnchors:
+    def test_anchor_not_in_match(self):
+        parser = compile_rules('{&WORD("price"), NUM}->MARK("PRICE")')
+        assert texts(parser, "price 42, 42") == [("42", "PRICE")]
+
+    def test_submatches(self):
+        parser = compile_rules('{&WORD("price"), NUM, WORD("eur")?}->MARK("PRICE")')
+        [result] = list(parser.execute("price 42 eur"))
+        assert result["text"] == "42 eur"
+        assert [(s["key"], s["text"]) for s in result["submatches"]] == [
+            ("PRICE", "price 42 eur"), ("s2", "42"), ("s4", "eur")
+        ]
+
+
+class TestCompile:
+    def test_not_supported(self):
+        with pytest.raises(RuntimeError):
+            compile_rules('{LEMMA("be")}->MARK("VERB")')
+
+    def test_shared_prefix_states(self):
+        rules = "\n".join('{{WORD("the"), WORD("red"), WORD("word{0}")}}->MARK("X")'.format(i) for i in range(10))
+        parser = compile_rules(rules)
+        single = compile_rules('{WORD("the"), WORD("red"), WORD("word0")}->MARK("X")')
+        # The shared prefix is built once, each rule adds a single state
+        assert parser.automaton.size == single.automaton.size + 9
+        assert texts(parser, "the red word7") == [("the red word7", "X")]
+
+    def test_list_patterns_freed(self, mocker):
+        config = SessionConfig()
+        mocker.patch("rita.config.SessionConfig", return_value=config)
+        parser = compile_rules('items = {"red", "green"}\n{IN_LIST(items)}->MARK("X")\n{WORD("a"), IN_LIST(items)}->MARK("Y")')
+        assert config.list_patterns == {}
+        assert texts(parser, "a red car") == [("a red", "Y")]
+
+    def test_longest_first_by_default(self):
+        parser = compile_rules('{WORD("a"), WORD("b")}->MARK("AB")\n{WORD("b"), WORD("c"), WORD("d")}->MARK("BCD")')
+        assert texts(parser, "a b c d") == [("b c d", "BCD")]
+        assert texts(parser, "a b c d", overlap=overlap.LONGEST_LEFTMOST) == [("a b", "AB")]
+
+
+class TestScaling:
+    def best_time(self, parser, tokens):
+        text = " ".join(["w"] * tokens)
+        times = []
+        for _ in range(3):
+            started = time.perf_counter()
+            assert texts(parser, text) == [(text, "W")]
+            times.append(time.perf_counter() - started)
+        return min(times)
+
+    def test_linear_in_tokens(self):
+        parser = compile_rules('{WORD+}->MARK("W")')
+        # Every span of the text matches, only the leftmost start of every end and the longest end of every start
+        # are kept - the whole text is both
+        assert len(list(parser._candidates(Doc(" ".join(["w"] * 1000))))) == 2 * 1000 - 1
+        # 4 times the tokens: 4 times slower if linear, 16 if quadratic
+        assert self.best_time(parser, 4000) < 8 * self.best_time(parser, 1000)
+
+    def test_matches_inside_longer_ones(self):
+        parser = compile_rules('{WORD("a"), WORD("b")?}->MARK("AB")\n{WORD("b")}->MARK("B")')
+        # "a b" of AB is taken first, the longest end of "a" at the end is found as well
+        assert texts(parser, "a b a", overlap=overlap.ALL) == [("a b", "AB"), ("a", "AB"), ("b", "B"), ("a", "AB")]
+
+
+PARITY_RULES = """
+colors = {"red", "green", "blue"}
+{IN_LIST(colors), WORD("car")}->MARK("CAR")
+{NUM, WORD("cm")}->MARK("SIZE")
+{&WORD("price"), NUM, WORD("eur")?}->MARK("PRICE")
+{WORD("New"), WORD("York")}->MARK("GPE")
+"""
+
+PARITY_TEXT = "The new red car costs 20000 eur, price 42 eur, the blue car is 150 cm longer. Delivery to New York."
+
+
+def test_same_as_standalone():
+    standalone = rita.compile_string(PARITY_RULES, use_engine="standalone")
+    token = compile_rules(PARITY_RULES)
+    assert texts(token, PARITY_TEXT) == [(r["text"], r["label"])
+                                         for r in standalone.execute(PARITY_TEXT, include_submatches=False)]
+
+
+BENCH_DOCUMENT = (
+    "The new red car costs 20000 eur, the blue one is 150 cm longer. "
+    "Delivery to New York takes 5 days, price 42 is negotiable. "
+) * 20
+
+
+def generated_rules(count):
+    return "\n".join('{{WORD("word{0}"), NUM}}->MARK("LABEL_{0}")'.format(i)
+                     for i in range(count)) + '\n{WORD("price"), NUM}->MARK("PRICE")'
+
+
+@pytest.mark.parametrize("rule_count", [10, 100, 1000])
+@pytest.mark.parametrize("engine", ["standalone", "token"])
+def test_benchmark_rule_count(benchmark, rule_count, engine):
+    """
+    Matching time as the number of rules grows, token automaton vs. standalone regexes.
+    Runs only with `--benchmark-enable` or `--benchmark-only`
+    """
+    parser = rita.compile_string(generated_rules(rule_count), use_engine=engine)
+    benchmark(lambda: list(parser.execute(BENCH_DOCUMENT)))
@@ -1,6 +1,6 @@
 import json
 
-from rita.utils import deaccent, Node, ExtendedOp, flatten, Timer, timer, RitaJSONEncoder
+from rita.utils import deaccent, Node, ExtendedOp, flatten, Timer, timer, RitaJSONEncoder, ByteOffsets
 from rita.config import SessionConfig
 
 
@@ -207,3 +207,21 @@ class TestRitaJSONEncoder:
 
         result = encoder.default(Obj())
         assert result == {"x": 1, "y": 2}
+
+
+class TestByteOffsets:
+    def test_converts_to_char_offsets(self):
+        text = "ąb žodis c"
+        encoded = text.encode("UTF-8")
+        conv = ByteOffsets(encoded)
+        for char_idx in range(len(text) + 1):
+            byte_idx = len(text[:char_idx].encode("UTF-8"))
+            assert conv(byte_idx) == char_idx
+
+    def test_across_blocks(self):
+        text = "ž" * 100 + "a" * 50 + "ė" * 30
+        encoded = text.encode("UTF-8")
+        conv = ByteOffsets(encoded)
+        conv.BLOCK_SIZE = 16
+        for char_idx in reversed(range(len(text) + 1)):
+            assert conv(len(text[:char_idx].encode("UTF-8"))) == char_idx
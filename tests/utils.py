@@ -49,6 +49,15 @@ def rust_engine(rules, **kwargs):
     return parse
 
 
+def token_engine(rules, **kwargs):
+    parser = rita.compile_string(rules, use_engine="token", **kwargs)
+
+    def parse(text):
+        results = list(parser.execute(text, include_submatches=False))
+        return list([(r["text"], r["label"]) for r in results])
+    return parse
+
+
 def normalize_output(r):
     return re.sub(r"\s+", " ", r.strip().replace("\n", ""))
 